@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.shortcuts import redirect
 from django.conf import settings
 from django.contrib import messages
-from .models import SubscriptionUser, SalonApplication, CSVUpload, DiscountApplication
+from .models import SubscriptionUser, SalonApplication, CSVUpload, DiscountApplication, MatchEvent
 
 
 class CustomAdminSite(admin.AdminSite):
@@ -108,6 +108,18 @@ class CustomAdminSite(admin.AdminSite):
 custom_admin_site = CustomAdminSite(name='custom_admin')
 
 
+def report_bulk_result(model_admin, request, message, skipped_count):
+    """一括操作の結果（処理件数・対象外件数）を表示"""
+    if skipped_count > 0:
+        model_admin.message_user(
+            request,
+            f'{message}（対象外のためスキップ: {skipped_count}件）',
+            messages.WARNING
+        )
+    else:
+        model_admin.message_user(request, message, messages.SUCCESS)
+
+
 # モデルをカスタムAdminSiteに登録
 class SubscriptionUserAdmin(admin.ModelAdmin):
     list_display = ['email', 'subscription_id', 'is_active', 'created_at', 'updated_at']
@@ -157,23 +169,21 @@ class SalonApplicationAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['grant_access_action']
+    actions = ['grant_access_action', 'revoke_access_action']
     
     def grant_access_action(self, request, queryset):
-        """選択された申し込みにアクセスを付与"""
-        count = 0
-        for application in queryset:
-            if (not application.access_granted and 
-                application.subscription_verified and 
-                (application.discord_display_name or application.discord_account_name)):
-                application.grant_access()
-                count += 1
-        
-        self.message_user(
-            request,
-            f'{count}件の申し込みにアクセスを付与しました。'
-        )
+        """選択された申し込みにアクセスを付与（1回のUPDATEで処理）"""
+        selected_count = queryset.count()
+        count = queryset.grant_access()
+        report_bulk_result(self, request, f'{count}件の申し込みにアクセスを付与しました。', selected_count - count)
     grant_access_action.short_description = '選択された申し込みにアクセスを付与'
+    
+    def revoke_access_action(self, request, queryset):
+        """選択された申し込みのアクセス権を剥奪（1回のUPDATEで処理）"""
+        selected_count = queryset.count()
+        count = queryset.revoke_access()
+        report_bulk_result(self, request, f'{count}件の申し込みのアクセス権を剥奪しました。', selected_count - count)
+    revoke_access_action.short_description = '選択された申し込みのアクセス権を剥奪'
 
 
 # カスタムAdminSiteに登録
@@ -213,6 +223,43 @@ class DiscountApplicationAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    actions = ['apply_discount_action', 'revoke_discount_action']
+    
+    def apply_discount_action(self, request, queryset):
+        """選択された申請に値引きを適用（1回のUPDATEで処理）"""
+        selected_count = queryset.count()
+        count = queryset.apply_discount()
+        report_bulk_result(self, request, f'{count}件の値引き申請に値引きを適用しました。', selected_count - count)
+    apply_discount_action.short_description = '選択された申請に値引きを適用'
+    
+    def revoke_discount_action(self, request, queryset):
+        """選択された申請の値引きを解除（1回のUPDATEで処理）"""
+        selected_count = queryset.count()
+        count = queryset.revoke_discount()
+        report_bulk_result(self, request, f'{count}件の値引き申請の値引きを解除しました。', selected_count - count)
+    revoke_discount_action.short_description = '選択された申請の値引きを解除'
 
 
 custom_admin_site.register(DiscountApplication, DiscountApplicationAdmin)
+
+
+class MatchEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'outcome', 'method', 'salon_application', 'discount_application', 'csv_upload', 'created_at']
+    list_filter = ['outcome', 'method', 'created_at']
+    list_select_related = ['salon_application', 'discount_application', 'csv_upload']
+    raw_id_fields = ['salon_application', 'discount_application', 'csv_upload']
+    ordering = ['-created_at']
+
+    # 照合の記録は追記のみ（管理画面からの追加・変更・削除は不可、閲覧のみ）
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+custom_admin_site.register(MatchEvent, MatchEventAdmin)
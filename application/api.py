@@ -0,0 +1,139 @@
+"""
+管理用の読み取り専用JSON API
+
+申し込み・値引き申請・CSVアップロードを一覧画面と同じフィルタ条件で返す。
+
+- ページングはIDによるカーソル方式（OFFSETを使わないため件数が増えても速度が落ちない）
+- fields / exclude パラメータで返すフィールドを選択できる（notes, match_notes を省くなど）
+- 対象の最新の更新日時と件数からETagを作成し、変化がなければ304を返す
+"""
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.views.decorators.http import require_GET
+
+from .conditional import make_etag, set_validators
+from .decorators import admin_api_required
+from .models import CSVUpload, SalonApplication
+from .filters import (
+    application_list_active_filters,
+    application_list_condition,
+    discount_application_list_queryset,
+)
+
+
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 1000
+
+
+class ApiError(Exception):
+    """リクエストパラメータの誤り（400を返す）"""
+
+
+def _encode_cursor(pk):
+    return urlsafe_base64_encode(str(pk).encode())
+
+
+def _decode_cursor(value):
+    try:
+        return int(urlsafe_base64_decode(value).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError('cursorが不正です。')
+
+
+def _parse_limit(request):
+    value = request.GET.get('limit')
+    if not value:
+        return API_DEFAULT_LIMIT
+    if not value.isdigit() or int(value) < 1:
+        raise ApiError('limitには1以上の整数を指定してください。')
+    return min(int(value), API_MAX_LIMIT)
+
+
+def _selected_fields(request, model):
+    """fields / exclude パラメータから返すフィールドを決定（idは常に含める）"""
+    available = [field.attname for field in model._meta.concrete_fields]
+
+    def _names(param):
+        names = [name.strip() for name in request.GET.get(param, '').split(',') if name.strip()]
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise ApiError(f'存在しないフィールドです: {", ".join(unknown)}')
+        return names
+
+    fields = _names('fields') or available
+    excluded = set(_names('exclude')) - {'id'}
+    fields = [name for name in fields if name not in excluded]
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+
+def _api_list(request, queryset):
+    """フィルタ済みのQuerySetをカーソル方式でページングしてJSONで返す"""
+    try:
+        fields = _selected_fields(request, queryset.model)
+        limit = _parse_limit(request)
+        cursor = request.GET.get('cursor')
+        after = _decode_cursor(cursor) if cursor else None
+    except ApiError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # ETagはフィルタ条件全体に対して作成する（同じURLへの再取得で304を返す）
+    etag, last_modified = make_etag([queryset])
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return set_validators(not_modified, etag, last_modified)
+
+    page = queryset.order_by('-id')
+    if after is not None:
+        page = page.filter(id__lt=after)
+    results = list(page.values(*fields)[:limit + 1])
+
+    next_cursor = None
+    next_url = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = _encode_cursor(results[-1]['id'])
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_url = f'{request.path}?{params.urlencode()}'
+
+    response = JsonResponse(
+        {'results': results, 'next_cursor': next_cursor, 'next': next_url},
+        json_dumps_params={'ensure_ascii': False},
+    )
+    return set_validators(response, etag, last_modified)
+
+
+@admin_api_required
+@require_GET
+def application_api(request):
+    """申し込み一覧API（フィルタ: status, verified, access, revocation）"""
+    queryset = SalonApplication.objects.filter(
+        application_list_condition(application_list_active_filters(request))
+    )
+    return _api_list(request, queryset)
+
+
+@admin_api_required
+@require_GET
+def discount_application_api(request):
+    """値引き申請一覧API（フィルタ: status, verified, discount）"""
+    queryset = discount_application_list_queryset(
+        request.GET.get('status'),
+        request.GET.get('verified'),
+        request.GET.get('discount'),
+    )
+    return _api_list(request, queryset)
+
+
+@admin_api_required
+@require_GET
+def csv_upload_api(request):
+    """CSVアップロード一覧API（フィルタ: status）"""
+    queryset = CSVUpload.objects.all()
+    status_filter = request.GET.get('status')
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+    return _api_list(request, queryset)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApplicationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'application'
+
+    def ready(self):
+        # カウンター更新・キャッシュバージョン更新・状態のキャッシュ削除・SQLiteの接続設定用のシグナルを登録
+        from . import caching, counters, public_status, sqlite  # noqa: F401
+        from .ratelimit import get_limits
+
+        # レート制限の設定の誤り（per_minute: 0 など）は起動時にエラーにする
+        get_limits()
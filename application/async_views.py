@@ -0,0 +1,175 @@
+"""
+公開ページの非同期ビュー（ASGIでの運用向け）
+
+views.py の公開ページ（申し込み・値引き申請フォームと審査中・完了ページ）と同じ処理を
+非同期ORMで行う。DBの応答を待つ間もワーカーを占有しないため、ASGIサーバーでは
+1プロセスで多数の申し込みを同時に処理できる。
+
+設定 ASYNC_PUBLIC_VIEWS が True の場合にURLへ割り当てられる（asgi.py で既定で有効）。
+WSGI（Passenger）では非同期ビューを動かすためにリクエストごとの変換が必要になり
+かえって遅くなるため、同期版の views.py を使用する。
+"""
+from django.contrib import messages
+from django.db import IntegrityError
+from django.http import Http404
+from django.shortcuts import redirect, render
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
+
+from .decorators import cache_public_form_page, rate_limit_public_form
+from .forms import DiscountApplicationForm, SalonApplicationForm
+from .models import DiscountApplication, SalonApplication
+from .public_status import aget_status, payload_for, status_response
+
+
+async def _aget_application(model, application_id):
+    """get_object_or_404 の非同期版"""
+    try:
+        return await model.objects.aget(id=application_id)
+    except model.DoesNotExist:
+        raise Http404(f'{model._meta.verbose_name}が見つかりません。')
+
+
+async def _avalidate(form):
+    """
+    フォームを検証し、メールアドレスの重複を非同期ORMで確認
+
+    同期版の clean_email はDBを検索するため、検証時は重複確認を止めて
+    検証後に aduplicate_email_error で確認する。
+    """
+    form.check_duplicate_email = False
+    if not form.is_valid():
+        return False
+    error = await form.aduplicate_email_error(form.cleaned_data['email'])
+    if error:
+        form.add_error('email', error)
+        return False
+    return True
+
+
+async def _asave_public_application(form, application):
+    """公開フォームからの申し込み・申請を保存（views._save_public_application の非同期版）"""
+    try:
+        await application.asave()
+    except IntegrityError:
+        form.add_error(
+            'email',
+            await form.aduplicate_email_error(application.email) or 'このメールアドレスは既に使用されています。'
+        )
+        return False
+    return True
+
+
+@require_http_methods(["GET", "POST"])
+@rate_limit_public_form('application')
+@cache_public_form_page
+async def application_form(request):
+    """夜遊びサロン申し込みフォーム"""
+    if request.method == 'POST':
+        form = SalonApplicationForm(request.POST)
+        if await _avalidate(form):
+            application = form.save(commit=False)
+            application.status = 'pending'
+            application.subscription_verified = False
+            if await _asave_public_application(form, application):
+                messages.success(
+                    request,
+                    '申し込みを受け付けました。Joy Journeyの定期購入の確認後、アクセスを付与いたします。'
+                )
+                return redirect('application:application_pending', application_id=application.id)
+    else:
+        form = SalonApplicationForm()
+
+    return render(request, 'application/form.html', {
+        'form': form,
+        'page_title': '夜遊びサロン 申し込みフォーム'
+    })
+
+
+async def application_success(request, application_id):
+    """申し込み成功・アクセス付与済み"""
+    application = await _aget_application(SalonApplication, application_id)
+
+    if not application.access_granted:
+        messages.warning(request, 'アクセスがまだ付与されていません。')
+        return redirect('application:application_form')
+
+    return render(request, 'application/success.html', {
+        'application': application,
+        'page_title': '申し込み完了'
+    })
+
+
+async def application_pending(request, application_id):
+    """審査中ページ"""
+    application = await _aget_application(SalonApplication, application_id)
+
+    return render(request, 'application/pending.html', {
+        'application': application,
+        'status_payload': payload_for('salon', application),
+        'page_title': '審査中'
+    })
+
+
+@require_http_methods(["GET"])
+async def application_status(request, application_id):
+    """申し込みの状態（審査中ページのポーリング用JSON）"""
+    return status_response(await aget_status('salon', application_id))
+
+
+@require_http_methods(["GET", "POST"])
+@rate_limit_public_form('discount')
+@cache_public_form_page
+async def discount_application_form(request):
+    """値引き申請フォーム"""
+    if request.method == 'POST':
+        form = DiscountApplicationForm(request.POST)
+        if await _avalidate(form):
+            application = form.save(commit=False)
+            application.status = 'pending'
+            application.subscription_verified = False
+            application.discord_account_submitted_at = timezone.now()
+            if await _asave_public_application(form, application):
+                messages.success(
+                    request,
+                    '値引き申請を受け付けました。Joy Journeyの定期購入の確認後、値引きを適用いたします。'
+                )
+                return redirect('application:discount_application_pending', application_id=application.id)
+    else:
+        form = DiscountApplicationForm()
+
+    return render(request, 'application/discount_application_form.html', {
+        'form': form,
+        'page_title': '値引き申請フォーム'
+    })
+
+
+async def discount_application_pending(request, application_id):
+    """値引き申請審査中ページ"""
+    application = await _aget_application(DiscountApplication, application_id)
+
+    return render(request, 'application/discount_application_pending.html', {
+        'application': application,
+        'status_payload': payload_for('discount', application),
+        'page_title': '値引き申請審査中'
+    })
+
+
+@require_http_methods(["GET"])
+async def discount_application_status(request, application_id):
+    """値引き申請の状態（審査中ページのポーリング用JSON）"""
+    return status_response(await aget_status('discount', application_id))
+
+
+async def discount_application_success(request, application_id):
+    """値引き申請完了ページ"""
+    application = await _aget_application(DiscountApplication, application_id)
+
+    if not application.discount_applied:
+        messages.warning(request, '値引きがまだ適用されていません。')
+        return redirect('application:discount_application_form')
+
+    return render(request, 'application/discount_application_success.html', {
+        'application': application,
+        'page_title': '値引き申請完了'
+    })
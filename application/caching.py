@@ -0,0 +1,67 @@
+"""
+データ更新に連動したキャッシュのバージョン管理
+
+キャッシュキーにバージョン番号を含め、データが更新されたらバージョンを
+上げることで古いキャッシュを参照しないようにする（個別の削除は不要）。
+
+バージョン番号はAdminCounterテーブルの行に保持し、更新するトランザクションの中で
+UPDATE ... SET value = value + 1 で上げる（同時に更新しても失われない）。
+読み込み側はデータより先にバージョン番号を読むため、更新前のデータで作ったページが
+更新後のバージョン番号で保存されることはない。
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import AdminCounter, CSVUpload, DiscountApplication, SalonApplication
+
+
+# AdminCounterのキーの接頭辞（集計カウンターと区別する）
+VERSION_COUNTER_PREFIX = 'version:'
+
+# 申し込み・値引き申請・CSVアップロードのいずれかが更新されると上がるバージョン
+DATA_VERSION = 'data'
+
+# シグナルが送られない一括更新・一括削除のときだけ上がるバージョン
+# （1件ごとのキャッシュは保存時に個別に削除し、一括更新のときだけまとめて無効化する）
+BULK_VERSION = 'bulk'
+
+
+def get_version(name):
+    """バージョン番号を取得（未作成の場合は1）"""
+    version = AdminCounter.objects.filter(
+        key=VERSION_COUNTER_PREFIX + name
+    ).values_list('value', flat=True).first()
+    return version or 1
+
+
+def bump_version(name):
+    """バージョン番号を上げる（呼び出し元のトランザクションに含まれ、コミットと同時に反映される）"""
+    key = VERSION_COUNTER_PREFIX + name
+    with transaction.atomic():
+        updated = AdminCounter.objects.filter(key=key).update(value=F('value') + 1, updated_at=timezone.now())
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                AdminCounter.objects.create(key=key, value=2)
+        except IntegrityError:
+            # 同時に作成された場合
+            AdminCounter.objects.filter(key=key).update(value=F('value') + 1, updated_at=timezone.now())
+
+
+def versioned_key(name, *parts):
+    """バージョン番号を含むキャッシュキーを作成"""
+    return ':'.join(['application', name, f'v{get_version(name)}', *map(str, parts)])
+
+
+@receiver(post_save, sender=SalonApplication)
+@receiver(post_save, sender=DiscountApplication)
+@receiver(post_save, sender=CSVUpload)
+@receiver(post_delete, sender=SalonApplication)
+@receiver(post_delete, sender=DiscountApplication)
+@receiver(post_delete, sender=CSVUpload)
+def _bump_data_version(sender, **kwargs):
+    bump_version(DATA_VERSION)
@@ -0,0 +1,312 @@
+"""
+手動突合の候補検索
+
+CSVの「継続」の行から、申し込みに近い候補を順位付けして上位のみ返す。
+
+順位：
+1. メールアドレスの完全一致
+2. 姓名の完全一致
+3. メールアドレスのローカル部（@より前）または姓名の類似度（文字のトライグラムのJaccard係数）
+
+姓名は空白を除き、NFKC正規化とひらがな→カタカナの変換をしてから比較する（かな表記の揺れを吸収）。
+
+候補の索引（トライグラム→行）はアップロード時に突合で読み込んだ行から1回だけ作り、
+CSVと同じディレクトリ（candidates/<アップロードID>.pickle）に保存する。どのワーカープロセスも
+この保存した索引を読み込み、プロセス内では最近使った索引だけを保持する（CSVを読み直さない）。
+"""
+import heapq
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict, defaultdict
+from typing import NamedTuple
+
+from .matching import ACTIVE_STATUS, MatchingError, iter_csv_rows, row_entry
+
+
+logger = logging.getLogger(__name__)
+
+# 申し込みに近い候補の表示件数
+CANDIDATE_TOP_K = 20
+# 検索結果の1ページの件数と、検索結果の上限
+CANDIDATE_PAGE_SIZE = 20
+CANDIDATE_MAX_RESULTS = 500
+# 類似とみなす類似度の下限（順位付け）と、検索語のトライグラムが含まれる割合の下限（検索）
+MIN_SIMILARITY = 0.3
+MIN_SEARCH_COVERAGE = 0.6
+# プロセス内に保持する索引の数（最新のアップロードのみ使うため少なくてよい）
+INDEX_CACHE_SIZE = 2
+# 保存した索引のディレクトリ（CSVのディレクトリ内）
+INDEX_DIR_NAME = 'candidates'
+
+# 候補の理由（順位の高い順）
+REASON_EMAIL = 'メールアドレスが一致'
+REASON_NAME = '姓名が一致'
+REASON_SIMILAR_EMAIL = 'メールアドレスが類似'
+REASON_SIMILAR_NAME = '名前が類似'
+
+HIRAGANA_TO_KATAKANA = {code: code + 0x60 for code in range(ord('ぁ'), ord('ゖ') + 1)}
+
+
+class Candidate(NamedTuple):
+    entry: object
+    reason: str
+    similarity: float
+
+
+def normalize_name(last_name, first_name):
+    """姓名を比較用に正規化（空白除去・NFKC・ひらがな→カタカナ・小文字）"""
+    name = unicodedata.normalize('NFKC', f'{last_name}{first_name}')
+    return ''.join(name.split()).translate(HIRAGANA_TO_KATAKANA).lower()
+
+
+def local_part(email):
+    return email.split('@', 1)[0]
+
+
+def trigrams(text):
+    """前後に空白を補った文字のトライグラム（短い文字列でも先頭・末尾が一致すれば類似とみなせる）"""
+    if not text:
+        return frozenset()
+    padded = f'  {text} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class CandidateIndex:
+    """CSVの「継続」の行の索引（メールアドレス・姓名の完全一致と、トライグラムの転置索引）"""
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.by_row = {}
+        self.by_email = defaultdict(list)
+        self.by_name = defaultdict(list)
+        self.names = []
+        self.email_grams = defaultdict(list)
+        self.name_grams = defaultdict(list)
+        self.email_gram_counts = []
+        self.name_gram_counts = []
+        for i, entry in enumerate(self.entries):
+            name = normalize_name(entry.last_name, entry.first_name)
+            self.by_row[entry.row_number] = entry
+            self.by_email[entry.email].append(i)
+            self.by_name[name].append(i)
+            self.names.append(name)
+            self._add_grams(self.email_grams, self.email_gram_counts, i, trigrams(local_part(entry.email)))
+            self._add_grams(self.name_grams, self.name_gram_counts, i, trigrams(name))
+
+    @staticmethod
+    def _add_grams(postings, counts, i, grams):
+        counts.append(len(grams))
+        for gram in grams:
+            postings[gram].append(i)
+
+    @staticmethod
+    def _shared(postings, grams):
+        """トライグラムを共有する行ごとの共有数"""
+        shared = defaultdict(int)
+        for gram in grams:
+            for i in postings.get(gram, ()):
+                shared[i] += 1
+        return shared
+
+    def entry(self, row_number):
+        """行番号の「継続」の行（なければNone）"""
+        return self.by_row.get(row_number)
+
+    def rank(self, email, last_name, first_name, limit=CANDIDATE_TOP_K):
+        """
+        申し込みに近い候補を順位の高い順に返す
+
+        Returns:
+            list: Candidate のリスト（最大 limit 件）
+        """
+        email = email.lower().strip()
+        name = normalize_name(last_name, first_name)
+        # i -> (順位, -類似度, 理由)
+        scores = {}
+        for i in self.by_email.get(email, ()):
+            scores[i] = (0, 0.0, REASON_EMAIL)
+        for i in self.by_name.get(name, ()):
+            scores.setdefault(i, (1, 0.0, REASON_NAME))
+
+        for postings, counts, grams, reason in (
+            (self.email_grams, self.email_gram_counts, trigrams(local_part(email)), REASON_SIMILAR_EMAIL),
+            (self.name_grams, self.name_gram_counts, trigrams(name), REASON_SIMILAR_NAME),
+        ):
+            for i, shared in self._shared(postings, grams).items():
+                similarity = shared / (len(grams) + counts[i] - shared)
+                if similarity < MIN_SIMILARITY:
+                    continue
+                score = (2, -similarity, reason)
+                if i not in scores or score < scores[i]:
+                    scores[i] = score
+
+        best = heapq.nsmallest(
+            limit, scores.items(), key=lambda item: (item[1][0], item[1][1], self.entries[item[0]].row_number)
+        )
+        return [Candidate(self.entries[i], reason, abs(negative)) for i, (_, negative, reason) in best]
+
+    def search(self, query, limit=CANDIDATE_MAX_RESULTS):
+        """
+        検索語（メールアドレスまたは名前の一部）で候補を探す
+
+        メールアドレスの完全一致を先頭に、メールアドレスのローカル部・姓名に検索語のトライグラムが
+        多く含まれる順に返す。2文字以下の検索語は部分一致で探す。
+
+        Returns:
+            list: Candidate のリスト（最大 limit 件）
+        """
+        query = query.strip()
+        if not query:
+            return []
+        email_query = query.lower()
+        name_query = normalize_name(query, '')
+        scores = {}
+        for i in self.by_email.get(email_query, ()):
+            scores[i] = (0, 0.0, REASON_EMAIL)
+
+        if len(name_query) < 3:
+            # トライグラムでは探せないため部分一致（索引を使わずに全件を走査）
+            for i, entry in enumerate(self.entries):
+                if i in scores:
+                    continue
+                if name_query in self.names[i]:
+                    scores[i] = (1, -1.0, REASON_SIMILAR_NAME)
+                elif email_query in entry.email:
+                    scores[i] = (1, -1.0, REASON_SIMILAR_EMAIL)
+                if len(scores) >= limit:
+                    break
+        else:
+            for postings, text, reason in (
+                (self.email_grams, local_part(email_query), REASON_SIMILAR_EMAIL),
+                (self.name_grams, name_query, REASON_SIMILAR_NAME),
+            ):
+                # 検索語は前後の空白を補わない（語の途中に一致する行も探す）
+                grams = frozenset(text[i:i + 3] for i in range(len(text) - 2))
+                if not grams:
+                    continue
+                for i, shared in self._shared(postings, grams).items():
+                    coverage = shared / len(grams)
+                    if coverage < MIN_SEARCH_COVERAGE:
+                        continue
+                    score = (1, -coverage, reason)
+                    if i not in scores or score < scores[i]:
+                        scores[i] = score
+
+        best = heapq.nsmallest(
+            limit, scores.items(), key=lambda item: (item[1][0], item[1][1], self.entries[item[0]].row_number)
+        )
+        return [Candidate(self.entries[i], reason, abs(negative)) for i, (_, negative, reason) in best]
+
+
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+def _cache_key(csv_upload):
+    try:
+        stat = os.stat(csv_upload.file_path)
+    except (OSError, ValueError):
+        return None
+    return (csv_upload.id, csv_upload.file_path, stat.st_mtime_ns, stat.st_size)
+
+
+def candidate_index_path(csv_upload):
+    """保存した索引のファイルパス（CSVのディレクトリ内、アップロードIDごと）"""
+    return os.path.join(os.path.dirname(csv_upload.file_path), INDEX_DIR_NAME, f'{csv_upload.id}.pickle')
+
+
+def _store(key, index):
+    with _index_cache_lock:
+        _index_cache[key] = index
+        _index_cache.move_to_end(key)
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+
+
+def _save(csv_upload, key, index):
+    """索引をファイルに保存（一時ファイルに書いてから置き換えるため、読み込み中のワーカーに影響しない）"""
+    path = candidate_index_path(csv_upload)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(path), suffix='.tmp', delete=False) as f:
+            pickle.dump((key, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, path)
+    except OSError as e:
+        logger.warning('候補の索引を保存できませんでした: %s (%s)', path, e)
+
+
+def _load(csv_upload, key):
+    """保存した索引を読み込む（ないか、CSVが変更されている場合はNone）"""
+    try:
+        with open(candidate_index_path(csv_upload), 'rb') as f:
+            saved_key, index = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError) as e:
+        logger.warning('候補の索引を読み込めませんでした: %s (%s)', candidate_index_path(csv_upload), e)
+        return None
+    return index if saved_key == key else None
+
+
+def prime_candidate_index(csv_upload, entries):
+    """突合で読み込んだ「継続」の行から候補の索引を作って保存する（アップロード時）"""
+    key = _cache_key(csv_upload)
+    if key is not None:
+        index = CandidateIndex(entries)
+        _save(csv_upload, key, index)
+        _store(key, index)
+
+
+def remove_candidate_index(csv_upload):
+    """保存した索引を削除（CSVアップロードの削除時）"""
+    if not csv_upload.file_path:
+        return
+    try:
+        os.remove(candidate_index_path(csv_upload))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning('候補の索引を削除できませんでした: %s (%s)', candidate_index_path(csv_upload), e)
+
+
+def get_candidate_index(csv_upload):
+    """
+    CSVアップロードの候補の索引を取得
+
+    プロセス内になければ保存した索引を読み込む。保存した索引もない場合（アップロード時に
+    保存できなかった場合など）はCSVを読み込んで作り、保存する。
+
+    Returns:
+        CandidateIndex: ファイルがない・読み込めない場合はNone
+    """
+    if csv_upload is None or not csv_upload.file_path:
+        return None
+    key = _cache_key(csv_upload)
+    if key is None:
+        return None
+    with _index_cache_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            return index
+    index = _load(csv_upload, key)
+    if index is None:
+        try:
+            # 「継続」の行だけを残す（CSV全体をメモリに載せない）
+            entries = [
+                entry for entry in (
+                    row_entry(row_number, row)
+                    for row_number, row in enumerate(iter_csv_rows(csv_upload.file_path), 1)
+                )
+                if entry.status == ACTIVE_STATUS
+            ]
+        except MatchingError:
+            return None
+        index = CandidateIndex(entries)
+        _save(csv_upload, key, index)
+    _store(key, index)
+    return index
@@ -0,0 +1,52 @@
+"""
+条件付きGET（ETag / Last-Modified）用の検証子
+
+対象QuerySetの最新の更新日時（Max('updated_at')）と件数から検証子を作成する。
+更新は updated_at、削除は件数の変化で検知できるため、一覧を再取得・再描画
+しなくても変化の有無を1回の集計クエリで判定できる。
+追記のみのモデル（突合履歴など）は Meta.get_latest_by の日時を使用する。
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import http_date, quote_etag
+
+
+def queryset_state(queryset):
+    """(最新の更新日時, 件数) を1回の集計クエリで取得"""
+    latest_field = queryset.model._meta.get_latest_by or 'updated_at'
+    state = queryset.order_by().aggregate(latest=Max(latest_field), count=Count('pk'))
+    return state['latest'], state['count']
+
+
+def make_etag(querysets, extra=()):
+    """
+    QuerySetの状態からETagとLast-Modifiedを作成
+
+    Args:
+        querysets: ページに表示する対象のQuerySet（複数可）
+        extra: ページの内容に影響するその他の値（ナビゲーションの件数など）
+
+    Returns:
+        tuple: (ETag, Last-Modified（UNIX時刻、対象がなければNone）)
+    """
+    parts = []
+    latest_values = []
+    for queryset in querysets:
+        latest, count = queryset_state(queryset)
+        parts.append(f'{queryset.model._meta.label}:{latest.isoformat() if latest else ""}:{count}')
+        if latest:
+            latest_values.append(latest)
+    parts.extend(map(str, extra))
+    etag = quote_etag(hashlib.md5('|'.join(parts).encode()).hexdigest())
+    last_modified = int(max(latest_values).timestamp()) if latest_values else None
+    return etag, last_modified
+
+
+def set_validators(response, etag, last_modified=None):
+    """レスポンスに検証子を設定（ブラウザには毎回再検証させる）"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
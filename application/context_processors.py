@@ -0,0 +1,10 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import counters
+
+
+def nav_counters(request):
+    """管理画面ナビゲーションのバッジ用件数（テンプレートで参照された時のみ取得）"""
+    return {
+        'nav_counters': SimpleLazyObject(counters.get_counters),
+    }
@@ -0,0 +1,188 @@
+"""
+管理画面用の集計カウンター
+
+ナビゲーションのバッジやデータ管理画面の件数表示で毎回COUNTクエリを
+発行しないよう、AdminCounterテーブルに件数を保持して状態遷移のたびに
+差分で更新する。
+"""
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import AdminCounter, CSVUpload, DiscountApplication, SalonApplication, SubscriptionUser
+
+
+NAV_COUNTERS_CACHE_KEY = 'application:nav_counters'
+NAV_COUNTERS_CACHE_TIMEOUT = 60
+
+
+def _has_discord_name(row):
+    return bool(row['discord_display_name'] or row['discord_account_name'])
+
+
+# key: (モデル, 集計条件Q, 判定関数, 判定に使うフィールド)
+COUNTERS = {
+    'salon_total': (
+        SalonApplication, Q(), lambda row: True, (),
+    ),
+    'pending_review': (
+        SalonApplication,
+        Q(subscription_verified=False),
+        lambda row: not row['subscription_verified'],
+        ('subscription_verified',),
+    ),
+    'ready_to_grant': (
+        SalonApplication,
+        Q(subscription_verified=True, access_granted=False)
+        & (~Q(discord_display_name='') | ~Q(discord_account_name='')),
+        lambda row: row['subscription_verified'] and not row['access_granted'] and _has_discord_name(row),
+        ('subscription_verified', 'access_granted', 'discord_display_name', 'discord_account_name'),
+    ),
+    'revocation_required': (
+        SalonApplication,
+        Q(access_revocation_required=True, access_granted=True),
+        lambda row: row['access_revocation_required'] and row['access_granted'],
+        ('access_revocation_required', 'access_granted'),
+    ),
+    'discount_total': (
+        DiscountApplication, Q(), lambda row: True, (),
+    ),
+    'discount_revocations': (
+        DiscountApplication,
+        Q(discount_revocation_required=True, discount_applied=True),
+        lambda row: row['discount_revocation_required'] and row['discount_applied'],
+        ('discount_revocation_required', 'discount_applied'),
+    ),
+    'csv_total': (
+        CSVUpload, Q(), lambda row: True, (),
+    ),
+    'subscription_total': (
+        SubscriptionUser, Q(), lambda row: True, (),
+    ),
+}
+
+
+def _counters_for(model):
+    return {key: spec for key, spec in COUNTERS.items() if spec[0] is model}
+
+
+def _tracked_fields(model):
+    fields = set()
+    for _, _, _, spec_fields in _counters_for(model).values():
+        fields.update(spec_fields)
+    return sorted(fields)
+
+
+def _flags(model, row):
+    """行の値から各カウンターに該当するかを判定"""
+    return {key: bool(spec[2](row)) for key, spec in _counters_for(model).items()}
+
+
+def _locked_row(instance, fields):
+    """
+    保存前の値をDBから行ロック付きで取得
+
+    CounterTrackedModel.save が開くトランザクションの中で呼び出す。読み込み時点の値を
+    使うと、同じ行を同時に保存したときに両方が同じ変化を数えてしまうため、
+    ロックした時点の値との差分を計算する（同時の保存はロックの解放を待つ）。
+    """
+    return type(instance)._base_manager.select_for_update().filter(pk=instance.pk).values(*fields).first()
+
+
+def adjust(deltas):
+    """
+    カウンターを差分で更新する
+
+    トランザクション内で呼び出された場合はそのトランザクションに含まれ、
+    コミット後にナビゲーション用キャッシュを破棄する。
+
+    Args:
+        deltas: {カウンターキー: 増減数}
+    """
+    changed = False
+    now = timezone.now()
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        AdminCounter.objects.filter(key=key).update(value=F('value') + delta, updated_at=now)
+        changed = True
+    if changed:
+        transaction.on_commit(lambda: cache.delete(NAV_COUNTERS_CACHE_KEY))
+
+
+@contextmanager
+def track_save(instance):
+    """保存前後の状態を比較し、変化したカウンターを更新する"""
+    model = type(instance)
+    fields = _tracked_fields(model)
+    adding = instance._state.adding
+    before = None if adding else _locked_row(instance, fields)
+
+    yield
+
+    current = {field: instance.__dict__.get(field) for field in fields}
+    if before is not None:
+        # 遅延読み込みで保存されなかったフィールドは変化なしとみなす
+        for field in fields:
+            if field not in instance.__dict__:
+                current[field] = before[field]
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}), **current}
+
+    after_flags = _flags(model, current)
+    before_flags = _flags(model, before) if before is not None else dict.fromkeys(after_flags, False)
+    adjust({
+        key: int(after_flags[key]) - int(before_flags[key])
+        for key in after_flags
+    })
+
+
+@receiver(post_save, sender=CSVUpload)
+@receiver(post_save, sender=SubscriptionUser)
+def _count_created(sender, instance, created, **kwargs):
+    if created:
+        adjust({key: 1 for key in _counters_for(sender)})
+
+
+@receiver(post_delete, sender=SalonApplication)
+@receiver(post_delete, sender=DiscountApplication)
+@receiver(post_delete, sender=CSVUpload)
+@receiver(post_delete, sender=SubscriptionUser)
+def _count_deleted(sender, instance, **kwargs):
+    fields = _tracked_fields(sender)
+    row = getattr(instance, '_loaded_values', None) or {}
+    if not all(field in row for field in fields):
+        row = {field: instance.__dict__.get(field) for field in fields}
+    adjust({key: -int(flag) for key, flag in _flags(sender, row).items()})
+
+
+def rebuild():
+    """全カウンターを実データから再計算する"""
+    now = timezone.now()
+    with transaction.atomic():
+        for key, (model, condition, _, _) in COUNTERS.items():
+            AdminCounter.objects.update_or_create(
+                key=key,
+                defaults={'value': model.objects.filter(condition).count(), 'updated_at': now},
+            )
+    transaction.on_commit(lambda: cache.delete(NAV_COUNTERS_CACHE_KEY))
+
+
+def reset():
+    """全カウンターを0にする（全データ削除後に使用）"""
+    AdminCounter.objects.filter(key__in=COUNTERS).update(value=0, updated_at=timezone.now())
+    transaction.on_commit(lambda: cache.delete(NAV_COUNTERS_CACHE_KEY))
+
+
+def get_counters():
+    """カウンターを辞書で取得（キャッシュ優先）"""
+    counters = cache.get(NAV_COUNTERS_CACHE_KEY)
+    if counters is None:
+        counters = dict.fromkeys(COUNTERS, 0)
+        counters.update(AdminCounter.objects.filter(key__in=COUNTERS).values_list('key', 'value'))
+        cache.set(NAV_COUNTERS_CACHE_KEY, counters, NAV_COUNTERS_CACHE_TIMEOUT)
+    return counters
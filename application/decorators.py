@@ -1,4 +1,6 @@
+import re
 from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
 from django.shortcuts import redirect
 from django.conf import settings
 
@@ -21,3 +23,212 @@ def admin_login_required(view_func):
     
     return _wrapped_view
 
+
+def admin_api_required(view_func):
+    """管理用JSON APIへのアクセスに認証を要求するデコレータ（未認証の場合は401を返す）"""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if request.session.get('admin_authenticated', False):
+            return view_func(request, *args, **kwargs)
+        
+        from django.http import JsonResponse
+        return JsonResponse({'error': '認証が必要です。'}, status=401)
+    
+    return _wrapped_view
+
+
+CSRF_TOKEN_PLACEHOLDER = '__csrf_token__'
+_CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def _cached_page(cache_key, request):
+    """キャッシュしたページに利用者ごとのCSRFトークンを埋め込んで返す（なければNone）"""
+    from django.core.cache import cache
+    from django.http import HttpResponse
+    from django.middleware.csrf import get_token
+
+    cached = cache.get(cache_key)
+    if cached is None:
+        return None
+    content, content_type = cached
+    # 利用者ごとのCSRFトークンを埋め込む（必要に応じてCSRF Cookieも発行される）
+    return HttpResponse(content.replace(CSRF_TOKEN_PLACEHOLDER, get_token(request)), content_type=content_type)
+
+
+def _store_page(cache_key, response, timeout):
+    """ページのCSRFトークンをプレースホルダーに置き換えてキャッシュ"""
+    from django.core.cache import cache
+
+    if response.status_code != 200 or response.streaming:
+        return
+    content = _CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_TOKEN_PLACEHOLDER}\g<2>', response.content.decode(response.charset))
+    cache.set(cache_key, (content, response['Content-Type']), timeout)
+
+
+def cache_admin_page(view_func):
+    """
+    管理画面のGETレスポンスをキャッシュするデコレータ
+
+    キャッシュキーにデータバージョンを含めるため、申し込み・値引き申請・
+    CSVアップロードが更新されると自動的に新しいページが生成される。
+    CSRFトークンはプレースホルダーに置き換えて保存し（URLごとに1件）、返すときに埋め込む。
+    表示待ちのメッセージがある場合はキャッシュを使用しない。
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        from django.contrib.messages import get_messages
+        from .caching import DATA_VERSION, versioned_key
+
+        if request.method != 'GET' or len(get_messages(request)):
+            return view_func(request, *args, **kwargs)
+        
+        cache_key = versioned_key(DATA_VERSION, 'page', request.get_full_path())
+        cached = _cached_page(cache_key, request)
+        if cached is not None:
+            return cached
+        
+        response = view_func(request, *args, **kwargs)
+        _store_page(cache_key, response, getattr(settings, 'ADMIN_PAGE_CACHE_TIMEOUT', 600))
+        return response
+    
+    return _wrapped_view
+
+
+def conditional_admin_page(get_querysets):
+    """
+    管理画面のGETに条件付きGET（ETag）を適用するデコレータ
+
+    get_querysets(request, *args, **kwargs) が返すQuerySetの最新の更新日時と
+    件数、ナビゲーションの件数、CSRF Cookieから検証子を作成し、
+    If-None-Matchと一致すればテンプレートを描画せずに304を返す。
+    表示待ちのメッセージがある場合は検証子を付けない（304で古いメッセージが残るため）。
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            from django.contrib.messages import get_messages
+            from django.utils.cache import get_conditional_response
+            from . import counters
+            from .conditional import make_etag, set_validators
+
+            if request.method != 'GET' or len(get_messages(request)):
+                return view_func(request, *args, **kwargs)
+            
+            etag, _ = make_etag(
+                get_querysets(request, *args, **kwargs),
+                extra=[
+                    sorted(counters.get_counters().items()),
+                    request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+                ],
+            )
+            # 他のモデルの変化（ナビゲーションの件数）はLast-Modifiedに表れないため、ETagのみ使用する
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return set_validators(not_modified, etag)
+            
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                set_validators(response, etag)
+            return response
+        
+        return _wrapped_view
+    
+    return decorator
+
+
+def _rate_limited_response(request, scope):
+    """レート制限を超えていれば429のレスポンスを返す（制限内ならNone）"""
+    from django.shortcuts import render
+    from .ratelimit import check_rate_limit
+
+    retry_after = check_rate_limit(request, scope)
+    if not retry_after:
+        return None
+    response = render(request, 'application/rate_limited.html', {
+        'page_title': '送信回数の制限',
+        'retry_after': retry_after,
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit_public_form(scope):
+    """
+    公開フォームのPOSTにレート制限を適用するデコレータ（非同期ビューにも対応）
+
+    制限を超えた送信はフォームの検証やDBへの書き込みを行わずに429を返す。
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _async_wrapped_view(request, *args, **kwargs):
+                if request.method == 'POST':
+                    # キャッシュ（ファイル・DB）へのアクセスは同期処理のためスレッドで実行
+                    response = await sync_to_async(_rate_limited_response)(request, scope)
+                    if response is not None:
+                        return response
+                return await view_func(request, *args, **kwargs)
+            
+            return _async_wrapped_view
+        
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method == 'POST':
+                response = _rate_limited_response(request, scope)
+                if response is not None:
+                    return response
+            return view_func(request, *args, **kwargs)
+        
+        return _wrapped_view
+    
+    return decorator
+
+
+def _public_page_cache_key(request):
+    """キャッシュ対象のリクエストならキャッシュキーを返す（クエリ付き・メッセージ表示時は対象外）"""
+    from django.contrib.messages import get_messages
+
+    if request.method != 'GET' or request.GET or len(get_messages(request)):
+        return None
+    return f'application:public_page:{request.path}'
+
+
+def _public_page_timeout():
+    return getattr(settings, 'PUBLIC_PAGE_CACHE_TIMEOUT', 300)
+
+
+def cache_public_form_page(view_func):
+    """
+    公開フォームのGET表示をキャッシュするデコレータ（非同期ビューにも対応）
+
+    CSRFトークンは利用者ごとに異なるため、プレースホルダーに置き換えて保存し、
+    返すときにリクエストごとのトークンを埋め込む。
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _async_wrapped_view(request, *args, **kwargs):
+            cache_key = await sync_to_async(_public_page_cache_key)(request)
+            if cache_key is None:
+                return await view_func(request, *args, **kwargs)
+            cached = await sync_to_async(_cached_page)(cache_key, request)
+            if cached is not None:
+                return cached
+            response = await view_func(request, *args, **kwargs)
+            await sync_to_async(_store_page)(cache_key, response, _public_page_timeout())
+            return response
+        
+        return _async_wrapped_view
+    
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        cache_key = _public_page_cache_key(request)
+        if cache_key is None:
+            return view_func(request, *args, **kwargs)
+        cached = _cached_page(cache_key, request)
+        if cached is not None:
+            return cached
+        response = view_func(request, *args, **kwargs)
+        _store_page(cache_key, response, _public_page_timeout())
+        return response
+    
+    return _wrapped_view
@@ -0,0 +1,143 @@
+"""
+申し込み一覧のエクスポート（CSV / JSONL）
+
+一覧画面と同じ条件のQuerySetを受け取り、values_list()と
+iterator(chunk_size=...)で少しずつ読み込みながらストリーミングで出力する。
+件数が多くてもモデルインスタンスを作らず、全件をメモリに載せない。
+"""
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import SalonApplication
+
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# DBから一度に読み込む件数
+EXPORT_CHUNK_SIZE = 2000
+
+# レスポンスに書き出す単位（行数）
+EXPORT_FLUSH_ROWS = 500
+
+# (フィールド名, CSVヘッダー)
+EXPORT_COLUMNS = [
+    ('id', 'ID'),
+    ('last_name', '姓'),
+    ('first_name', '名'),
+    ('email', 'メールアドレス'),
+    ('status', 'ステータス'),
+    ('subscription_verified', '定期購入確認済み'),
+    ('match_method', '突合方法'),
+    ('matched_at', '突合日時'),
+    ('discord_display_name', 'Discord表示名'),
+    ('discord_username', 'Discordユーザー名'),
+    ('discord_account_name', 'Discordアカウント名'),
+    ('access_granted', 'アクセス付与'),
+    ('access_granted_at', 'アクセス付与日時'),
+    ('access_revocation_required', 'アクセス剥奪必要'),
+    ('access_revocation_required_at', '剥奪必要判定日時'),
+    ('access_revoked_at', 'アクセス剥奪日時'),
+    ('created_at', '申し込み日時'),
+]
+
+# CSVでは表示名に変換するフィールド
+CHOICE_LABELS = {
+    'status': dict(SalonApplication.STATUS_CHOICES),
+    'match_method': dict(SalonApplication.MATCH_METHOD_CHOICES),
+}
+
+
+# Excelが数式として解釈する先頭文字（公開フォームの入力値が数式として実行されるのを防ぐ）
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Echo:
+    """csv.writerの書き込み先（書き込まれた文字列をそのまま返す）"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(field, value):
+    if value is None:
+        return ''
+    if field in CHOICE_LABELS:
+        return CHOICE_LABELS[field].get(value, value)
+    if isinstance(value, bool):
+        return 'はい' if value else 'いいえ'
+    if hasattr(value, 'tzinfo'):
+        return timezone.localtime(value).strftime('%Y/%m/%d %H:%M')
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # 先頭に「'」を付けて文字列として表示させる
+        return "'" + value
+    return value
+
+
+def _json_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _batched(lines):
+    """複数行をまとめて書き出す（1行ずつだとレスポンスの書き込み回数が増えるため）"""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= EXPORT_FLUSH_ROWS:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _csv_lines(rows):
+    fields = [field for field, _ in EXPORT_COLUMNS]
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for _, header in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow([_csv_value(field, value) for field, value in zip(fields, row)])
+
+
+def _jsonl_lines(rows):
+    fields = [field for field, _ in EXPORT_COLUMNS]
+    for row in rows:
+        yield json.dumps(
+            {field: _json_value(value) for field, value in zip(fields, row)},
+            ensure_ascii=False,
+        ) + '\n'
+
+
+def stream_applications(queryset, fmt, filename):
+    """
+    申し込みをCSV（cp932、Excel用）またはJSONL（UTF-8）でストリーミング出力
+
+    CSVでは「=」「+」「-」「@」・タブ・CRで始まる文字列の先頭に「'」を付ける（JSONLはそのまま）。
+
+    Args:
+        queryset: 出力する申し込みのQuerySet（並び順もそのまま使う）
+        fmt: 'csv' または 'jsonl'
+        filename: 拡張子を除いたファイル名（ASCII）
+    """
+    rows = queryset.values_list(
+        *[field for field, _ in EXPORT_COLUMNS]
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    if fmt == 'csv':
+        # cp932で表せない文字（絵文字など）は「?」に置き換える
+        content = (
+            chunk.encode('cp932', errors='replace')
+            for chunk in _batched(_csv_lines(rows))
+        )
+        content_type = 'text/csv; charset=cp932'
+    else:
+        content = (chunk.encode('utf-8') for chunk in _batched(_jsonl_lines(rows)))
+        content_type = 'application/x-ndjson; charset=utf-8'
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    stamp = timezone.localtime().strftime('%Y%m%d_%H%M%S')
+    response['Content-Disposition'] = f'attachment; filename="{filename}_{stamp}.{fmt}"'
+    return response
@@ -0,0 +1,155 @@
+"""
+管理画面の一覧のフィルタ条件
+
+一覧画面・エクスポート・JSON APIで同じ条件を使うため、ビューから分けている。
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils.http import urlencode
+
+from .caching import DATA_VERSION, versioned_key
+from .models import DiscountApplication, SalonApplication
+
+
+# 申し込み一覧のフィルタ条件（フィルタ名 -> 値 -> 絞り込み条件）
+APPLICATION_LIST_FILTERS = {
+    'status': {
+        'pending': Q(status='pending'),
+        'verified': Q(status='verified'),
+        'completed': Q(status='completed'),
+    },
+    'verified': {
+        'yes': Q(subscription_verified=True),
+        'no': Q(subscription_verified=False),
+    },
+    'access': {
+        'yes': Q(access_granted=True),
+        'no': Q(access_granted=False),
+    },
+    'revocation': {
+        'required': Q(access_revocation_required=True, access_granted=True),
+        'revoked': Q(access_revoked_at__isnull=False),
+    },
+}
+FACET_CACHE_TIMEOUT = 300
+
+
+def application_list_condition(active_filters, exclude=None):
+    """有効なフィルタ条件を結合（excludeで指定したフィルタは除く）"""
+    condition = Q()
+    for name, value in active_filters.items():
+        if name == exclude:
+            continue
+        if name == 'status':
+            condition &= Q(status=value)
+        else:
+            condition &= APPLICATION_LIST_FILTERS[name][value]
+    return condition
+
+
+def application_list_facets(active_filters):
+    """
+    各フィルタ選択肢の件数を1回の集計クエリで取得
+
+    件数は「他のフィルタ条件はそのままで、その選択肢を選んだ場合」の件数。
+    フィルタの組み合わせごとにキャッシュする。
+    """
+    cache_key = versioned_key(DATA_VERSION, 'facets', urlencode(sorted(active_filters.items())))
+    facets = cache.get(cache_key)
+    if facets is not None:
+        return facets
+
+    aggregates = {}
+    for name, options in APPLICATION_LIST_FILTERS.items():
+        others = application_list_condition(active_filters, exclude=name)
+        aggregates[f'{name}__all'] = Count('pk', filter=others)
+        for value, condition in options.items():
+            aggregates[f'{name}__{value}'] = Count('pk', filter=others & condition)
+    result = SalonApplication.objects.aggregate(**aggregates)
+
+    facets = {name: {} for name in APPLICATION_LIST_FILTERS}
+    for alias, count in result.items():
+        name, value = alias.split('__', 1)
+        facets[name][value] = count
+    cache.set(cache_key, facets, FACET_CACHE_TIMEOUT)
+    return facets
+
+
+def application_list_filter_urls(active_filters):
+    """各フィルタ選択肢のリンク先（他のフィルタ条件を保持、選択中なら解除）"""
+    urls = {}
+    for name, options in APPLICATION_LIST_FILTERS.items():
+        others = {k: v for k, v in active_filters.items() if k != name}
+        urls[name] = {'all': '?' + urlencode(others)}
+        for value in options:
+            params = dict(others)
+            if active_filters.get(name) != value:
+                params[name] = value
+            urls[name][value] = '?' + urlencode(params)
+    return urls
+
+
+def application_list_active_filters(request):
+    """申し込み一覧のクエリパラメータから有効なフィルタ条件を取得"""
+    active_filters = {}
+    status_filter = request.GET.get('status')
+    if status_filter:
+        active_filters['status'] = status_filter
+    for name in ('verified', 'access', 'revocation'):
+        value = request.GET.get(name)
+        if value in APPLICATION_LIST_FILTERS[name]:
+            active_filters[name] = value
+    return active_filters
+
+
+def access_grant_list_queryset(access_filter):
+    """アクセス権付与状況チェック表の対象（突合済みの申し込み）"""
+    applications = SalonApplication.objects.filter(subscription_verified=True)
+    
+    # フィルタリング
+    if access_filter == 'yes':
+        applications = applications.filter(access_granted=True)
+    elif access_filter == 'no':
+        applications = applications.filter(access_granted=False)
+    
+    return applications.order_by('-created_at')
+
+
+def revocation_list_queryset(status_filter):
+    """アクセス剥奪管理画面の対象"""
+    # アクセス剥奪必要の申し込みを取得
+    applications = SalonApplication.objects.filter(
+        access_revocation_required=True,
+        access_granted=True
+    ).order_by('-access_revocation_required_at')
+    
+    # フィルタリング
+    if status_filter == 'revoked':
+        # 剥奪済みも表示
+        applications = SalonApplication.objects.filter(
+            access_revocation_required=True
+        ).order_by('-access_revocation_required_at')
+    elif status_filter == 'pending':
+        # 剥奪待ちのみ
+        applications = applications.filter(access_revoked_at__isnull=True)
+    
+    return applications
+
+
+def discount_application_list_queryset(status_filter, verified_filter, discount_filter):
+    """値引き申請一覧の対象"""
+    applications = DiscountApplication.objects.all()
+    
+    # フィルタリング
+    if status_filter:
+        applications = applications.filter(status=status_filter)
+    if verified_filter == 'yes':
+        applications = applications.filter(subscription_verified=True)
+    elif verified_filter == 'no':
+        applications = applications.filter(subscription_verified=False)
+    if discount_filter == 'yes':
+        applications = applications.filter(discount_applied=True)
+    elif discount_filter == 'no':
+        applications = applications.filter(discount_applied=False)
+    
+    return applications
@@ -1,10 +1,32 @@
+import zipfile
+
 from django import forms
-from .models import SalonApplication, SubscriptionUser, CSVUpload, DiscountApplication
+from .matching import MatchingError, zip_csv_members
+from .models import ACTIVE_APPLICATION_STATUSES, SalonApplication, SubscriptionUser, CSVUpload, DiscountApplication
+
+
+def _active_status(model, email, exclude_pk=None):
+    """同じメールアドレスの有効な申し込み・申請のステータスを取得（なければNone）"""
+    existing = model.objects.filter(email=email, status__in=ACTIVE_APPLICATION_STATUSES)
+    if exclude_pk:
+        existing = existing.exclude(pk=exclude_pk)
+    return existing.order_by().values_list('status', flat=True).first()
+
+
+async def _aactive_status(model, email, exclude_pk=None):
+    """_active_status の非同期版（非同期ビュー用）"""
+    existing = model.objects.filter(email=email, status__in=ACTIVE_APPLICATION_STATUSES)
+    if exclude_pk:
+        existing = existing.exclude(pk=exclude_pk)
+    return await existing.order_by().values_list('status', flat=True).afirst()
 
 
 class SalonApplicationForm(forms.ModelForm):
     """夜遊びサロン申し込みフォーム"""
     
+    # 非同期ビューではFalseにし、検証後に aduplicate_email_error で重複を確認する
+    check_duplicate_email = True
+    
     class Meta:
         model = SalonApplication
         fields = ['last_name', 'first_name', 'email']
@@ -46,33 +68,67 @@ class SalonApplicationForm(forms.ModelForm):
         email = self.cleaned_data.get('email')
         if email:
             email = email.lower().strip()
-            # 既存の申し込みをチェック（重複チェックは要件に応じて調整）
-            existing = SalonApplication.objects.filter(
-                email=email,
-                status__in=['pending', 'verified', 'approved', 'completed']
-            ).exclude(pk=self.instance.pk if self.instance.pk else None)
-            
-            if existing.exists():
-                latest = existing.first()
-                if latest.status == 'completed':
-                    raise forms.ValidationError(
-                        'このメールアドレスは既にアクセスが付与されています。'
-                    )
-                elif latest.status in ['pending', 'verified', 'approved']:
-                    raise forms.ValidationError(
-                        'このメールアドレスで既に申し込みがあります。審査中ですのでしばらくお待ちください。'
-                    )
+            if self.check_duplicate_email:
+                error = self.duplicate_email_error(email)
+                if error:
+                    raise error
         return email
 
+    def duplicate_email_error(self, email):
+        """
+        既存の有効な申し込みがあればエラーを返す
+
+        (email, status) のインデックスを使った1回の検索でステータスのみ取得する。
+        同時送信で検査をすり抜けた場合はDBの一意制約で保存時に検知する。
+        """
+        return self.duplicate_status_error(_active_status(SalonApplication, email, self.instance.pk))
+
+    async def aduplicate_email_error(self, email):
+        """duplicate_email_error の非同期版"""
+        return self.duplicate_status_error(await _aactive_status(SalonApplication, email, self.instance.pk))
+
+    def duplicate_status_error(self, status):
+        """既存の申し込みのステータスに応じたエラー（既存がなければNone）"""
+        if status is None:
+            return None
+        if status == 'completed':
+            return forms.ValidationError('このメールアドレスは既にアクセスが付与されています。')
+        return forms.ValidationError(
+            'このメールアドレスで既に申し込みがあります。審査中ですのでしばらくお待ちください。'
+        )
+
+
+class MultipleFileInput(forms.FileInput):
+    """複数のファイルを選択できるファイル入力"""
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    """複数のファイルを受け付けるフィールド（cleaned_data はファイルのリスト）"""
+
+    widget = MultipleFileInput
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)) and data:
+            return [single_file_clean(item, initial) for item in data]
+        return [single_file_clean(data or None, initial)]
+
 
 class CSVUploadForm(forms.ModelForm):
-    """CSVアップロードフォーム"""
-    csv_file = forms.FileField(
+    """CSVアップロードフォーム（複数のCSV・ZIPをまとめてアップロードできる）"""
+    # まとめてアップロードできるファイル数
+    MAX_FILES = 20
+
+    csv_file = MultipleFileField(
         label='CSVファイル',
-        help_text='Joy Journeyの定期購入の利用者CSVファイルをアップロードしてください。',
-        widget=forms.FileInput(attrs={
+        help_text=(
+            'Joy Journeyの定期購入の利用者CSVファイルをアップロードしてください。'
+            '月別・商品別などに分かれたCSVは、複数選択するかZIPにまとめてアップロードできます。'
+        ),
+        widget=MultipleFileInput(attrs={
             'class': 'form-control',
-            'accept': '.csv',
+            'accept': '.csv,.zip',
         })
     )
 
@@ -95,21 +151,42 @@ class CSVUploadForm(forms.ModelForm):
         self.fields['file_name'].required = False
 
     def clean_csv_file(self):
-        """CSVファイルの検証"""
-        csv_file = self.cleaned_data.get('csv_file')
-        if csv_file:
+        """CSV・ZIPファイルの検証"""
+        csv_files = self.cleaned_data.get('csv_file') or []
+        if len(csv_files) > self.MAX_FILES:
+            raise forms.ValidationError(f'一度にアップロードできるファイルは{self.MAX_FILES}個までです。')
+        for csv_file in csv_files:
+            name = csv_file.name.lower()
             # ファイル拡張子のチェック
-            if not csv_file.name.endswith('.csv'):
-                raise forms.ValidationError('CSVファイルをアップロードしてください。')
+            if not name.endswith(('.csv', '.zip')):
+                raise forms.ValidationError('CSVファイルまたはZIPファイルをアップロードしてください。')
             # ファイルサイズのチェック（10MB制限）
             if csv_file.size > 10 * 1024 * 1024:
                 raise forms.ValidationError('ファイルサイズは10MB以下にしてください。')
-        return csv_file
+            if name.endswith('.zip'):
+                try:
+                    zip_csv_members(zipfile.ZipFile(csv_file.file))
+                except zipfile.BadZipFile:
+                    raise forms.ValidationError(f'{csv_file.name}: ZIPファイルを読み込めません。')
+                except MatchingError as e:
+                    raise forms.ValidationError(f'{csv_file.name}: {e}')
+        return csv_files
+
+    @property
+    def is_batch(self):
+        """複数のファイルまたはZIPのアップロードかどうか"""
+        csv_files = self.cleaned_data.get('csv_file') or []
+        return len(csv_files) > 1 or any(f.name.lower().endswith('.zip') for f in csv_files)
 
     def save(self, commit=True):
         instance = super().save(commit=False)
         if self.cleaned_data.get('csv_file'):
-            instance.file_name = self.cleaned_data['csv_file'].name
+            names = [f.name for f in self.cleaned_data['csv_file']]
+            file_name = ', '.join(names)
+            max_length = CSVUpload._meta.get_field('file_name').max_length
+            if len(file_name) > max_length:
+                file_name = f'{names[0]} 他{len(names) - 1}件'[:max_length]
+            instance.file_name = file_name
         if commit:
             instance.save()
         return instance
@@ -175,6 +252,9 @@ class DiscordAccountForm(forms.ModelForm):
 class DiscountApplicationForm(forms.ModelForm):
     """値引き申請フォーム"""
     
+    # 非同期ビューではFalseにし、検証後に aduplicate_email_error で重複を確認する
+    check_duplicate_email = True
+    
     class Meta:
         model = DiscountApplication
         fields = ['last_name', 'first_name', 'email', 'discord_display_name', 'discord_username']
@@ -230,24 +310,30 @@ class DiscountApplicationForm(forms.ModelForm):
         email = self.cleaned_data.get('email')
         if email:
             email = email.lower().strip()
-            # 既存の申請をチェック
-            existing = DiscountApplication.objects.filter(
-                email=email,
-                status__in=['pending', 'verified', 'approved', 'completed']
-            ).exclude(pk=self.instance.pk if self.instance.pk else None)
-            
-            if existing.exists():
-                latest = existing.first()
-                if latest.status == 'completed':
-                    raise forms.ValidationError(
-                        'このメールアドレスは既に値引きが適用されています。'
-                    )
-                elif latest.status in ['pending', 'verified', 'approved']:
-                    raise forms.ValidationError(
-                        'このメールアドレスで既に申請があります。審査中ですのでしばらくお待ちください。'
-                    )
+            if self.check_duplicate_email:
+                error = self.duplicate_email_error(email)
+                if error:
+                    raise error
         return email
 
+    def duplicate_email_error(self, email):
+        """既存の有効な申請があればエラーを返す（SalonApplicationFormと同様）"""
+        return self.duplicate_status_error(_active_status(DiscountApplication, email, self.instance.pk))
+
+    async def aduplicate_email_error(self, email):
+        """duplicate_email_error の非同期版"""
+        return self.duplicate_status_error(await _aactive_status(DiscountApplication, email, self.instance.pk))
+
+    def duplicate_status_error(self, status):
+        """既存の申請のステータスに応じたエラー（既存がなければNone）"""
+        if status is None:
+            return None
+        if status == 'completed':
+            return forms.ValidationError('このメールアドレスは既に値引きが適用されています。')
+        return forms.ValidationError(
+            'このメールアドレスで既に申請があります。審査中ですのでしばらくお待ちください。'
+        )
+
     def clean_discord_display_name(self):
         """Discord表示名の検証"""
         discord_display_name = self.cleaned_data.get('discord_display_name')
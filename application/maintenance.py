@@ -0,0 +1,98 @@
+"""
+データ管理（全データ削除・CSVファイル整理）
+"""
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import counters
+from .candidates import INDEX_DIR_NAME, candidate_index_path
+from .caching import BULK_VERSION, DATA_VERSION, bump_version
+from .models import CSVUpload, DiscountApplication, MatchEvent, SalonApplication, SubscriptionUser
+
+
+logger = logging.getLogger(__name__)
+
+# 削除順（参照する側のテーブルを先に削除する）
+PURGE_ORDER = [
+    ('match_event_count', MatchEvent),
+    ('salon_count', SalonApplication),
+    ('discount_count', DiscountApplication),
+    ('csv_count', CSVUpload),
+    ('subscription_count', SubscriptionUser),
+]
+
+
+def csv_upload_dir():
+    return os.path.join(settings.MEDIA_ROOT, 'csv_uploads')
+
+
+def purge_all_data():
+    """
+    全データを高速に削除
+
+    モデルを1件ずつ読み込むQuerySet.delete()ではなく、テーブルごとに1回の
+    DELETE文を参照順に実行する（1トランザクション内）。
+    CSVファイル（と候補の索引）の削除はコミット後にバックグラウンドで行う。
+
+    Returns:
+        dict: テーブルごとの削除件数
+    """
+    uploads = list(CSVUpload.objects.exclude(file_path='').only('id', 'file_path'))
+    file_paths = [upload.file_path for upload in uploads] + [candidate_index_path(upload) for upload in uploads]
+    counts = {}
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for name, model in PURGE_ORDER:
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+                counts[name] = cursor.rowcount
+        # シグナルを経由しないため、カウンターとキャッシュを明示的に更新
+        counters.reset()
+        bump_version(DATA_VERSION)
+        bump_version(BULK_VERSION)
+        transaction.on_commit(lambda: remove_files_in_background(file_paths))
+    return counts
+
+
+def remove_files(file_paths):
+    """CSVファイルを削除（失敗しても続行）"""
+    removed = 0
+    for file_path in file_paths:
+        try:
+            os.remove(file_path)
+            removed += 1
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning('CSVファイルの削除に失敗しました: %s (%s)', file_path, e)
+    return removed
+
+
+def remove_files_in_background(file_paths):
+    """CSVファイルの削除をバックグラウンドスレッドで実行"""
+    if not file_paths:
+        return
+    thread = threading.Thread(target=remove_files, args=(file_paths,), daemon=True)
+    thread.start()
+
+
+def orphan_csv_files():
+    """どのCSVアップロードからも参照されていないCSVファイル（と候補の索引）の一覧"""
+    upload_dir = csv_upload_dir()
+    if not os.path.isdir(upload_dir):
+        return []
+    uploads = list(CSVUpload.objects.exclude(file_path='').only('id', 'file_path'))
+    referenced = {os.path.abspath(upload.file_path) for upload in uploads}
+    referenced.update(os.path.abspath(candidate_index_path(upload)) for upload in uploads)
+    orphans = []
+    for directory in (upload_dir, os.path.join(upload_dir, INDEX_DIR_NAME)):
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and os.path.abspath(entry.path) not in referenced:
+                    orphans.append(entry.path)
+    return orphans
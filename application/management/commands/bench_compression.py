@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from application.middleware import CompressionMiddleware, get_config
+
+from .bench_list_render import Command as ListRenderCommand
+
+
+class Command(BaseCommand):
+    help = '申し込み一覧（list.html）のレスポンスを圧縮した場合の転送量を計測します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='一覧の行数（既定: 5000）')
+
+    def handle(self, *args, **options):
+        if get_config() is None:
+            raise CommandError('RESPONSE_COMPRESSION が無効です。')
+
+        rows = options['rows']
+        html = render_to_string('application/list.html', ListRenderCommand()._build_context(rows))
+        request = RequestFactory().get('/list/', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        response = HttpResponse(html)
+        original = len(response.content)
+        middleware = CompressionMiddleware(lambda request: response)
+        start = time.perf_counter()
+        compressed = middleware(request)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        if compressed.get('Content-Encoding') != 'gzip':
+            raise CommandError('レスポンスが圧縮されませんでした。')
+        size = len(compressed.content)
+        self.stdout.write(f'list.html {rows}行')
+        self.stdout.write(f'  圧縮なし: {original / 1024:10.1f} KiB')
+        self.stdout.write(f'  gzip    : {size / 1024:10.1f} KiB（圧縮時間 {elapsed:.1f} ms）')
+        self.stdout.write(self.style.SUCCESS(f'  転送量の削減: {(1 - size / original) * 100:.1f}%（{original / size:.1f}分の1）'))
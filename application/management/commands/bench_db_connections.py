@@ -0,0 +1,77 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from application.models import SalonApplication
+
+
+class Command(BaseCommand):
+    help = '1リクエストあたりの応答時間を、リクエストごとの接続と持続的接続（プール）で比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help='設定ごとのリクエスト数（既定: 300）')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        settings_dict = connection.settings_dict
+        original = {key: settings_dict.get(key) for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+
+        profiles = [
+            ('リクエストごとに接続（CONN_MAX_AGE=0）', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}, False),
+            ('持続的接続＋ヘルスチェック', {'CONN_MAX_AGE': original['CONN_MAX_AGE'] or 60, 'CONN_HEALTH_CHECKS': True}, False),
+        ]
+        # プールの有無は接続時のOPTIONSで決まるため、プールを外して計測し、最後にプールありで計測
+        pool = settings_dict['OPTIONS'].pop('pool', None)
+        if pool:
+            profiles.append(('コネクションプール', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}, True))
+
+        # 計測用の申し込み（終了時に削除）
+        application = SalonApplication.objects.create(
+            last_name='ベンチ',
+            first_name='計測',
+            email=f'bench-{uuid.uuid4().hex}@example.invalid',
+        )
+        path = reverse('application:application_pending', args=[application.id])
+
+        results = []
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                for name, values, use_pool in profiles:
+                    if use_pool:
+                        settings_dict['OPTIONS']['pool'] = pool
+                    settings_dict.update(values)
+                    connection.close()
+                    results.append((name, self._measure(path, total)))
+        finally:
+            settings_dict.update(original)
+            if pool:
+                settings_dict['OPTIONS']['pool'] = pool
+            connection.close()
+            application.delete()
+
+        self.stdout.write(f'審査中ページ × {total}リクエスト（{connection.vendor}）')
+        for name, (median, p95) in results:
+            self.stdout.write(f'  {name:<24}: 中央値 {median:6.2f} ms   95%点 {p95:6.2f} ms')
+        before, after = results[0][1][0], results[1][1][0]
+        if after:
+            self.stdout.write(self.style.SUCCESS(f'  持続的接続による短縮: {before - after:.2f} ms/リクエスト（{before / after:.1f}倍）'))
+
+    def _measure(self, path, total):
+        """WSGIハンドラーと同じく、リクエストの前後で close_old_connections を実行して計測"""
+        client = Client()
+        timings = []
+        for _ in range(total):
+            start = time.perf_counter()
+            close_old_connections()
+            response = client.get(path)
+            close_old_connections()
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.status_code
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95)]
@@ -0,0 +1,98 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.conf import settings
+from django.utils import timezone
+
+from application.models import SalonApplication
+
+
+class Command(BaseCommand):
+    help = '申し込み一覧（list.html）の描画時間を、テンプレートキャッシュ無効／有効で比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='表示する申し込み件数（既定: 5000）')
+        parser.add_argument('--repeat', type=int, default=5, help='計測回数（既定: 5）')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        context = self._build_context(rows)
+
+        # 変更前相当：テンプレートを毎回パースし、断片キャッシュも使わない
+        uncached_templates = [{
+            **settings.TEMPLATES[0],
+            'OPTIONS': {
+                **settings.TEMPLATES[0]['OPTIONS'],
+                'loaders': [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ],
+            },
+        }]
+        dummy_caches = {
+            **settings.CACHES,
+            'templates': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        }
+        with override_settings(TEMPLATES=uncached_templates, CACHES=dummy_caches):
+            before = self._measure(context, repeat)
+
+        # 変更後：キャッシュ付きローダー＋行単位の断片キャッシュ
+        with override_settings(CACHES={
+            **settings.CACHES,
+            'templates': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'bench-list-render',
+                'OPTIONS': {'MAX_ENTRIES': rows * 2},
+            },
+        }):
+            cold = self._measure(context, 1)
+            warm = self._measure(context, repeat)
+
+        self.stdout.write(f'list.html {rows}行 × {repeat}回')
+        self.stdout.write(f'  キャッシュなし（変更前）      : 中央値 {before:8.1f} ms')
+        self.stdout.write(f'  キャッシュあり・初回（コールド）: {cold:8.1f} ms')
+        self.stdout.write(f'  キャッシュあり・2回目以降      : 中央値 {warm:8.1f} ms')
+        if warm:
+            self.stdout.write(self.style.SUCCESS(f'  短縮率: {before / warm:.1f}倍'))
+
+    def _build_context(self, rows):
+        now = timezone.now()
+        applications = [
+            SalonApplication(
+                id=i,
+                last_name='山田',
+                first_name=f'太郎{i}',
+                email=f'user{i}@example.com',
+                status=('pending', 'verified', 'completed')[i % 3],
+                subscription_verified=i % 3 != 0,
+                access_granted=i % 3 == 2,
+                match_method='email_and_name' if i % 3 else '',
+                created_at=now - timedelta(minutes=i),
+                updated_at=now - timedelta(minutes=i),
+            )
+            for i in range(1, rows + 1)
+        ]
+        request = RequestFactory().get('/list/')
+        request.session = {'admin_authenticated': True}
+        return {
+            'request': request,
+            'applications': applications,
+            'page_title': '申し込み一覧',
+            'facets': {},
+            'filter_urls': {},
+            'nav_counters': {},
+        }
+
+    def _measure(self, context, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render_to_string('application/list.html', context)
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,98 @@
+import csv
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from application.matching import MATCH_CONSUMERS, SubscriptionIndex, match_index, read_csv_rows
+from application.models import CSVUpload, SalonApplication
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'CSV突合の所要時間を計測します（突合の結果はロールバックして残しません）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='CSVの行数（既定: 20000）')
+        parser.add_argument('--applications', type=int, default=2000, help='未突合の申し込み件数（既定: 2000）')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        total = options['applications']
+
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        try:
+            with os.fdopen(fd, 'w', encoding='cp932', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['定期ステータス', '配送先 姓', '配送先 名', '配送先 名前', '注文者 メールアドレス', '注文番号'])
+                for i in range(rows):
+                    status = '継続' if i % 5 else '停止'
+                    writer.writerow([status, f'姓{i}', f'名{i}', f'姓{i} 名{i}', f'bench-{i}@example.invalid', f'B{i}'])
+
+            applications = [
+                # 半数はCSVの後半の行と一致、残りは一致なし
+                SalonApplication(
+                    last_name=f'姓{rows - 1 - i}' if i % 2 else f'未登録{i}',
+                    first_name=f'名{rows - 1 - i}' if i % 2 else '計測',
+                    email=f'bench-{rows - 1 - i}@example.invalid' if i % 2 else f'bench-none-{i}@example.invalid',
+                )
+                for i in range(total)
+            ]
+
+            start = time.perf_counter()
+            csv_rows = read_csv_rows(path)
+            read_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            index = SubscriptionIndex().add_rows(csv_rows)
+            index_ms = (time.perf_counter() - start) * 1000
+
+            # 照合のみ（DB更新を除く）：変更前相当（申し込みごとに全行を走査）と索引の検索
+            active = [row for row in csv_rows if row['定期ステータス'] == '継続']
+            start = time.perf_counter()
+            for application in applications:
+                self._scan(application, active)
+            scan_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            for application in applications:
+                index.active_by_email_name.get((application.email, application.last_name, application.first_name)) \
+                    or index.active_by_email.get(application.email)
+            lookup_ms = (time.perf_counter() - start) * 1000
+
+            # DB更新を含む突合全体（ロールバック）
+            try:
+                with transaction.atomic():
+                    SalonApplication.objects.bulk_create(applications)
+                    csv_upload = CSVUpload.objects.create(file_name='bench.csv', file_path=path, status='processing')
+                    start = time.perf_counter()
+                    counts = match_index(index, csv_upload)
+                    match_ms = (time.perf_counter() - start) * 1000
+                    raise _Rollback
+            except _Rollback:
+                pass
+        finally:
+            os.remove(path)
+
+        self.stdout.write(f'CSV {rows}行 × 未突合の申し込み {total}件（突合の種類 {len(MATCH_CONSUMERS)}）')
+        self.stdout.write(f'  CSVの読み込み           : {read_ms:8.1f} ms')
+        self.stdout.write(f'  索引の作成             : {index_ms:8.1f} ms')
+        self.stdout.write(f'  照合（全行を走査）       : {scan_ms:8.1f} ms')
+        self.stdout.write(f'  照合（索引）           : {lookup_ms:8.1f} ms')
+        self.stdout.write(f'  突合全体（DB更新を含む）  : {match_ms:8.1f} ms')
+        self.stdout.write('  件数: ' + '、'.join(f'{name}={count}' for name, count in counts.items()))
+
+    def _scan(self, application, active):
+        """変更前相当の照合（メール＋姓名 → メールのみ）"""
+        for row in active:
+            if (row['注文者 メールアドレス'].lower().strip() == application.email
+                    and row['配送先 姓'].strip() == application.last_name
+                    and row['配送先 名'].strip() == application.first_name):
+                return row
+        for row in active:
+            if row['注文者 メールアドレス'].lower().strip() == application.email:
+                return row
+        return None
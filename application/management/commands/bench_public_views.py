@@ -0,0 +1,84 @@
+import asyncio
+import importlib
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import clear_url_caches, reverse
+
+from application.models import SalonApplication
+
+
+class Command(BaseCommand):
+    help = '公開ページのスループットを、WSGI（同期ビュー）とASGI（非同期ビュー）で比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='ページごとのリクエスト数（既定: 500）')
+        parser.add_argument('--concurrency', type=int, default=20, help='同時リクエスト数（既定: 20）')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        concurrency = options['concurrency']
+
+        # 計測用の申し込み（終了時に削除）
+        application = SalonApplication.objects.create(
+            last_name='ベンチ',
+            first_name='計測',
+            email=f'bench-{uuid.uuid4().hex}@example.invalid',
+        )
+        pages = [
+            ('申し込みフォーム', reverse('application:application_form')),
+            ('審査中ページ', reverse('application:application_pending', args=[application.id])),
+        ]
+
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                self._reload_urls(async_views=False)
+                wsgi = {name: self._run_wsgi(path, total, concurrency) for name, path in pages}
+                self._reload_urls(async_views=True)
+                asgi = {name: asyncio.run(self._run_asgi(path, total, concurrency)) for name, path in pages}
+        finally:
+            self._reload_urls(async_views=settings.ASYNC_PUBLIC_VIEWS)
+            application.delete()
+
+        self.stdout.write(f'{total}リクエスト × 同時{concurrency}')
+        for name, _ in pages:
+            self.stdout.write(
+                f'  {name:<10}: WSGI（同期） {wsgi[name]:8.1f} req/s   ASGI（非同期） {asgi[name]:8.1f} req/s'
+            )
+
+    def _reload_urls(self, async_views):
+        """ASYNC_PUBLIC_VIEWS に応じて公開ページのURLを同期版／非同期版に切り替える"""
+        with override_settings(ASYNC_PUBLIC_VIEWS=async_views):
+            importlib.reload(importlib.import_module('application.urls'))
+            importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    def _run_wsgi(self, path, total, concurrency):
+        """WSGIハンドラーをスレッドで同時実行（Passengerの複数スレッド相当）"""
+        def _get(_):
+            response = Client().get(path)
+            assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(_get, range(total)))
+        return total / (time.perf_counter() - start)
+
+    async def _run_asgi(self, path, total, concurrency):
+        """ASGIハンドラーを1つのイベントループで同時実行"""
+        semaphore = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def _get():
+            async with semaphore:
+                response = await client.get(path)
+                assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(_get() for _ in range(total)))
+        return total / (time.perf_counter() - start)
@@ -0,0 +1,134 @@
+import multiprocessing
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections, transaction
+from django.test.utils import override_settings
+
+from application.models import SalonApplication, SubscriptionUser
+from application.sqlite import PRODUCTION_PRAGMAS
+
+
+# 変更前（SQLiteの既定値）
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'delete',
+    'synchronous': 'full',
+}
+
+
+class Command(BaseCommand):
+    help = '大量のCSV取り込み中の一覧表示の応答時間を、SQLiteの既定設定と本番プロファイルで比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='書き込む定期購入ユーザー数（既定: 20000）')
+        parser.add_argument('--batch', type=int, default=500, help='1トランザクションあたりの件数（既定: 500）')
+        parser.add_argument('--readers', type=int, default=4, help='同時に一覧を読み込むプロセス数（既定: 4）')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('SQLiteのデータベースで実行してください。')
+
+        profiles = [
+            ('既定（journal_mode=delete）', DEFAULT_PRAGMAS),
+            ('本番プロファイル（WAL）', PRODUCTION_PRAGMAS),
+        ]
+        results = []
+        for name, pragmas in profiles:
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                # 既存の接続を閉じ、新しい接続でPRAGMAを適用する
+                # （journal_modeの変更は他の接続がない状態で行う必要があるため、先に1つだけ接続する）
+                connections.close_all()
+                connection.ensure_connection()
+                results.append((name, self._run(options['rows'], options['batch'], options['readers'])))
+        connections.close_all()
+
+        self.stdout.write(
+            f'定期購入ユーザー {options["rows"]}件（{options["batch"]}件ずつ）の書き込み中に {options["readers"]}プロセスで一覧を読み込み'
+        )
+        for name, result in results:
+            self.stdout.write(f'  {name}')
+            self.stdout.write(f'    書き込み時間: {result["write_seconds"]:.2f} 秒')
+            self.stdout.write(
+                f'    読み込み: {result["reads"]}回  中央値 {result["p50"]:.1f} ms  '
+                f'95%点 {result["p95"]:.1f} ms  最大 {result["max"]:.1f} ms'
+            )
+            if result['write_error']:
+                self.stdout.write(self.style.ERROR(f'    書き込み失敗: {result["write_error"]}'))
+            style = self.style.ERROR if result['errors'] else self.style.SUCCESS
+            self.stdout.write(style(f'    読み込みのロックエラー: {result["errors"]}回'))
+
+    def _run(self, rows, batch, readers):
+        prefix = f'bench-{uuid.uuid4().hex[:8]}-'
+        # 読み込みはPassengerのワーカーと同じく別プロセスで行う（forkの前に接続を閉じる）
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        done = context.Event()
+        results = context.Queue()
+        processes = [context.Process(target=_read, args=(done, results)) for _ in range(readers)]
+        for process in processes:
+            process.start()
+
+        write_error = ''
+        start = time.perf_counter()
+        try:
+            for offset in range(0, rows, batch):
+                with transaction.atomic():
+                    SubscriptionUser.objects.bulk_create([
+                        SubscriptionUser(
+                            email=f'{prefix}{i}@example.invalid',
+                            subscription_id=f'{prefix}{i}',
+                        )
+                        for i in range(offset, min(offset + batch, rows))
+                    ])
+        except DatabaseError as e:
+            write_error = f'{offset}件目で {e}'
+        write_seconds = time.perf_counter() - start
+        done.set()
+
+        timings = []
+        errors = 0
+        for _ in processes:
+            process_timings, process_errors = results.get()
+            timings.extend(process_timings)
+            errors += process_errors
+        for process in processes:
+            process.join()
+
+        # 計測用の行を削除（一括作成でシグナルを送っていないため、削除もシグナルなしで行う）
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {connection.ops.quote_name(SubscriptionUser._meta.db_table)} WHERE email LIKE %s',
+                [prefix + '%'],
+            )
+
+        timings.sort()
+        return {
+            'write_seconds': write_seconds,
+            'reads': len(timings),
+            'p50': statistics.median(timings) if timings else 0,
+            'p95': timings[int(len(timings) * 0.95)] if timings else 0,
+            'max': timings[-1] if timings else 0,
+            'errors': errors,
+            'write_error': write_error,
+        }
+
+
+def _read(done, results):
+    """書き込みが終わるまで申し込み一覧（先頭50件と件数）を繰り返し読み込む"""
+    timings = []
+    errors = 0
+    try:
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                list(SalonApplication.objects.order_by('-created_at').values('id', 'status')[:50])
+                SubscriptionUser.objects.count()
+            except DatabaseError:
+                errors += 1
+                continue
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        connection.close()
+        results.put((timings, errors))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from application.maintenance import orphan_csv_files, remove_files
+
+
+class Command(BaseCommand):
+    help = 'どのCSVアップロードからも参照されていないCSVファイル（media/csv_uploads）を削除します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='削除せずに対象ファイルを表示する')
+
+    def handle(self, *args, **options):
+        orphans = orphan_csv_files()
+        for file_path in orphans:
+            self.stdout.write(file_path)
+        if options['dry_run']:
+            self.stdout.write(f'削除対象: {len(orphans)}件')
+            return
+        removed = remove_files(orphans)
+        self.stdout.write(self.style.SUCCESS(f'{removed}件のCSVファイルを削除しました。'))
@@ -0,0 +1,95 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# 新しいプロセスでPassengerの起動と同じ処理を行い、段階ごとの所要時間を標準出力に書き出す
+STARTUP_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+setup_ms = (time.perf_counter() - start) * 1000
+warmup = {}
+if sys.argv[1] == '1':
+    from application.warmup import warmup as run_warmup
+    warmup = run_warmup()
+print(json.dumps({'setup_ms': setup_ms, 'warmup': warmup}))
+'''
+
+# python -X importtime の出力行（import time: 自身[us] | 累計[us] | モジュール名）
+IMPORT_TIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+class Command(BaseCommand):
+    help = '起動時のインポート時間（python -X importtime 相当）とウォームアップの所要時間を表示します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help='表示するモジュール数（既定: 15）')
+        parser.add_argument('--no-warmup', action='store_true', help='ウォームアップを実行しない')
+        parser.add_argument(
+            '--budget-ms', type=float, default=None,
+            help='起動（インポート＋ウォームアップ）の上限（ミリ秒）。超えた場合はエラー終了'
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT, '0' if options['no_warmup'] else '1'],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'起動に失敗しました:\n{result.stderr[-2000:]}')
+
+        imports = []
+        for line in result.stderr.splitlines():
+            match = IMPORT_TIME_RE.match(line)
+            if match:
+                self_us, cumulative_us, indent, module = match.groups()
+                imports.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+
+        total_import_ms = sum(self_us for _, self_us, _, _ in imports) / 1000
+        warmup_ms = sum(ms for ms in timings['warmup'].values() if ms is not None)
+        top = options['top']
+
+        self.stdout.write(f'起動（get_wsgi_application）: {timings["setup_ms"]:.1f} ms')
+        self.stdout.write(f'インポート合計（Python本体の起動を含む）: {total_import_ms:.1f} ms（{len(imports)}モジュール）')
+        if timings['warmup']:
+            self.stdout.write(f'ウォームアップ: {warmup_ms:.1f} ms')
+            for name, ms in timings['warmup'].items():
+                self.stdout.write(f'  {name:<18}: ' + (f'{ms:8.1f} ms' if ms is not None else '失敗'))
+
+        # パッケージごとの合計（自身の時間の合計）
+        packages = defaultdict(int)
+        for module, self_us, _, _ in imports:
+            packages[module.split('.')[0]] += self_us
+        self.stdout.write(f'\nパッケージ別（上位{top}）')
+        for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'  {package:<30} {self_us / 1000:8.1f} ms')
+
+        # 最上位のインポート（累計時間）
+        self.stdout.write(f'\n最上位のインポート（累計、上位{top}）')
+        roots = [item for item in imports if item[3] == 0]
+        for module, _, cumulative_us, _ in sorted(roots, key=lambda item: -item[2])[:top]:
+            self.stdout.write(f'  {module:<50} {cumulative_us / 1000:8.1f} ms')
+
+        # このプロジェクトのモジュール
+        own_packages = ('application', settings.ROOT_URLCONF.split('.')[0])
+        own = [item for item in imports if item[0].split('.')[0] in own_packages]
+        self.stdout.write('\nプロジェクトのモジュール（自身の時間）')
+        for module, self_us, _, _ in sorted(own, key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'  {module:<50} {self_us / 1000:8.1f} ms')
+
+        budget = options['budget_ms']
+        if budget is not None:
+            total = timings['setup_ms'] + warmup_ms
+            if total > budget:
+                raise CommandError(f'起動時間 {total:.1f} ms が上限 {budget:.1f} ms を超えています。')
+            self.stdout.write(self.style.SUCCESS(f'\n起動時間 {total:.1f} ms（上限 {budget:.1f} ms）'))
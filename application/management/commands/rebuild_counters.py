@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from application import counters
+
+
+class Command(BaseCommand):
+    help = '集計カウンター（AdminCounter）を実データから再計算します'
+
+    def handle(self, *args, **options):
+        counters.rebuild()
+        for key, value in counters.get_counters().items():
+            self.stdout.write(f'{key}: {value}')
+        self.stdout.write(self.style.SUCCESS('集計カウンターを再計算しました。'))
@@ -0,0 +1,599 @@
+"""
+CSVと申し込み・値引き申請の突合
+
+CSVを1回だけ読み込んで索引（SubscriptionIndex）を作り、突合の種類（MATCH_CONSUMERS）ごとに
+対象の申し込みを索引で照合する。突合の種類を追加しても、CSVの読み込みと索引の作成は1回のままで、
+増えるのは申し込み1件あたり数回の辞書の検索のみ。
+
+照合の優先順位：
+- 未突合の申し込み：「継続」の行と メール＋姓名 → メールのみ → 姓名（候補が1件の場合のみ）
+- アクセス付与・値引き適用済みの申し込み：「継続」の行とメールが一致すれば剥奪不要。
+  一致しない場合、「継続」以外の行と メール＋姓名 → メールのみ で一致すれば剥奪が必要
+
+同じキーの行が複数ある場合は、CSVで先に出現した行を使う。
+姓名のみの照合では、同じメールアドレスの行は1件の候補として数える（同じ人の複数の行を同姓同名の別人とみなさない）。
+
+複数のCSV・ZIPをまとめてアップロードした場合は、ファイル名順にすべての行を1つの索引にまとめてから
+1回だけ突合する（アップロードの順序で結果が変わらない）。「継続」の行とそれ以外の行は別に索引するため、
+どれか1つのファイルに「継続」の行があればその行が優先される（剥奪の対象にならない）。
+"""
+import contextlib
+import csv
+import io
+import os
+import re
+import zipfile
+from functools import partial
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DiscountApplication, MatchEvent, SalonApplication, SubscriptionUser
+
+
+# UTF-8を先に試す（cp932のファイルはUTF-8としては読めないが、UTF-8のファイルはcp932として誤って読めることがある）
+CSV_ENCODINGS = ['utf-8-sig', 'cp932', 'shift_jis']
+REQUIRED_COLUMNS = ['定期ステータス', '配送先 姓', '配送先 名', '配送先 名前', '注文者 メールアドレス']
+ACTIVE_STATUS = '継続'
+
+# 既知の「定期ステータス」（設定 CSV_SUBSCRIPTION_STATUSES で変更できる）。これ以外の値は検証で報告する
+DEFAULT_SUBSCRIPTION_STATUSES = ('継続', '停止', '休止', '解約', 'キャンセル')
+
+# 行の検証で報告する問題（key: 表示名）
+VALIDATION_PROBLEMS = {
+    'missing_email': '注文者 メールアドレスが空',
+    'invalid_email': '注文者 メールアドレスの形式が不正',
+    'missing_name': '配送先 姓・名が空',
+    'missing_status': '定期ステータスが空',
+    'unknown_status': '定期ステータスが不明',
+}
+# 問題ごとに保存する行番号・値の数
+VALIDATION_SAMPLE_SIZE = 20
+
+# メールアドレスの簡易チェック（行ごとに EmailValidator を使うと索引の作成より時間がかかるため）
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class MatchingError(Exception):
+    """CSVを突合に使用できない場合のエラー（メッセージは画面に表示する）"""
+
+
+class CSVEntry(NamedTuple):
+    """索引に登録するCSVの行（突合に使う項目のみ）"""
+    row_number: int
+    email: str
+    last_name: str
+    first_name: str
+    status: str
+    order_number: str
+
+
+# ZIPの中のCSVの上限（展開後の合計サイズはZIPのヘッダーの値で確認する）
+ZIP_MAX_MEMBERS = 50
+ZIP_MAX_UNCOMPRESSED_SIZE = 200 * 1024 * 1024
+
+
+# 文字コードの判定で一度に復号する大きさ（ファイル全体をメモリに載せない）
+DECODE_CHUNK_SIZE = 1024 * 1024
+
+
+def detect_csv_encoding(open_binary):
+    """
+    CSVの文字コードを判定し、ヘッダー行を返す（文字コードを順に試す）
+
+    ファイル全体を少しずつ復号して確認する。行は保持しない。
+
+    Args:
+        open_binary: 読み込み用のバイナリストリームを返すコンテキストマネージャーを作る関数
+            （文字コードを変えて読み直すたびに呼び出す）
+
+    Returns:
+        tuple: (文字コード, ヘッダー行のカラム名のリスト)
+    """
+    for enc in CSV_ENCODINGS:
+        with open_binary() as raw:
+            text = io.TextIOWrapper(raw, encoding=enc, newline='')
+            try:
+                header = next(csv.reader(text), [])
+                while text.read(DECODE_CHUNK_SIZE):
+                    pass
+                return enc, header
+            except UnicodeDecodeError:
+                continue
+            finally:
+                # アップロードされたファイルを閉じないよう、ストリームを切り離す
+                text.detach()
+    raise MatchingError('CSVファイルの読み込みに失敗しました。文字コードを確認してください。')
+
+
+@contextlib.contextmanager
+def open_csv_reader(open_binary, encoding):
+    """判定済みの文字コードでCSVを開き、行を1行ずつ返す DictReader を返す"""
+    with open_binary() as raw:
+        text = io.TextIOWrapper(raw, encoding=encoding, newline='')
+        try:
+            yield csv.DictReader(text)
+        finally:
+            text.detach()
+
+
+def iter_csv_rows(csv_file_path):
+    """
+    CSVファイルの行（dict）を1行ずつ返す
+
+    Raises:
+        MatchingError: ファイルがない、または文字コードを判定できない場合
+    """
+    open_binary = partial(open, csv_file_path, 'rb')
+    try:
+        encoding, _ = detect_csv_encoding(open_binary)
+        with open_csv_reader(open_binary, encoding) as reader:
+            yield from reader
+    except FileNotFoundError:
+        raise MatchingError('CSVファイルの読み込みに失敗しました。ファイルが見つかりません。')
+
+
+def read_csv_rows(csv_file_path):
+    """
+    CSVファイルを読み込む
+
+    Returns:
+        list: 行（dict）のリスト
+    """
+    return list(iter_csv_rows(csv_file_path))
+
+
+def check_columns(header, source_name=''):
+    """必要なカラムがすべてあるか確認"""
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in header]
+    if missing_columns:
+        prefix = f"{source_name}: " if source_name else ''
+        raise MatchingError(f"{prefix}必要なカラムが見つかりません: {', '.join(missing_columns)}")
+
+
+def zip_csv_members(archive):
+    """
+    ZIPの中のCSVの一覧（ファイル名順）
+
+    Raises:
+        MatchingError: CSVがない、または上限を超える場合
+    """
+    members = sorted(
+        (
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith('.csv')
+            and not os.path.basename(info.filename).startswith('.')
+            and not info.filename.startswith('__MACOSX/')
+        ),
+        key=lambda info: info.filename,
+    )
+    if not members:
+        raise MatchingError('ZIPファイルにCSVファイルが含まれていません。')
+    if len(members) > ZIP_MAX_MEMBERS:
+        raise MatchingError(f'ZIPファイルに含まれるCSVファイルは{ZIP_MAX_MEMBERS}個までです。')
+    if sum(info.file_size for info in members) > ZIP_MAX_UNCOMPRESSED_SIZE:
+        raise MatchingError(
+            f'ZIPファイルの展開後のサイズは{ZIP_MAX_UNCOMPRESSED_SIZE // (1024 * 1024)}MBまでです。'
+        )
+    return members
+
+
+def upload_sources(uploaded_files):
+    """
+    アップロードされたCSV・ZIPを (ファイル名, open_binary) のリストにする（ファイル名順）
+
+    ZIPはディスクに展開せず、中のCSVを1つずつストリームで読み込む。
+    """
+    sources = []
+    for uploaded in uploaded_files:
+        if uploaded.name.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(uploaded.file)
+            except zipfile.BadZipFile:
+                raise MatchingError(f'{uploaded.name}: ZIPファイルを読み込めません。')
+            for info in zip_csv_members(archive):
+                sources.append((f'{uploaded.name}/{info.filename}', partial(archive.open, info)))
+        else:
+            sources.append((uploaded.name, partial(_rewind, uploaded.file)))
+    return sorted(sources, key=lambda source: source[0])
+
+
+def _rewind(file):
+    file.seek(0)
+    return contextlib.nullcontext(file)
+
+
+def row_entry(row_number, row):
+    """CSVの行（dict）を CSVEntry にする（短い行の欠けたカラムは空文字）"""
+    return CSVEntry(
+        row_number=row_number,
+        email=(row.get('注文者 メールアドレス') or '').lower().strip(),
+        last_name=(row.get('配送先 姓') or '').strip(),
+        first_name=(row.get('配送先 名') or '').strip(),
+        status=(row.get('定期ステータス') or '').strip(),
+        order_number=(row.get('注文番号') or '').strip(),
+    )
+
+
+def get_subscription_statuses():
+    """既知の「定期ステータス」を取得"""
+    return frozenset(getattr(settings, 'CSV_SUBSCRIPTION_STATUSES', DEFAULT_SUBSCRIPTION_STATUSES))
+
+
+class RowValidation:
+    """
+    CSVの行の検証（索引の作成と同じ走査で行う）
+
+    問題ごとの件数と、先頭の行（VALIDATION_SAMPLE_SIZE件まで）を [ファイル名, ファイル内の行番号] で記録する
+    （複数のCSVをまとめた場合も、元のファイルで行を探せるようにする）。
+    """
+
+    def __init__(self):
+        self.statuses = get_subscription_statuses()
+        self.invalid_rows = 0
+        self.problems = {}
+
+    def check(self, entry, source_name='', source_row=None):
+        """
+        行を検証して問題を記録
+
+        Args:
+            entry: CSVEntry
+            source_name: 行のあるファイル名
+            source_row: ファイル内の行番号（データ行の1始まり、省略時は entry.row_number）
+        """
+        problems = []
+        if not entry.email:
+            problems.append('missing_email')
+        elif not EMAIL_RE.match(entry.email):
+            problems.append('invalid_email')
+        if not entry.last_name or not entry.first_name:
+            problems.append('missing_name')
+        if not entry.status:
+            problems.append('missing_status')
+        elif entry.status not in self.statuses:
+            problems.append('unknown_status')
+        if not problems:
+            return
+        self.invalid_rows += 1
+        for key in problems:
+            problem = self.problems.setdefault(key, {'count': 0, 'rows': []})
+            problem['count'] += 1
+            if len(problem['rows']) < VALIDATION_SAMPLE_SIZE:
+                problem['rows'].append([source_name, source_row or entry.row_number])
+            if key == 'unknown_status':
+                values = problem.setdefault('values', [])
+                if entry.status not in values and len(values) < VALIDATION_SAMPLE_SIZE:
+                    values.append(entry.status)
+
+    def report(self):
+        """CSVUpload.validation_report に保存する内容（問題がなければ空）"""
+        if not self.invalid_rows:
+            return {}
+        return {'invalid_rows': self.invalid_rows, 'problems': self.problems}
+
+
+def _application_key(application):
+    return (
+        application.email.lower().strip(),
+        application.last_name.strip(),
+        application.first_name.strip(),
+    )
+
+
+class SubscriptionIndex:
+    """CSVの行の索引（「継続」とそれ以外に分けて、メール＋姓名・メール・姓名で検索する）"""
+
+    def __init__(self):
+        self.total_rows = 0
+        self.active_count = 0
+        self.active_entries = []  # 「継続」の行（行番号順、手動突合の候補の索引に使う）
+        self.active_by_email_name = {}
+        self.active_by_email = {}
+        self.active_by_name = {}  # (姓, 名) → {メールアドレス: 行}
+        self.inactive_by_email_name = {}
+        self.inactive_by_email = {}
+        self.validation = RowValidation()
+
+    def add_rows(self, rows, source_name=''):
+        """
+        行を順に登録し、同時に検証する
+
+        行番号はデータ行の1始まりで、複数のファイルを登録した場合は通し番号（まとめたCSVの行番号）。
+        検証の記録にはファイル名とファイル内の行番号を使う。
+        """
+        for source_row, row in enumerate(rows, 1):
+            self.total_rows += 1
+            entry = row_entry(self.total_rows, row)
+            self.validation.check(entry, source_name, source_row)
+            self.add(entry)
+        return self
+
+    def add(self, entry):
+        email_name = (entry.email, entry.last_name, entry.first_name)
+        if entry.status == ACTIVE_STATUS:
+            self.active_count += 1
+            self.active_entries.append(entry)
+            self.active_by_email_name.setdefault(email_name, entry)
+            self.active_by_email.setdefault(entry.email, entry)
+            # 複数のファイルに同じ人の行がある場合に同姓同名の候補が重複しないよう、メールアドレスごとに1行
+            self.active_by_name.setdefault((entry.last_name, entry.first_name), {}).setdefault(entry.email, entry)
+        else:
+            self.inactive_by_email_name.setdefault(email_name, entry)
+            self.inactive_by_email.setdefault(entry.email, entry)
+
+
+class MatchRun:
+    """1回の突合の状態（索引、突合履歴、突合の種類ごとの件数）"""
+
+    def __init__(self, csv_upload, index):
+        self.csv_upload = csv_upload
+        self.index = index
+        self.events = []
+        self.counts = {}
+        self.now = timezone.now()
+
+    def record(self, application, **fields):
+        """突合履歴を追加（最後にまとめて保存する）"""
+        self.events.append(MatchEvent.for_application(application, csv_upload=self.csv_upload, **fields))
+
+
+class MatchConsumer:
+    """
+    突合の種類（対象の申し込みと、索引で照合した結果の処理）
+
+    name はCSVUploadの件数のフィールド名。evaluate() が True を返した申し込みの数を保存する。
+    """
+    name = ''
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def evaluate(self, application, run):
+        raise NotImplementedError
+
+
+class PendingConsumer(MatchConsumer):
+    """未突合の申し込みを「継続」の行と突合"""
+
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+
+    def get_queryset(self):
+        return self.model.objects.filter(subscription_verified=False).order_by('created_at')
+
+    def evaluate(self, application, run):
+        email, last_name, first_name = _application_key(application)
+        index = run.index
+
+        # 優先1: メールアドレス + 名前（姓・名）の完全一致、優先2: メールアドレスのみの一致
+        entry, method = index.active_by_email_name.get((email, last_name, first_name)), 'email_and_name'
+        if entry is None:
+            entry, method = index.active_by_email.get(email), 'email_only'
+
+        # 優先3: 名前（姓・名）の完全一致（同姓同名が1人だけの場合のみ）
+        if entry is None:
+            candidates = list(index.active_by_name.get((last_name, first_name), {}).values())
+            if len(candidates) == 1:
+                entry, method = candidates[0], 'name_only'
+            elif candidates:
+                run.record(
+                    application,
+                    outcome='ambiguous',
+                    candidate_emails=[candidate.email for candidate in candidates],
+                )
+                return False
+
+        if entry is None:
+            # 申し込み自体は変更しないため保存しない
+            run.record(application, outcome='unmatched')
+            return False
+
+        subscription_user, created = SubscriptionUser.objects.get_or_create(
+            email=entry.email,
+            defaults={
+                'subscription_id': entry.order_number or f"CSV_{run.csv_upload.id}_{run.counts[self.name]}",
+                'is_active': True
+            }
+        )
+        application.subscription_verified = True
+        application.subscription_user = subscription_user
+        application.match_method = method
+        application.matched_at = run.now
+        application.csv_upload = run.csv_upload
+        application.status = 'verified'
+        application.save()
+        run.record(
+            application,
+            method=method,
+            outcome='matched',
+            matched_status=entry.status,
+            candidate_emails=[entry.email],
+            row_number=entry.row_number,
+        )
+        return True
+
+
+class RevocationConsumer(MatchConsumer):
+    """付与・適用済みの申し込みのうち、「継続」以外の行とのみ一致したものに剥奪が必要なフラグを立てる"""
+
+    def __init__(self, name, model, filters, flag_field):
+        self.name = name
+        self.model = model
+        self.filters = filters
+        self.flag_field = flag_field
+
+    def get_queryset(self):
+        return self.model.objects.filter(**self.filters).order_by('created_at')
+
+    def evaluate(self, application, run):
+        email, last_name, first_name = _application_key(application)
+        index = run.index
+
+        # 「継続」の行とメールアドレスが一致すれば剥奪不要
+        if email in index.active_by_email:
+            return False
+        entry = index.inactive_by_email_name.get((email, last_name, first_name)) or index.inactive_by_email.get(email)
+        if entry is None or getattr(application, self.flag_field):
+            return False
+
+        setattr(application, self.flag_field, True)
+        setattr(application, f'{self.flag_field}_at', run.now)
+        application.save()
+        run.record(
+            application,
+            outcome='revocation_required',
+            matched_status=entry.status,
+            candidate_emails=[entry.email],
+            row_number=entry.row_number,
+        )
+        return True
+
+
+# 突合の種類（この順に処理する）
+MATCH_CONSUMERS = [
+    PendingConsumer('salon_match_count', SalonApplication),
+    RevocationConsumer(
+        'access_revocation_count', SalonApplication,
+        # 剥奪済み（access_revoked_atが設定済み）の申し込みは除外（終着点）
+        {'access_granted': True, 'subscription_verified': True, 'access_revoked_at__isnull': True},
+        'access_revocation_required',
+    ),
+    PendingConsumer('discount_match_count', DiscountApplication),
+    RevocationConsumer(
+        'discount_revocation_count', DiscountApplication,
+        {'discount_applied': True, 'discount_revoked_at__isnull': True},
+        'discount_revocation_required',
+    ),
+]
+
+
+def match_index(index, csv_upload, consumers=None):
+    """
+    索引と申し込みを突合し、結果をCSVUploadに保存
+
+    Returns:
+        dict: 突合の種類（CSVUploadのフィールド名）ごとの件数
+    """
+    consumers = MATCH_CONSUMERS if consumers is None else consumers
+    run = MatchRun(csv_upload, index)
+    with transaction.atomic():
+        for consumer in consumers:
+            run.counts[consumer.name] = 0
+            for application in consumer.get_queryset():
+                if consumer.evaluate(application, run):
+                    run.counts[consumer.name] += 1
+        MatchEvent.objects.bulk_create(run.events)
+
+        for name, count in run.counts.items():
+            setattr(csv_upload, name, count)
+        csv_upload.matched_count = run.counts.get('salon_match_count', 0)
+        csv_upload.total_rows = index.total_rows
+        csv_upload.active_subscriptions = index.active_count
+        csv_upload.validation_report = index.validation.report()
+        csv_upload.status = 'completed'
+        csv_upload.save()
+    return run.counts
+
+
+def merged_fieldnames(headers):
+    """複数のCSVのカラム（出現順にすべて含める）"""
+    fieldnames = []
+    for header in headers:
+        for name in header:
+            if name not in fieldnames:
+                fieldnames.append(name)
+    return fieldnames
+
+
+@contextlib.contextmanager
+def open_merged_csv(path, fieldnames):
+    """複数のCSVの行をまとめて書き出すCSV（UTF-8）の DictWriter を返す"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        # 行のカラムがヘッダーより多い場合（キーがNone）は書き出さない
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval='', extrasaction='ignore')
+        writer.writeheader()
+        yield writer
+
+
+def _written(rows, writer):
+    """行をまとめたCSVに書き出しながら返す"""
+    for row in rows:
+        writer.writerow(row)
+        yield row
+
+
+def match_csv_upload(csv_file_path, csv_upload, consumers=None):
+    """
+    CSVファイルと申し込み・値引き申請を突合
+
+    エラーの場合はCSVUploadのステータスをエラーにする。
+
+    Returns:
+        tuple: (突合の種類ごとの件数, エラーメッセージ（エラーがなければ空文字）)
+    """
+    return match_csv_sources(
+        [(csv_upload.file_name, partial(open, csv_file_path, 'rb'))], csv_upload, consumers=consumers,
+    )
+
+
+def match_csv_sources(sources, csv_upload, merged_path=None, consumers=None):
+    """
+    複数のCSVの行を1つの索引にまとめて、申し込み・値引き申請と1回だけ突合
+
+    Args:
+        sources: (ファイル名, open_binary) のリスト（upload_sources() の戻り値）
+        csv_upload: CSVUploadインスタンス
+        merged_path: まとめたCSVの保存先。指定した場合は csv_upload.file_path にする
+
+    Returns:
+        tuple: (突合の種類ごとの件数, エラーメッセージ（エラーがなければ空文字）)
+    """
+    try:
+        # ヘッダーと文字コードを先に確認する（まとめたCSVのカラムを決めるため。行は保持しない）
+        encodings = []
+        for name, open_binary in sources:
+            source_name = name if len(sources) > 1 else ''
+            try:
+                encoding, header = detect_csv_encoding(open_binary)
+            except MatchingError as e:
+                raise MatchingError(f'{name}: {e}') if source_name else e
+            check_columns(header, source_name)
+            encodings.append((encoding, header))
+
+        # 各ファイルを1回だけ読み込み、索引への登録とまとめたCSVへの書き出しを同時に行う
+        index = SubscriptionIndex()
+        with contextlib.ExitStack() as stack:
+            writer = None
+            if merged_path:
+                writer = stack.enter_context(
+                    open_merged_csv(merged_path, merged_fieldnames(header for _, header in encodings))
+                )
+            for (name, open_binary), (encoding, _) in zip(sources, encodings):
+                rows_before, active_before = index.total_rows, index.active_count
+                with open_csv_reader(open_binary, encoding) as reader:
+                    index.add_rows(_written(reader, writer) if writer else reader, name)
+                csv_upload.source_files.append({
+                    'name': name,
+                    'rows': index.total_rows - rows_before,
+                    'active': index.active_count - active_before,
+                })
+        if merged_path:
+            csv_upload.file_path = merged_path
+        counts = match_index(index, csv_upload, consumers)
+    except Exception as e:
+        error_message = str(e) if isinstance(e, MatchingError) else f"エラーが発生しました: {str(e)}"
+        csv_upload.status = 'error'
+        csv_upload.error_message = error_message
+        csv_upload.save()
+        return {}, error_message
+
+    # 手動突合の候補の索引を、読み込んだ行から作っておく（CSVを読み直さない）
+    from .candidates import prime_candidate_index
+    prime_candidate_index(csv_upload, index.active_entries)
+    return counts, ''
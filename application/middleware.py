@@ -0,0 +1,65 @@
+"""
+レスポンスの圧縮（gzip）
+
+管理画面の一覧は同じ構造の行が繰り返される大きなHTMLのため、圧縮で転送量を大きく減らせる。
+サーバー（ColorfulBox）側ではDjangoのレスポンスが圧縮されないため、ミドルウェアで圧縮する。
+
+BREACH攻撃（圧縮後の長さの変化から、ページに含まれる秘密の値を推測する攻撃）への対策：
+- Djangoの GZipMiddleware と同じく、圧縮結果にランダムな長さのデータを加えて長さを偽装する
+  （max_random_bytes）
+- ページ内のCSRFトークンはDjangoがレスポンスごとに異なる値でマスクするため推測できないが、
+  skip_csrf_pages を有効にするとCSRFトークンを含むページは圧縮しない
+
+設定 RESPONSE_COMPRESSION が未設定（None）の場合はミドルウェアを使用しない。
+"""
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware.gzip import GZipMiddleware
+
+
+DEFAULT_CONFIG = {
+    'min_size': 1024,
+    'max_random_bytes': 100,
+    'skip_csrf_pages': False,
+    'content_types': ('text/html', 'text/csv', 'application/json', 'application/x-ndjson'),
+}
+
+# CSRFトークンのフォーム項目（テンプレートの {% csrf_token %} が出力する）
+CSRF_FIELD = b'name="csrfmiddlewaretoken"'
+
+
+def get_config():
+    """設定（RESPONSE_COMPRESSION）を既定値と合わせて取得。無効の場合はNone"""
+    config = getattr(settings, 'RESPONSE_COMPRESSION', None)
+    if config is None:
+        return None
+    return {**DEFAULT_CONFIG, **config}
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    一定以上の大きさのHTML・CSV・JSONをgzipで圧縮
+
+    ストリーミングのレスポンス（CSV・JSONLのエクスポート）は、送信する断片ごとに圧縮する。
+    """
+
+    def __init__(self, get_response):
+        config = get_config()
+        if config is None:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.min_size = config['min_size']
+        self.max_random_bytes = config['max_random_bytes']
+        self.skip_csrf_pages = config['skip_csrf_pages']
+        self.content_types = tuple(config['content_types'])
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if content_type not in self.content_types:
+            return response
+        if not response.streaming:
+            if len(response.content) < self.min_size:
+                return response
+            if self.skip_csrf_pages and CSRF_FIELD in response.content:
+                return response
+        return super().process_response(request, response)
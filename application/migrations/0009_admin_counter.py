@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:15
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def seed_counters(apps, schema_editor):
+    """既存データからカウンターの初期値を作成"""
+    AdminCounter = apps.get_model('application', 'AdminCounter')
+    SalonApplication = apps.get_model('application', 'SalonApplication')
+    DiscountApplication = apps.get_model('application', 'DiscountApplication')
+    CSVUpload = apps.get_model('application', 'CSVUpload')
+    SubscriptionUser = apps.get_model('application', 'SubscriptionUser')
+
+    counts = {
+        'salon_total': SalonApplication.objects.count(),
+        'pending_review': SalonApplication.objects.filter(subscription_verified=False).count(),
+        'ready_to_grant': SalonApplication.objects.filter(
+            Q(subscription_verified=True, access_granted=False)
+            & (~Q(discord_display_name='') | ~Q(discord_account_name=''))
+        ).count(),
+        'revocation_required': SalonApplication.objects.filter(
+            access_revocation_required=True, access_granted=True
+        ).count(),
+        'discount_total': DiscountApplication.objects.count(),
+        'discount_revocations': DiscountApplication.objects.filter(
+            discount_revocation_required=True, discount_applied=True
+        ).count(),
+        'csv_total': CSVUpload.objects.count(),
+        'subscription_total': SubscriptionUser.objects.count(),
+    }
+    AdminCounter.objects.bulk_create([
+        AdminCounter(key=key, value=value) for key, value in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0008_add_csv_match_counts_and_discount_revocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True, verbose_name='キー')),
+                ('value', models.IntegerField(default=0, verbose_name='件数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': '集計カウンター',
+                'verbose_name_plural': '集計カウンター',
+                'ordering': ['key'],
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
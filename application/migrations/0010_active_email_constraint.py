@@ -0,0 +1,114 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:27
+
+import logging
+from collections import defaultdict
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Replace
+from django.utils import timezone
+
+
+ACTIVE_STATUSES = ['pending', 'verified', 'approved', 'completed']
+
+# 重複時に残す申し込みの優先順（進んでいるステータスを優先し、同じなら新しい方）
+STATUS_PRIORITY = {'completed': 0, 'approved': 1, 'verified': 2, 'pending': 3}
+
+# 付与・適用済みかどうかのフィールド（付与・適用済みの申し込みは自動で拒否しない）
+GRANTED_FIELDS = {'SalonApplication': 'access_granted', 'DiscountApplication': 'discount_applied'}
+
+# 自動で拒否した申し込みの備考に追記する（戻すときにこの記録で対象を特定する）
+REJECT_NOTE = '\n[自動] 同じメールアドレスの重複のため拒否（一意制約の追加時、元のステータス: 審査中）'
+
+logger = logging.getLogger(__name__)
+
+
+def reject_duplicates(apps, schema_editor):
+    """
+    一意制約を追加する前に、既存の重複（同じメールアドレスの有効な申し込み）を解消
+
+    最も進んだ申し込みを1件残し、それ以外の「審査中」（未付与・未適用）の申し込みを「拒否」にして
+    備考に記録する。審査中以外の申し込みや、付与・適用済みの申し込みが重複している場合は
+    自動で解消せず、対象の一覧を表示してマイグレーションを中止する（管理画面で解消してから再実行）。
+    """
+    now = timezone.now()
+    updates = []
+    conflicts = []
+    for model_name, granted_field in GRANTED_FIELDS.items():
+        model = apps.get_model('application', model_name)
+        groups = defaultdict(list)
+        rows = model.objects.filter(status__in=ACTIVE_STATUSES).values_list(
+            'id', 'email', 'status', 'created_at', granted_field
+        )
+        for pk, email, status, created_at, granted in rows:
+            groups[email.strip().lower()].append((STATUS_PRIORITY[status], -created_at.timestamp(), pk, status, granted))
+
+        duplicate_ids = []
+        for email, entries in groups.items():
+            if len(entries) <= 1:
+                continue
+            entries.sort()
+            others = entries[1:]
+            if any(status != 'pending' or granted for _, _, _, status, granted in others):
+                conflicts.append(
+                    f"{model_name} {email}: "
+                    + ', '.join(f'id={pk}({status})' for _, _, pk, status, _ in entries)
+                )
+                continue
+            duplicate_ids.extend(pk for _, _, pk, _, _ in others)
+        updates.append((model, duplicate_ids))
+
+    if conflicts:
+        raise RuntimeError(
+            '同じメールアドレスの有効な申し込みが重複しています。'
+            '自動で拒否できない（審査中以外・付与済み）ため、管理画面で1件を残して解消してから再実行してください:\n'
+            + '\n'.join(conflicts)
+        )
+
+    for model, duplicate_ids in updates:
+        if not duplicate_ids:
+            continue
+        model.objects.filter(pk__in=duplicate_ids).update(
+            status='rejected',
+            notes=Concat(F('notes'), Value(REJECT_NOTE)),
+            updated_at=now,
+        )
+        logger.warning('%s: 重複のため拒否した申し込み id=%s', model.__name__, sorted(duplicate_ids))
+
+
+def restore_duplicates(apps, schema_editor):
+    """reject_duplicates で拒否した申し込みを「審査中」に戻す（備考の記録で特定する）"""
+    for model_name in GRANTED_FIELDS:
+        model = apps.get_model('application', model_name)
+        model.objects.filter(status='rejected', notes__endswith=REJECT_NOTE).update(
+            status='pending',
+            notes=Replace(F('notes'), Value(REJECT_NOTE), Value('')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0009_admin_counter'),
+    ]
+
+    operations = [
+        migrations.RunPython(reject_duplicates, restore_duplicates),
+        migrations.AddIndex(
+            model_name='discountapplication',
+            index=models.Index(fields=['email', 'status'], name='discount_app_email_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salonapplication',
+            index=models.Index(fields=['email', 'status'], name='salon_app_email_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='discountapplication',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('status__in', ['pending', 'verified', 'approved', 'completed'])), name='unique_active_discount_app_email', violation_error_message='このメールアドレスで既に申請があります。'),
+        ),
+        migrations.AddConstraint(
+            model_name='salonapplication',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('status__in', ['pending', 'verified', 'approved', 'completed'])), name='unique_active_salon_app_email', violation_error_message='このメールアドレスで既に申し込みがあります。'),
+        ),
+    ]
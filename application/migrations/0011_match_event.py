@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0010_active_email_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(blank=True, choices=[('email_and_name', 'メール+名前'), ('email_only', 'メールのみ'), ('name_only', '名前のみ'), ('manual', '手動'), ('', '未突合')], default='', max_length=20, verbose_name='突合方法')),
+                ('outcome', models.CharField(choices=[('matched', '突合成功'), ('ambiguous', '同姓同名の候補が複数'), ('unmatched', '一致なし'), ('revocation_required', '剥奪が必要'), ('manual', '手動突合')], max_length=20, verbose_name='結果')),
+                ('matched_status', models.CharField(blank=True, default='', help_text='突合したCSVの行の定期ステータス', max_length=50, verbose_name='定期ステータス')),
+                ('candidate_emails', models.JSONField(blank=True, default=list, help_text='突合したCSVの行（同姓同名の場合は候補）のメールアドレス', verbose_name='候補メールアドレス')),
+                ('row_number', models.PositiveIntegerField(blank=True, help_text='手動突合で選択したCSVの行番号', null=True, verbose_name='CSV行番号')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='記録日時')),
+                ('csv_upload', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='match_events', to='application.csvupload', verbose_name='CSVアップロード')),
+                ('discount_application', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='match_events', to='application.discountapplication', verbose_name='値引き申請')),
+                ('salon_application', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='match_events', to='application.salonapplication', verbose_name='サロン申し込み')),
+            ],
+            options={
+                'verbose_name': '突合履歴',
+                'verbose_name_plural': '突合履歴',
+                'ordering': ['-created_at', '-id'],
+                'get_latest_by': 'created_at',
+                'indexes': [models.Index(fields=['salon_application', '-created_at'], name='match_event_salon_idx'), models.Index(fields=['discount_application', '-created_at'], name='match_event_discount_idx'), models.Index(fields=['csv_upload', 'outcome'], name='match_event_upload_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0011_match_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvupload',
+            name='source_files',
+            field=models.JSONField(blank=True, default=list, help_text='突合に使用したCSV（ZIP内のCSVを含む）ごとの行数・継続ユーザー数', verbose_name='取り込んだファイル'),
+        ),
+    ]
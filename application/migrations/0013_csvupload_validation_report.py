@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0012_csvupload_source_files'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvupload',
+            name='validation_report',
+            field=models.JSONField(blank=True, default=dict, help_text='問題のある行の件数と、問題ごとの件数・先頭の行番号', verbose_name='行の検証結果'),
+        ),
+    ]
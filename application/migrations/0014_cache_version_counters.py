@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+VERSION_KEYS = ['version:data', 'version:bulk']
+
+
+def create_versions(apps, schema_editor):
+    """キャッシュのバージョン番号の行を作成（以前はキャッシュに保持していた）"""
+    AdminCounter = apps.get_model('application', 'AdminCounter')
+    for key in VERSION_KEYS:
+        AdminCounter.objects.get_or_create(key=key, defaults={'value': 1})
+
+
+def delete_versions(apps, schema_editor):
+    AdminCounter = apps.get_model('application', 'AdminCounter')
+    AdminCounter.objects.filter(key__in=VERSION_KEYS).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0013_csvupload_validation_report'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_versions, delete_versions),
+    ]
@@ -1,8 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Lower
 from django.core.validators import EmailValidator
 from django.utils import timezone
 
 
+# 同じメールアドレスで1件しか存在できない申し込み・申請のステータス
+ACTIVE_APPLICATION_STATUSES = ['pending', 'verified', 'approved', 'completed']
+
+
 class SubscriptionUser(models.Model):
     """Joy Journeyの定期購入利用者情報"""
     email = models.EmailField(
@@ -101,6 +107,18 @@ class CSVUpload(models.Model):
         verbose_name='エラーメッセージ',
         blank=True
     )
+    source_files = models.JSONField(
+        verbose_name='取り込んだファイル',
+        default=list,
+        blank=True,
+        help_text='突合に使用したCSV（ZIP内のCSVを含む）ごとの行数・継続ユーザー数'
+    )
+    validation_report = models.JSONField(
+        verbose_name='行の検証結果',
+        default=dict,
+        blank=True,
+        help_text='問題のある行の件数と、問題ごとの件数・先頭の行番号'
+    )
     uploaded_by = models.CharField(
         verbose_name='アップロード者',
         max_length=100,
@@ -124,7 +142,180 @@ class CSVUpload(models.Model):
         return f"{self.file_name} ({self.get_status_display()})"
 
 
-class SalonApplication(models.Model):
+class AdminCounter(models.Model):
+    """管理画面用の集計カウンター（COUNTクエリを避けるための非正規化テーブル）"""
+    key = models.CharField(
+        verbose_name='キー',
+        max_length=50,
+        unique=True
+    )
+    value = models.IntegerField(
+        verbose_name='件数',
+        default=0
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='更新日時',
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = '集計カウンター'
+        verbose_name_plural = '集計カウンター'
+        ordering = ['key']
+
+    def __str__(self):
+        return f"{self.key}: {self.value}"
+
+
+class CounterTrackedModel(models.Model):
+    """保存・削除時にAdminCounterを同一トランザクションで更新する抽象モデル"""
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 読み込み時の値を保持（削除時のカウンター更新に使用）
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .counters import track_save
+
+        with transaction.atomic():
+            with track_save(self):
+                super().save(*args, **kwargs)
+
+
+def _after_bulk_update(deltas):
+    """一括更新（シグナルが送られない）後のカウンター更新とキャッシュ無効化"""
+    from .caching import BULK_VERSION, DATA_VERSION, bump_version
+    from .counters import adjust
+
+    adjust(deltas)
+    bump_version(DATA_VERSION)
+    bump_version(BULK_VERSION)
+
+
+class SalonApplicationQuerySet(models.QuerySet):
+    """サロン申し込みの一括操作（1回のUPDATEで処理）"""
+
+    def grantable(self):
+        """アクセス付与可能（突合済み・Discordアカウント名あり・未付与）"""
+        return self.filter(
+            Q(subscription_verified=True, access_granted=False)
+            & (~Q(discord_display_name='') | ~Q(discord_account_name=''))
+        )
+
+    def grant_access(self):
+        """
+        付与可能な申し込みに一括でアクセスを付与
+
+        Returns:
+            int: アクセスを付与した件数
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            targets = self.grantable()
+            flagged = targets.filter(access_revocation_required=True).count()
+            granted = targets.update(
+                access_granted=True,
+                access_granted_at=now,
+                status='completed',
+                updated_at=now,
+            )
+            if granted:
+                _after_bulk_update({'ready_to_grant': -granted, 'revocation_required': flagged})
+        return granted
+
+    def revoke_access(self):
+        """
+        アクセス付与済みの申し込みから一括でアクセス権を剥奪
+
+        Returns:
+            int: アクセス権を剥奪した件数
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            targets = self.filter(access_granted=True)
+            # 剥奪必要フラグ付きの件数と、剥奪後に付与可能に戻る件数
+            before = targets.aggregate(
+                flagged=Count('pk', filter=Q(access_revocation_required=True)),
+                grantable=Count('pk', filter=(
+                    Q(subscription_verified=True)
+                    & (~Q(discord_display_name='') | ~Q(discord_account_name=''))
+                )),
+            )
+            revoked = targets.update(
+                access_granted=False,
+                access_granted_at=None,
+                access_revocation_required=False,
+                access_revoked_at=now,
+                status=Case(When(status='completed', then=Value('verified')), default=F('status')),
+                updated_at=now,
+            )
+            if revoked:
+                _after_bulk_update({
+                    'ready_to_grant': before['grantable'],
+                    'revocation_required': -before['flagged'],
+                })
+        return revoked
+
+
+class DiscountApplicationQuerySet(models.QuerySet):
+    """値引き申請の一括操作（1回のUPDATEで処理）"""
+
+    def applicable(self):
+        """値引き適用可能（突合済み・未適用）"""
+        return self.filter(subscription_verified=True, discount_applied=False)
+
+    def apply_discount(self):
+        """
+        適用可能な申請に一括で値引きを適用
+
+        Returns:
+            int: 値引きを適用した件数
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            targets = self.applicable()
+            flagged = targets.filter(discount_revocation_required=True).count()
+            applied = targets.update(
+                discount_applied=True,
+                discount_applied_at=now,
+                status='completed',
+                updated_at=now,
+            )
+            if applied:
+                _after_bulk_update({'discount_revocations': flagged})
+        return applied
+
+    def revoke_discount(self):
+        """
+        値引き適用済みの申請から一括で値引きを解除
+
+        Returns:
+            int: 値引きを解除した件数
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            targets = self.filter(discount_applied=True)
+            flagged = targets.filter(discount_revocation_required=True).count()
+            revoked = targets.update(
+                discount_applied=False,
+                discount_applied_at=None,
+                discount_revocation_required=False,
+                discount_revoked_at=now,
+                status=Case(When(status='completed', then=Value('verified')), default=F('status')),
+                updated_at=now,
+            )
+            if revoked:
+                _after_bulk_update({'discount_revocations': -flagged})
+        return revoked
+
+
+class SalonApplication(CounterTrackedModel):
     """夜遊びサロン申し込み情報"""
     STATUS_CHOICES = [
         ('pending', '審査中'),
@@ -292,10 +483,24 @@ class SalonApplication(models.Model):
         auto_now=True
     )
 
+    objects = SalonApplicationQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'サロン申し込み'
         verbose_name_plural = 'サロン申し込み'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['email', 'status'], name='salon_app_email_status_idx'),
+        ]
+        constraints = [
+            # 同時送信でも重複しないよう、有効な申し込みのメールアドレス（小文字化）を一意にする
+            models.UniqueConstraint(
+                Lower('email'),
+                condition=Q(status__in=ACTIVE_APPLICATION_STATUSES),
+                name='unique_active_salon_app_email',
+                violation_error_message='このメールアドレスで既に申し込みがあります。',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.last_name} {self.first_name} ({self.email}) - {self.get_status_display()}"
@@ -324,7 +529,7 @@ class SalonApplication(models.Model):
         self.save()
 
 
-class DiscountApplication(models.Model):
+class DiscountApplication(CounterTrackedModel):
     """値引き申請情報（既存の夜遊びサロン会員向け）"""
     STATUS_CHOICES = [
         ('pending', '審査中'),
@@ -477,10 +682,24 @@ class DiscountApplication(models.Model):
         auto_now=True
     )
 
+    objects = DiscountApplicationQuerySet.as_manager()
+
     class Meta:
         verbose_name = '値引き申請'
         verbose_name_plural = '値引き申請'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['email', 'status'], name='discount_app_email_status_idx'),
+        ]
+        constraints = [
+            # 同時送信でも重複しないよう、有効な申請のメールアドレス（小文字化）を一意にする
+            models.UniqueConstraint(
+                Lower('email'),
+                condition=Q(status__in=ACTIVE_APPLICATION_STATUSES),
+                name='unique_active_discount_app_email',
+                violation_error_message='このメールアドレスで既に申請があります。',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.last_name} {self.first_name} ({self.email}) - {self.get_status_display()}"
@@ -507,3 +726,107 @@ class DiscountApplication(models.Model):
         if self.status == 'completed':
             self.status = 'verified'
         self.save()
+
+
+class MatchEvent(models.Model):
+    """
+    突合の履歴（CSV突合・手動突合の結果を1件ずつ記録、追記のみ）
+
+    申し込み・値引き申請の match_notes に追記すると保存のたびに長い文字列を書き直すことになるため、
+    結果は小さな行として記録する。申し込みごと・CSVアップロードごとの履歴はインデックスで取得できる。
+    """
+    OUTCOME_CHOICES = [
+        ('matched', '突合成功'),
+        ('ambiguous', '同姓同名の候補が複数'),
+        ('unmatched', '一致なし'),
+        ('revocation_required', '剥奪が必要'),
+        ('manual', '手動突合'),
+    ]
+
+    # どちらか一方を設定（インデックスは下の複合インデックスを使用）
+    salon_application = models.ForeignKey(
+        SalonApplication,
+        verbose_name='サロン申し込み',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
+        related_name='match_events'
+    )
+    discount_application = models.ForeignKey(
+        DiscountApplication,
+        verbose_name='値引き申請',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
+        related_name='match_events'
+    )
+    csv_upload = models.ForeignKey(
+        CSVUpload,
+        verbose_name='CSVアップロード',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_index=False,
+        related_name='match_events'
+    )
+    method = models.CharField(
+        verbose_name='突合方法',
+        max_length=20,
+        choices=SalonApplication.MATCH_METHOD_CHOICES,
+        default='',
+        blank=True
+    )
+    outcome = models.CharField(
+        verbose_name='結果',
+        max_length=20,
+        choices=OUTCOME_CHOICES
+    )
+    matched_status = models.CharField(
+        verbose_name='定期ステータス',
+        max_length=50,
+        default='',
+        blank=True,
+        help_text='突合したCSVの行の定期ステータス'
+    )
+    candidate_emails = models.JSONField(
+        verbose_name='候補メールアドレス',
+        default=list,
+        blank=True,
+        help_text='突合したCSVの行（同姓同名の場合は候補）のメールアドレス'
+    )
+    row_number = models.PositiveIntegerField(
+        verbose_name='CSV行番号',
+        null=True,
+        blank=True,
+        help_text='手動突合で選択したCSVの行番号'
+    )
+    created_at = models.DateTimeField(
+        verbose_name='記録日時',
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = '突合履歴'
+        verbose_name_plural = '突合履歴'
+        ordering = ['-created_at', '-id']
+        # 追記のみのため、条件付きGETの検証子は作成日時と件数で判定する
+        get_latest_by = 'created_at'
+        indexes = [
+            models.Index(fields=['salon_application', '-created_at'], name='match_event_salon_idx'),
+            models.Index(fields=['discount_application', '-created_at'], name='match_event_discount_idx'),
+            models.Index(fields=['csv_upload', 'outcome'], name='match_event_upload_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_outcome_display()} ({self.created_at:%Y-%m-%d %H:%M})"
+
+    @classmethod
+    def for_application(cls, application, **fields):
+        """申し込み・値引き申請の突合履歴を作成（未保存、bulk_create でまとめて保存する）"""
+        if isinstance(application, DiscountApplication):
+            fields['discount_application'] = application
+        else:
+            fields['salon_application'] = application
+        return cls(**fields)
@@ -0,0 +1,109 @@
+"""
+申込者向けの状態確認（審査中ページのポーリング用）
+
+審査中ページは申込者が何度も再読み込みするため、状態だけを小さなJSONで返し、
+短時間キャッシュする。申し込み・値引き申請を保存・削除したときはその1件のキャッシュだけを削除し、
+一括更新（シグナルが送られない）のときは一括更新のバージョン番号でまとめて無効化する。
+他の申し込みの送信ではキャッシュは無効にならない（申し込みが集中する時間帯でもキャッシュが効く）。
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.urls import reverse
+
+from .caching import BULK_VERSION, versioned_key
+from .models import DiscountApplication, SalonApplication
+
+
+STATUS_KINDS = {
+    'salon': SalonApplication,
+    'discount': DiscountApplication,
+}
+
+# 状態の判定に使うフィールド（モデル全体を読み込まない）
+STATUS_FIELDS = {
+    'salon': ('id', 'status', 'subscription_verified', 'access_granted', 'discord_display_name', 'discord_account_name'),
+    'discount': ('id', 'status', 'subscription_verified', 'discount_applied'),
+}
+
+
+def build_payload(kind, row):
+    """状態のフィールドの辞書から状態のJSONを作成"""
+    status = row['status']
+    payload = {
+        'id': row['id'],
+        'status': status,
+        'status_display': dict(STATUS_KINDS[kind].STATUS_CHOICES).get(status, status),
+        'subscription_verified': row['subscription_verified'],
+    }
+    if kind == 'salon':
+        payload['completed'] = row['access_granted']
+        payload['discord_registered'] = bool(row['discord_display_name'] or row['discord_account_name'])
+        success_url_name = 'application:application_success'
+    else:
+        payload['completed'] = row['discount_applied']
+        success_url_name = 'application:discord_application_success'
+    payload['next_url'] = reverse(success_url_name, args=[row['id']]) if payload['completed'] else None
+    return payload
+
+
+def payload_for(kind, application):
+    """表示中の申し込みから状態のJSONを作成（審査中ページの初期値）"""
+    return build_payload(kind, {field: getattr(application, field) for field in STATUS_FIELDS[kind]})
+
+
+def _cache_key(kind, application_id):
+    return versioned_key(BULK_VERSION, 'status', kind, application_id)
+
+
+@receiver(post_save, sender=SalonApplication)
+@receiver(post_save, sender=DiscountApplication)
+@receiver(post_delete, sender=SalonApplication)
+@receiver(post_delete, sender=DiscountApplication)
+def _delete_cached_status(sender, instance, **kwargs):
+    """保存・削除された申し込みの状態のキャッシュを削除（コミット後）"""
+    kind = 'salon' if sender is SalonApplication else 'discount'
+    transaction.on_commit(lambda: cache.delete(_cache_key(kind, instance.pk)))
+
+
+def _timeout():
+    return getattr(settings, 'PUBLIC_STATUS_CACHE_TIMEOUT', 30)
+
+
+def get_status(kind, application_id):
+    """状態のJSONを取得（キャッシュ優先、存在しなければNone）"""
+    key = _cache_key(kind, application_id)
+    payload = cache.get(key)
+    if payload is None:
+        row = STATUS_KINDS[kind].objects.filter(id=application_id).values(*STATUS_FIELDS[kind]).first()
+        if row is None:
+            return None
+        payload = build_payload(kind, row)
+        cache.set(key, payload, _timeout())
+    return payload
+
+
+async def aget_status(kind, application_id):
+    """get_status の非同期版"""
+    key = await sync_to_async(_cache_key)(kind, application_id)
+    payload = await cache.aget(key)
+    if payload is None:
+        row = await STATUS_KINDS[kind].objects.filter(id=application_id).values(*STATUS_FIELDS[kind]).afirst()
+        if row is None:
+            return None
+        payload = build_payload(kind, row)
+        await cache.aset(key, payload, _timeout())
+    return payload
+
+
+def status_response(payload):
+    """状態のJSONレスポンス（ブラウザにはキャッシュさせない）"""
+    if payload is None:
+        return JsonResponse({'error': '見つかりません。'}, status=404)
+    response = JsonResponse(payload, json_dumps_params={'ensure_ascii': False})
+    response['Cache-Control'] = 'no-cache'
+    return response
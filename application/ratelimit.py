@@ -0,0 +1,125 @@
+"""
+公開フォームのレート制限（トークンバケット）
+
+送信元IPとメールアドレスごとにバケットを持ち、送信のたびにトークンを1つ消費する。
+トークンは時間とともに回復するため、短時間の連続送信（再送信など）は許容しつつ、
+継続的な大量送信だけを拒否できる。
+
+バケットは共有キャッシュ（Passengerの全ワーカーで共通）に保存する。
+読み込みと書き込みは原子的ではないため、同時送信では上限をわずかに超えて
+受け付けることがあるが、DBへの書き込みを抑える目的には十分である。
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+
+CACHE_KEY_PREFIX = 'application:ratelimit:'
+
+DEFAULT_LIMITS = {
+    'ip': {'capacity': 10, 'per_minute': 5},
+    'email': {'capacity': 3, 'per_minute': 1},
+}
+
+
+def get_limits():
+    """
+    設定（PUBLIC_FORM_RATE_LIMIT）を取得。Noneの項目は制限しない
+
+    Raises:
+        ImproperlyConfigured: capacity が1未満、または per_minute が0以下の場合
+    """
+    limits = getattr(settings, 'PUBLIC_FORM_RATE_LIMIT', DEFAULT_LIMITS)
+    limits = {name: limit for name, limit in (limits or {}).items() if limit}
+    for name, limit in limits.items():
+        if limit.get('capacity', 0) < 1 or limit.get('per_minute', 0) <= 0:
+            raise ImproperlyConfigured(
+                f'PUBLIC_FORM_RATE_LIMIT[{name!r}] の capacity は1以上、per_minute は0より大きくしてください'
+                '（制限しない場合は None）。'
+            )
+    return limits
+
+
+def _bucket_state(key, capacity, per_minute, now):
+    """
+    バケットの現在のトークン数を計算（消費はしない）
+
+    Returns:
+        tuple: (トークン数, 不足する場合は再試行までの秒数、足りる場合は0)
+    """
+    rate = per_minute / 60.0
+    state = cache.get(key)
+    if state is None:
+        tokens = float(capacity)
+    else:
+        tokens, updated = state
+        tokens = min(float(capacity), tokens + (now - updated) * rate)
+    if tokens < 1:
+        return tokens, (1 - tokens) / rate
+    return tokens, 0
+
+
+def _take_token(key, tokens, capacity, per_minute, now):
+    """バケットからトークンを1つ取り出して保存"""
+    # 満タンまで回復した後は不要なので、その時点で期限切れにする
+    timeout = math.ceil(capacity / (per_minute / 60.0)) + 1
+    cache.set(key, (tokens - 1, now), timeout)
+
+
+def client_ip(request):
+    """
+    送信元IP（リバースプロキシのヘッダーを使う場合は RATE_LIMIT_IP_HEADER で指定）
+
+    X-Forwarded-For形式の値は、信頼するプロキシ（RATE_LIMIT_TRUSTED_PROXIES、既定1）が
+    右端に追加したアドレスを使う。左側の値はクライアントが自由に送れるため使わない。
+    """
+    header = getattr(settings, 'RATE_LIMIT_IP_HEADER', 'REMOTE_ADDR')
+    value = request.META.get(header) or request.META.get('REMOTE_ADDR', '')
+    addresses = [address.strip() for address in value.split(',') if address.strip()]
+    if not addresses:
+        return ''
+    trusted_proxies = max(1, getattr(settings, 'RATE_LIMIT_TRUSTED_PROXIES', 1))
+    return addresses[max(0, len(addresses) - trusted_proxies)]
+
+
+def check_rate_limit(request, scope):
+    """
+    公開フォームの送信がレート制限内かを確認（フォームの検証やDBアクセスより前に呼ぶ）
+
+    すべてのバケットを確認してから、すべてが制限内の場合のみトークンを消費する
+    （メールアドレスの制限で拒否された送信でIPのトークンが減らないようにする）。
+
+    Args:
+        request: POSTリクエスト
+        scope: フォームの種類（バケットはフォームごとに分ける）
+
+    Returns:
+        int: 制限内なら0、超過した場合は再試行までの秒数（Retry-After用）
+    """
+    limits = get_limits()
+    identities = {
+        'ip': client_ip(request),
+        'email': request.POST.get('email', '').strip().lower(),
+    }
+    now = time.time()
+    buckets = []
+    retry_after = 0
+    for name, limit in limits.items():
+        identity = identities.get(name)
+        if not identity:
+            continue
+        digest = hashlib.md5(identity.encode()).hexdigest()
+        key = f'{CACHE_KEY_PREFIX}{scope}:{name}:{digest}'
+        tokens, wait = _bucket_state(key, limit['capacity'], limit['per_minute'], now)
+        retry_after = max(retry_after, wait)
+        buckets.append((key, tokens, limit))
+    if retry_after:
+        return max(1, math.ceil(retry_after))
+
+    for key, tokens, limit in buckets:
+        _take_token(key, tokens, limit['capacity'], limit['per_minute'], now)
+    return 0
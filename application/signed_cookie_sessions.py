@@ -0,0 +1,30 @@
+"""
+署名付きCookieセッション（DBセッションからの移行対応）
+
+SESSION_BACKEND=signed_cookies の場合のセッションエンジン。セッションの内容を
+署名付きCookieに保存するため、リクエストごとのセッションテーブルへのアクセスがなくなる。
+
+切り替え前に発行されたDBセッションのCookieを受け取った場合は、DBから1度だけ読み込んで
+署名付きCookieに書き換え、DBの行を削除する（ログインし直す必要はない）。
+"""
+from django.contrib.sessions.backends import db, signed_cookies
+
+
+class SessionStore(signed_cookies.SessionStore):
+
+    def load(self):
+        legacy_key = self.session_key
+        data = super().load()
+        # 署名付きの値には必ず「:」が含まれる。含まれない場合はDBセッションのキー
+        if not data and legacy_key and ':' not in legacy_key:
+            legacy = db.SessionStore(legacy_key)
+            data = legacy.load()
+            if data:
+                self.modified = True
+                legacy.delete(legacy_key)
+        return data
+
+    @classmethod
+    def clear_expired(cls):
+        """移行されずに残った期限切れのDBセッションを削除（clearsessionsコマンド用）"""
+        db.SessionStore.clear_expired()
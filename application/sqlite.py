@@ -0,0 +1,48 @@
+"""
+SQLiteの接続設定（本番プロファイル）
+
+接続を開くたびに設定 SQLITE_PRAGMAS のPRAGMAを実行する（未設定の場合は何もしない）。
+共有サーバーでPassengerの複数ワーカーがSQLiteを使う場合の推奨値は PRODUCTION_PRAGMAS。
+
+- journal_mode=wal: 書き込み中も読み込みがブロックされない（CSV照合中も一覧を表示できる）
+- synchronous=normal: WALではコミットごとのfsyncを省略しても破損しない（電源断時に直前のコミットが失われることはある）
+- busy_timeout: 他のワーカーの書き込み中は即座に「database is locked」にせず待機する（ミリ秒）
+- cache_size: 接続ごとのページキャッシュ（負の値はKiB単位）
+- mmap_size: DBファイルをメモリマップして読み込みのコピーを減らす（バイト）
+- temp_store=memory: 並べ替えや集計の一時データをメモリに置く
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+PRODUCTION_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 134217728,
+    'temp_store': 'memory',
+}
+
+
+def get_pragmas():
+    """設定（SQLITE_PRAGMAS）を取得。Noneの項目は実行しない"""
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    return {name: value for name, value in (pragmas or {}).items() if value is not None}
+
+
+def apply_pragmas(connection, pragmas):
+    """接続にPRAGMAを実行"""
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def _configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = get_pragmas()
+    if pragmas:
+        apply_pragmas(connection, pragmas)
@@ -0,0 +1,7 @@
+/* 一覧の一括操作：見出しのチェックボックスで全行を選択・解除 */
+function toggleAll(checkbox) {
+    const checkboxes = document.querySelectorAll('input[name="application_ids"]');
+    checkboxes.forEach(cb => {
+        cb.checked = checkbox.checked;
+    });
+}
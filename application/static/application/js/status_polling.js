@@ -0,0 +1,27 @@
+/* 審査中ページ：状態を定期的に確認し、変化があれば再読み込み（完了時は完了ページへ移動） */
+(function() {
+    var current = JSON.parse(document.getElementById('status-payload').textContent);
+    var url = document.currentScript.dataset.statusUrl;
+    var interval = 15000;
+
+    function poll() {
+        if (document.visibilityState !== 'visible') {
+            return;
+        }
+        fetch(url, {headers: {'Accept': 'application/json'}})
+            .then(function(response) { return response.ok ? response.json() : null; })
+            .then(function(latest) {
+                if (!latest) {
+                    return;
+                }
+                if (latest.next_url) {
+                    window.location.href = latest.next_url;
+                } else if (JSON.stringify(latest) !== JSON.stringify(current)) {
+                    window.location.reload();
+                }
+            })
+            .catch(function() {});
+    }
+
+    setInterval(poll, interval);
+})();
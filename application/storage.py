@@ -0,0 +1,59 @@
+"""
+静的ファイルの保存（ハッシュ付きファイル名と圧縮済みファイル）
+
+collectstatic の実行時に、ManifestStaticFilesStorage でファイル名に内容のハッシュを付けた上で、
+テキスト系のファイルの .gz と .br（brotliがインストールされている場合）を作成する。
+Apacheは .htaccess の設定で、ブラウザが対応している圧縮済みファイルをそのまま配信する。
+
+ファイル名は内容が変わると変わるため、ブラウザには長期間キャッシュさせてよい。
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # brotliがない場合は .gz のみ作成
+    brotli = None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    # 圧縮するファイルの拡張子（画像などの圧縮済みの形式は対象外）
+    compress_extensions = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+    # これより小さいファイルは圧縮しない（ヘッダーの分だけ大きくなることがある）
+    compress_min_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if name.endswith(self.compress_extensions):
+                for compressed_name in self._compress(name):
+                    yield name, compressed_name, True
+
+    def _compress(self, name):
+        """ファイルの .gz・.br を作成し、作成したファイル名を返す"""
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < self.compress_min_size:
+            return []
+
+        compressors = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            compressors.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+        created = []
+        for suffix, compress in compressors:
+            compressed = compress(content)
+            # 圧縮しても小さくならない場合は作成しない
+            if len(compressed) >= len(content):
+                continue
+            compressed_name = name + suffix
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+            created.append(compressed_name)
+        return created
@@ -1,3 +1,413 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from .matching import match_csv_upload
+from .ratelimit import check_rate_limit, client_ip
+from .models import CSVUpload, DiscountApplication, MatchEvent, SalonApplication
+
+
+# 画面のキャッシュをテストごとに分ける（バージョン番号はDBとともに戻るため、共有のキャッシュだと古いページを返す）
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    'templates': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-templates'},
+}
+
+HEADER = ['定期ステータス', '配送先 姓', '配送先 名', '配送先 名前', '注文者 メールアドレス', '注文番号']
+
+
+class MatchCSVUploadTests(TestCase):
+    """CSV突合（application/matching.py）の照合の優先順位と結果"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_csv(self, rows, encoding='cp932', header=HEADER):
+        """(定期ステータス, 姓, 名, メールアドレス) の行からCSVファイルを作成"""
+        number = len(os.listdir(self.tmpdir))
+        path = os.path.join(self.tmpdir, f'upload_{number}.csv')
+        lines = [','.join(header)]
+        for i, (status, last_name, first_name, email) in enumerate(rows, 1):
+            lines.append(','.join([status, last_name, first_name, f'{last_name} {first_name}', email, f'O{number}-{i}']))
+        with open(path, 'w', encoding=encoding, newline='') as f:
+            f.write('\r\n'.join(lines) + '\r\n')
+        return path
+
+    def match(self, rows, **kwargs):
+        path = self.write_csv(rows, **kwargs)
+        csv_upload = CSVUpload.objects.create(file_name=os.path.basename(path), file_path=path, status='processing')
+        counts, error_message = match_csv_upload(path, csv_upload)
+        csv_upload.refresh_from_db()
+        return csv_upload, counts, error_message
+
+    def salon(self, email, last_name='山田', first_name='太郎', **fields):
+        return SalonApplication.objects.create(last_name=last_name, first_name=first_name, email=email, **fields)
+
+    def discount(self, email, last_name='山田', first_name='太郎', **fields):
+        return DiscountApplication.objects.create(last_name=last_name, first_name=first_name, email=email, **fields)
+
+    def test_email_and_name_takes_precedence_over_email_only(self):
+        application = self.salon('taro@example.com')
+        csv_upload, counts, _ = self.match([
+            ('継続', '別人', '花子', 'taro@example.com'),
+            ('継続', '山田', '太郎', 'TARO@example.com'),
+        ])
+        application.refresh_from_db()
+        self.assertEqual(counts['salon_match_count'], 1)
+        self.assertEqual(application.match_method, 'email_and_name')
+        self.assertEqual(application.status, 'verified')
+        self.assertEqual(application.subscription_user.subscription_id, 'O0-2')
+        event = application.match_events.get()
+        self.assertEqual((event.outcome, event.row_number), ('matched', 2))
+
+    def test_email_only_takes_precedence_over_name_only(self):
+        application = self.salon('taro@example.com')
+        self.match([
+            ('継続', '山田', '太郎', 'other@example.com'),
+            ('継続', '別人', '花子', 'taro@example.com'),
+        ])
+        application.refresh_from_db()
+        self.assertEqual(application.match_method, 'email_only')
+        self.assertEqual(application.subscription_user.email, 'taro@example.com')
+
+    def test_name_only_matches_single_candidate(self):
+        application = self.salon('new-address@example.com')
+        self.match([('継続', '山田', '太郎', 'old-address@example.com')])
+        application.refresh_from_db()
+        self.assertEqual(application.match_method, 'name_only')
+        self.assertEqual(application.subscription_user.email, 'old-address@example.com')
+
+    def test_name_only_with_several_candidates_is_ambiguous(self):
+        application = self.salon('new-address@example.com')
+        _, counts, _ = self.match([
+            ('継続', '山田', '太郎', 'first@example.com'),
+            ('継続', '山田', '太郎', 'second@example.com'),
+        ])
+        application.refresh_from_db()
+        self.assertEqual(counts['salon_match_count'], 0)
+        self.assertFalse(application.subscription_verified)
+        event = application.match_events.get()
+        self.assertEqual(event.outcome, 'ambiguous')
+        self.assertEqual(event.candidate_emails, ['first@example.com', 'second@example.com'])
+
+    def test_name_only_candidates_with_same_email_count_once(self):
+        # 同じ人の行が複数ある場合は同姓同名の候補を1件とみなす（メールアドレスごとに1行）
+        application = self.salon('new-address@example.com')
+        self.match([
+            ('継続', '山田', '太郎', 'old-address@example.com'),
+            ('継続', '山田', '太郎', 'old-address@example.com'),
+        ])
+        application.refresh_from_db()
+        self.assertEqual(application.match_method, 'name_only')
+
+    def test_unmatched_records_event_and_keeps_application(self):
+        application = self.salon('taro@example.com')
+        _, counts, _ = self.match([
+            ('停止', '山田', '太郎', 'taro@example.com'),
+            ('継続', '別人', '花子', 'hanako@example.com'),
+        ])
+        application.refresh_from_db()
+        self.assertEqual(counts['salon_match_count'], 0)
+        self.assertEqual(application.status, 'pending')
+        self.assertEqual(application.match_events.get().outcome, 'unmatched')
+
+    def test_discount_application_uses_same_precedence(self):
+        by_email_and_name = self.discount('taro@example.com')
+        by_name = self.discount('hanako-new@example.com', '佐藤', '花子')
+        _, counts, _ = self.match([
+            ('継続', '別人', '次郎', 'taro@example.com'),
+            ('継続', '山田', '太郎', 'taro@example.com'),
+            ('継続', '佐藤', '花子', 'hanako@example.com'),
+        ])
+        by_email_and_name.refresh_from_db()
+        by_name.refresh_from_db()
+        self.assertEqual(counts['discount_match_count'], 2)
+        self.assertEqual(by_email_and_name.match_method, 'email_and_name')
+        self.assertEqual(by_name.match_method, 'name_only')
+
+    def test_access_revocation_required_for_inactive_row(self):
+        application = self.salon(
+            'taro@example.com', subscription_verified=True, access_granted=True, status='completed',
+        )
+        _, counts, _ = self.match([('停止', '山田', '太郎', 'taro@example.com')])
+        application.refresh_from_db()
+        self.assertEqual(counts['access_revocation_count'], 1)
+        self.assertTrue(application.access_revocation_required)
+        event = application.match_events.get()
+        self.assertEqual((event.outcome, event.matched_status), ('revocation_required', '停止'))
+
+    def test_access_revocation_suppressed_by_active_row(self):
+        application = self.salon(
+            'taro@example.com', subscription_verified=True, access_granted=True, status='completed',
+        )
+        _, counts, _ = self.match([
+            ('停止', '山田', '太郎', 'taro@example.com'),
+            ('継続', '別人', '花子', 'taro@example.com'),
+        ])
+        application.refresh_from_db()
+        self.assertEqual(counts['access_revocation_count'], 0)
+        self.assertFalse(application.access_revocation_required)
+        self.assertFalse(MatchEvent.objects.exists())
+
+    def test_discount_revocation_required_and_suppressed(self):
+        stopped = self.discount('stopped@example.com', discount_applied=True, subscription_verified=True)
+        active = self.discount('active@example.com', discount_applied=True, subscription_verified=True)
+        _, counts, _ = self.match([
+            ('解約', '山田', '太郎', 'stopped@example.com'),
+            ('停止', '山田', '太郎', 'active@example.com'),
+            ('継続', '山田', '太郎', 'active@example.com'),
+        ])
+        stopped.refresh_from_db()
+        active.refresh_from_db()
+        self.assertEqual(counts['discount_revocation_count'], 1)
+        self.assertTrue(stopped.discount_revocation_required)
+        self.assertFalse(active.discount_revocation_required)
+
+    def test_reads_cp932_and_utf8_files(self):
+        for encoding in ('cp932', 'utf-8', 'utf-8-sig'):
+            with self.subTest(encoding=encoding):
+                application = self.salon(f'{encoding}@example.com', '髙橋', '﨑子')
+                csv_upload, counts, error_message = self.match(
+                    [('継続', '髙橋', '﨑子', f'{encoding}@example.com')], encoding=encoding,
+                )
+                application.refresh_from_db()
+                self.assertEqual(error_message, '')
+                self.assertEqual(csv_upload.status, 'completed')
+                self.assertEqual(application.match_method, 'email_and_name')
+
+    def test_missing_columns_set_upload_to_error(self):
+        application = self.salon('taro@example.com')
+        csv_upload, counts, error_message = self.match(
+            [('継続', '山田', '太郎', 'taro@example.com')],
+            header=['定期ステータス', '配送先 姓', '配送先 名', '配送先 名前', 'メールアドレス', '注文番号'],
+        )
+        application.refresh_from_db()
+        self.assertEqual(counts, {})
+        self.assertEqual(csv_upload.status, 'error')
+        self.assertIn('注文者 メールアドレス', csv_upload.error_message)
+        self.assertEqual(error_message, csv_upload.error_message)
+        self.assertEqual(application.status, 'pending')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BatchAccessViewTests(TestCase):
+    """一括アクセス付与・剥奪（views.batch_access_grant / batch_access_revoke）の対象と対象外の件数"""
+
+    def setUp(self):
+        cache.clear()
+        session = self.client.session
+        session['admin_authenticated'] = True
+        session.save()
+
+    def salon(self, email, **fields):
+        return SalonApplication.objects.create(last_name='山田', first_name='太郎', email=email, **fields)
+
+    def post(self, url_name, applications=(), **data):
+        response = self.client.post(
+            reverse(url_name), {'application_ids': [str(application.id) for application in applications], **data},
+        )
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+    def test_grant_skips_ineligible_applications(self):
+        grantable = self.salon('grantable@example.com', subscription_verified=True, discord_display_name='taro')
+        unverified = self.salon('unverified@example.com', discord_display_name='hanako')
+        no_discord = self.salon('no-discord@example.com', subscription_verified=True)
+        messages = self.post('application:batch_access_grant', [grantable, unverified, no_discord])
+        self.assertEqual(messages, ['1件の申し込みにアクセスを付与しました。（対象外: 2件）'])
+        self.assertEqual(
+            set(SalonApplication.objects.filter(access_granted=True).values_list('id', flat=True)), {grantable.id}
+        )
+        grantable.refresh_from_db()
+        self.assertEqual(grantable.status, 'completed')
+
+    def test_grant_does_not_grant_twice(self):
+        granted = self.salon(
+            'granted@example.com', subscription_verified=True, discord_display_name='taro', access_granted=True,
+        )
+        messages = self.post('application:batch_access_grant', [granted])
+        self.assertEqual(messages, ['0件の申し込みにアクセスを付与しました。（対象外: 1件）'])
+
+    def test_revoke_skips_applications_without_access(self):
+        granted = self.salon('granted@example.com', subscription_verified=True, access_granted=True)
+        not_granted = self.salon('not-granted@example.com', subscription_verified=True)
+        messages = self.post('application:batch_access_revoke', [granted, not_granted])
+        self.assertEqual(messages, ['1件の申し込みのアクセス権を剥奪しました。（対象外: 1件）'])
+        granted.refresh_from_db()
+        self.assertFalse(granted.access_granted)
+        self.assertIsNotNone(granted.access_revoked_at)
+
+    def test_revoke_all_only_targets_revocation_required(self):
+        flagged = self.salon('flagged@example.com', access_granted=True, access_revocation_required=True)
+        active = self.salon('active@example.com', access_granted=True)
+        messages = self.post('application:batch_access_revoke', scope='all')
+        self.assertEqual(messages, ['1件の申し込みのアクセス権を剥奪しました。'])
+        flagged.refresh_from_db()
+        active.refresh_from_db()
+        self.assertFalse(flagged.access_granted)
+        self.assertFalse(flagged.access_revocation_required)
+        self.assertTrue(active.access_granted)
+
+    def test_nothing_selected_warns(self):
+        messages = self.post('application:batch_access_grant')
+        self.assertEqual(messages, ['申し込みが選択されていません。'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AdminBulkActionTests(TestCase):
+    """管理サイトの一括操作（admin.py の actions）の処理件数と対象外件数の表示"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        session = self.client.session
+        session['admin_authenticated'] = True
+        session.save()
+
+    def run_action(self, model, action, objects):
+        response = self.client.post(
+            reverse(f'custom_admin:application_{model._meta.model_name}_changelist'),
+            {'action': action, '_selected_action': [str(obj.id) for obj in objects]},
+        )
+        self.assertEqual(response.status_code, 302)
+        return [(message.level_tag, str(message)) for message in get_messages(response.wsgi_request)]
+
+    def test_grant_access_reports_skipped(self):
+        grantable = SalonApplication.objects.create(
+            last_name='山田', first_name='太郎', email='grantable@example.com',
+            subscription_verified=True, discord_account_name='taro',
+        )
+        unverified = SalonApplication.objects.create(
+            last_name='佐藤', first_name='花子', email='unverified@example.com', discord_account_name='hanako',
+        )
+        messages = self.run_action(SalonApplication, 'grant_access_action', [grantable, unverified])
+        self.assertEqual(messages, [('warning', '1件の申し込みにアクセスを付与しました。（対象外のためスキップ: 1件）')])
+        grantable.refresh_from_db()
+        unverified.refresh_from_db()
+        self.assertTrue(grantable.access_granted)
+        self.assertFalse(unverified.access_granted)
+
+    def test_revoke_access_all_affected_is_success(self):
+        granted = SalonApplication.objects.create(
+            last_name='山田', first_name='太郎', email='granted@example.com', access_granted=True,
+        )
+        messages = self.run_action(SalonApplication, 'revoke_access_action', [granted])
+        self.assertEqual(messages, [('success', '1件の申し込みのアクセス権を剥奪しました。')])
+
+    def test_apply_discount_reports_skipped(self):
+        applicable = DiscountApplication.objects.create(
+            last_name='山田', first_name='太郎', email='applicable@example.com', subscription_verified=True,
+        )
+        applied = DiscountApplication.objects.create(
+            last_name='佐藤', first_name='花子', email='applied@example.com',
+            subscription_verified=True, discount_applied=True,
+        )
+        messages = self.run_action(DiscountApplication, 'apply_discount_action', [applicable, applied])
+        self.assertEqual(messages, [('warning', '1件の値引き申請に値引きを適用しました。（対象外のためスキップ: 1件）')])
+
+    def test_revoke_discount_reports_skipped(self):
+        applied = DiscountApplication.objects.create(
+            last_name='山田', first_name='太郎', email='applied@example.com', discount_applied=True,
+        )
+        not_applied = DiscountApplication.objects.create(
+            last_name='鈴木', first_name='次郎', email='not-applied@example.com',
+        )
+        messages = self.run_action(DiscountApplication, 'revoke_discount_action', [applied, not_applied])
+        self.assertEqual(messages, [('warning', '1件の値引き申請の値引きを解除しました。（対象外のためスキップ: 1件）')])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ApplicationExportTests(TestCase):
+    """申し込みのエクスポート（application/exports.py）の数式のエスケープ"""
+
+    def setUp(self):
+        cache.clear()
+        session = self.client.session
+        session['admin_authenticated'] = True
+        session.save()
+        self.application = SalonApplication.objects.create(
+            last_name='=HYPERLINK("http://example.com")', first_name='+1', email='taro@example.com',
+            discord_display_name='@taro', discord_username='-2', discord_account_name='\tname',
+        )
+
+    def export(self, fmt):
+        response = self.client.get(reverse('application:application_export', args=['list', fmt]))
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_escapes_formula_prefixes(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('csv').decode('cp932'))))
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertEqual(row['姓'], "'" + '=HYPERLINK("http://example.com")')
+        self.assertEqual(row['名'], "'+1")
+        self.assertEqual(row['Discord表示名'], "'@taro")
+        self.assertEqual(row['Discordユーザー名'], "'-2")
+        self.assertEqual(row['Discordアカウント名'], "'\tname")
+        self.assertEqual(row['メールアドレス'], 'taro@example.com')
+
+    def test_jsonl_keeps_values_unchanged(self):
+        row = json.loads(self.export('jsonl').decode('utf-8'))
+        self.assertEqual(row['last_name'], '=HYPERLINK("http://example.com")')
+        self.assertEqual(row['first_name'], '+1')
+        self.assertEqual(row['discord_account_name'], '\tname')
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    PUBLIC_FORM_RATE_LIMIT={'ip': {'capacity': 2, 'per_minute': 1}, 'email': {'capacity': 1, 'per_minute': 1}},
+)
+class RateLimitTests(TestCase):
+    """公開フォームのレート制限（application/ratelimit.py）"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def request(self, email='', **meta):
+        return self.factory.post('/apply/', {'email': email}, **meta)
+
+    def test_rejected_email_does_not_consume_ip_token(self):
+        self.assertEqual(check_rate_limit(self.request('taro@example.com'), 'salon'), 0)
+        # メールアドレスの制限で拒否（IPのトークンは減らない）
+        self.assertGreater(check_rate_limit(self.request('TARO@example.com'), 'salon'), 0)
+        self.assertEqual(check_rate_limit(self.request('hanako@example.com'), 'salon'), 0)
+        # IPのトークン（2個）を使い切った
+        self.assertGreater(check_rate_limit(self.request('jiro@example.com'), 'salon'), 0)
+
+    def test_scopes_have_separate_buckets(self):
+        self.assertEqual(check_rate_limit(self.request('taro@example.com'), 'salon'), 0)
+        self.assertEqual(check_rate_limit(self.request('taro@example.com'), 'discount'), 0)
+
+    @override_settings(RATE_LIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_client_ip_uses_rightmost_forwarded_address(self):
+        request = self.request(HTTP_X_FORWARDED_FOR='198.51.100.1, 203.0.113.5', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client_ip(request), '203.0.113.5')
+        # 送信元が左側の値を変えても同じバケットになる
+        for spoofed in ('198.51.100.2', '198.51.100.3'):
+            request = self.request(HTTP_X_FORWARDED_FOR=f'{spoofed}, 203.0.113.5')
+            check_rate_limit(request, 'salon')
+        request = self.request(HTTP_X_FORWARDED_FOR='198.51.100.4, 203.0.113.5')
+        self.assertGreater(check_rate_limit(request, 'salon'), 0)
+
+    @override_settings(RATE_LIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR', RATE_LIMIT_TRUSTED_PROXIES=2)
+    def test_client_ip_skips_trusted_proxies(self):
+        request = self.request(HTTP_X_FORWARDED_FOR='198.51.100.1, 203.0.113.5, 192.0.2.10')
+        self.assertEqual(client_ip(request), '203.0.113.5')
+        request = self.request(HTTP_X_FORWARDED_FOR='203.0.113.5')
+        self.assertEqual(client_ip(request), '203.0.113.5')
+
+    @override_settings(RATE_LIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_client_ip_falls_back_to_remote_addr(self):
+        self.assertEqual(client_ip(self.request(REMOTE_ADDR='192.0.2.1')), '192.0.2.1')
@@ -1,17 +1,25 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'application'
 
+# ASGIで運用する場合は公開ページに非同期ビューを使用（WSGIでは起動時間短縮のためインポートしない）
+if getattr(settings, 'ASYNC_PUBLIC_VIEWS', False):
+    from . import async_views as public_views
+else:
+    public_views = views
+
 urlpatterns = [
     # 管理画面ログイン
     path('admin/login/', views.admin_login, name='admin_login'),
     path('admin/logout/', views.admin_logout, name='admin_logout'),
     
     # 申し込みフォーム
-    path('', views.application_form, name='application_form'),
-    path('success/<int:application_id>/', views.application_success, name='application_success'),
-    path('pending/<int:application_id>/', views.application_pending, name='application_pending'),
+    path('', public_views.application_form, name='application_form'),
+    path('success/<int:application_id>/', public_views.application_success, name='application_success'),
+    path('pending/<int:application_id>/', public_views.application_pending, name='application_pending'),
+    path('status/<int:application_id>/', public_views.application_status, name='application_status'),
     
     # Discordアカウント名入力（管理者用）
     path('discord/input/<int:application_id>/', views.discord_account_input, name='discord_account_input'),
@@ -40,9 +48,10 @@ urlpatterns = [
     path('batch-grant/', views.batch_access_grant, name='batch_access_grant'),
     
     # 値引き申請フォーム
-    path('discount/', views.discount_application_form, name='discount_application_form'),
-    path('discount/pending/<int:application_id>/', views.discount_application_pending, name='discount_application_pending'),
-    path('discount/success/<int:application_id>/', views.discount_application_success, name='discord_application_success'),
+    path('discount/', public_views.discount_application_form, name='discount_application_form'),
+    path('discount/pending/<int:application_id>/', public_views.discount_application_pending, name='discount_application_pending'),
+    path('discount/status/<int:application_id>/', public_views.discount_application_status, name='discount_application_status'),
+    path('discount/success/<int:application_id>/', public_views.discount_application_success, name='discord_application_success'),
     
     # 値引き申請管理
     path('discount/list/', views.discount_application_list, name='discount_application_list'),
@@ -50,9 +59,19 @@ urlpatterns = [
     path('discount/apply/<int:application_id>/', views.apply_discount, name='apply_discount'),
     path('discount/revoke/<int:application_id>/', views.revoke_discount, name='revoke_discount'),
     path('discount/delete/<int:application_id>/', views.discount_application_delete, name='discount_application_delete'),
+    path('discount/batch-apply/', views.batch_discount_apply, name='batch_discount_apply'),
+    path('discount/batch-revoke/', views.batch_discount_revoke, name='batch_discount_revoke'),
     
     # アクセス剥奪管理
     path('revocation/', views.revocation_list, name='revocation_list'),
     path('batch-revoke/', views.batch_access_revoke, name='batch_access_revoke'),
     path('data-management/', views.data_management, name='data_management'),
+    
+    # エクスポート（CSV / JSONL）
+    path('export/<slug:source>/<slug:fmt>/', views.application_export, name='application_export'),
+    
+    # 読み取り専用JSON API
+    path('api/applications/', api.application_api, name='application_api'),
+    path('api/discount-applications/', api.discount_application_api, name='discount_application_api'),
+    path('api/csv-uploads/', api.csv_upload_api, name='csv_upload_api'),
 ]
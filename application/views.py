@@ -5,11 +5,33 @@ from django.utils import timezone
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-import csv
+from django.db import IntegrityError
+from django.http import Http404
+from django.db.models import Q
+from django.core.paginator import Paginator
 import os
-from .models import SalonApplication, SubscriptionUser, CSVUpload, DiscountApplication
+from .models import SalonApplication, SubscriptionUser, CSVUpload, DiscountApplication, MatchEvent
 from .forms import SalonApplicationForm, CSVUploadForm, DiscordAccountForm, DiscountApplicationForm
-from .decorators import admin_login_required
+from .decorators import (
+    admin_login_required,
+    cache_admin_page,
+    cache_public_form_page,
+    conditional_admin_page,
+    rate_limit_public_form,
+)
+from . import counters
+from .maintenance import purge_all_data
+from .matching import (
+    VALIDATION_PROBLEMS,
+    VALIDATION_SAMPLE_SIZE,
+    match_csv_sources,
+    match_csv_upload,
+    upload_sources,
+)
+from .candidates import CANDIDATE_PAGE_SIZE, CANDIDATE_TOP_K, get_candidate_index, remove_candidate_index
+from .exports import EXPORT_FORMATS, stream_applications
+from . import filters
+from .public_status import get_status, payload_for, status_response
 
 
 @require_http_methods(["GET", "POST"])
@@ -56,548 +78,30 @@ def admin_logout(request):
     return redirect('application:admin_login')
 
 
-def match_applications_with_csv(csv_file_path, csv_upload_instance):
+def _save_public_application(form, application):
     """
-    CSVファイルと申し込み情報を突合
-    
-    Args:
-        csv_file_path: CSVファイルのパス
-        csv_upload_instance: CSVUploadインスタンス
-    
-    Returns:
-        tuple: (matched_count, revocation_msg)
-    """
-    matched_count = 0
-    revocation_msg = ""
-    
-    try:
-        # CSVファイルを読み込む（cp932エンコーディング）
-        encodings = ['cp932', 'shift_jis', 'utf-8-sig', 'utf-8']
-        csv_data = None
-        detected_encoding = None
-        
-        for enc in encodings:
-            try:
-                with open(csv_file_path, 'r', encoding=enc, newline='') as f:
-                    reader = csv.DictReader(f)
-                    csv_data = list(reader)
-                    detected_encoding = enc
-                    break
-            except (UnicodeDecodeError, FileNotFoundError):
-                continue
-        
-        if csv_data is None:
-            return 0, "CSVファイルの読み込みに失敗しました。文字コードを確認してください。"
-        
-        # 必要なカラムを確認
-        required_columns = ['定期ステータス', '配送先 姓', '配送先 名', '配送先 名前', '注文者 メールアドレス']
-        headers = csv_data[0].keys() if csv_data else []
-        
-        missing_columns = [col for col in required_columns if col not in headers]
-        if missing_columns:
-            return 0, f"必要なカラムが見つかりません: {', '.join(missing_columns)}"
-        
-        # 「定期ステータス」が「継続」の行のみをフィルタ
-        active_subscriptions = [
-            row for row in csv_data 
-            if row.get('定期ステータス', '').strip() == '継続'
-        ]
-        
-        # 「継続」以外の行（アクセス剥奪チェック用）
-        inactive_subscriptions = [
-            row for row in csv_data 
-            if row.get('定期ステータス', '').strip() != '継続'
-        ]
-        
-        csv_upload_instance.active_subscriptions = len(active_subscriptions)
-        csv_upload_instance.total_rows = len(csv_data)
-        csv_upload_instance.save()
-        
-        # 未処理の申し込みとアクセス付与済みの申し込みを取得
-        pending_applications = SalonApplication.objects.filter(
-            subscription_verified=False
-        ).order_by('created_at')
-        
-        # アクセス付与済みの申し込みも突合対象にする（剥奪チェックのため）
-        # ただし、剥奪済み（access_revoked_atが設定済み）の申し込みは除外（終着点）
-        granted_applications = SalonApplication.objects.filter(
-            access_granted=True,
-            subscription_verified=True,
-            access_revoked_at__isnull=True  # 剥奪済みは除外
-        ).order_by('created_at')
-        
-        # 各申し込みを突合
-        for application in pending_applications:
-            app_email = application.email.lower().strip()
-            app_last_name = application.last_name.strip()
-            app_first_name = application.first_name.strip()
-            app_full_name = f"{app_last_name} {app_first_name}".strip()
-            
-            matched_row = None
-            match_method = ''
-            
-            # 優先1: メールアドレス + 名前（姓・名）の完全一致
-            for row in active_subscriptions:
-                row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                row_last_name = row.get('配送先 姓', '').strip()
-                row_first_name = row.get('配送先 名', '').strip()
-                row_full_name = f"{row_last_name} {row_first_name}".strip()
-                
-                if (app_email == row_email and 
-                    app_last_name == row_last_name and 
-                    app_first_name == row_first_name):
-                    matched_row = row
-                    match_method = 'email_and_name'
-                    break
-            
-            # 優先2: メールアドレスのみの一致
-            if not matched_row:
-                for row in active_subscriptions:
-                    row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                    if app_email == row_email:
-                        matched_row = row
-                        match_method = 'email_only'
-                        break
-            
-            # 優先3: 名前（姓・名）の完全一致
-            if not matched_row:
-                name_matches = []
-                for row in active_subscriptions:
-                    row_last_name = row.get('配送先 姓', '').strip()
-                    row_first_name = row.get('配送先 名', '').strip()
-                    row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                    
-                    if (app_last_name == row_last_name and 
-                        app_first_name == row_first_name):
-                        name_matches.append({
-                            'row': row,
-                            'email': row_email
-                        })
-                
-                # 同姓同名が1人だけの場合はマッチ
-                if len(name_matches) == 1:
-                    matched_row = name_matches[0]['row']
-                    match_method = 'name_only'
-                    application.match_notes = f"同姓同名の候補が1件のみ。メール: {name_matches[0]['email']}"
-                elif len(name_matches) > 1:
-                    # 複数の同姓同名がある場合はメモに記録
-                    emails = [m['email'] for m in name_matches]
-                    application.match_notes = (
-                        f"同姓同名の候補が複数あります。手動確認が必要です。\n"
-                        f"候補メールアドレス: {', '.join(emails)}"
-                    )
-            
-            # 突合成功時
-            if matched_row:
-                application.subscription_verified = True
-                application.match_method = match_method
-                application.matched_at = timezone.now()
-                application.csv_upload = csv_upload_instance
-                application.status = 'verified'
-                
-                # SubscriptionUserを作成または取得
-                row_email = matched_row.get('注文者 メールアドレス', '').lower().strip()
-                subscription_id = matched_row.get('注文番号', '').strip() or f"CSV_{csv_upload_instance.id}_{matched_count}"
-                
-                subscription_user, created = SubscriptionUser.objects.get_or_create(
-                    email=row_email,
-                    defaults={
-                        'subscription_id': subscription_id,
-                        'is_active': True
-                    }
-                )
-                
-                application.subscription_user = subscription_user
-                application.match_notes = f"CSV突合成功: {match_method}"
-                application.save()
-                matched_count += 1
-            else:
-                # 突合失敗時
-                if not application.match_notes:
-                    application.match_notes = "CSV突合で一致する情報が見つかりませんでした。"
-                application.save()
-        
-        # アクセス付与済みの申し込みを突合（剥奪チェックのため）
-        revocation_count = 0
-        for application in granted_applications:
-            app_email = application.email.lower().strip()
-            app_last_name = application.last_name.strip()
-            app_first_name = application.first_name.strip()
-            
-            # まず「継続」のエントリーと突合できるかチェック
-            matched_with_active = None
-            
-            # 優先1: メールアドレス + 名前（姓・名）の完全一致
-            for row in active_subscriptions:
-                row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                row_last_name = row.get('配送先 姓', '').strip()
-                row_first_name = row.get('配送先 名', '').strip()
-                
-                if (app_email == row_email and 
-                    app_last_name == row_last_name and 
-                    app_first_name == row_first_name):
-                    matched_with_active = row
-                    break
-            
-            # 優先2: メールアドレスのみの一致
-            if not matched_with_active:
-                for row in active_subscriptions:
-                    row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                    if app_email == row_email:
-                        matched_with_active = row
-                        break
-            
-            # 「継続」と突合できた場合は剥奪不要（スキップ）
-            if matched_with_active:
-                continue
-            
-            # 「継続」と突合できなかった場合、「継続」以外のエントリーと突合されているかチェック
-            matched_with_inactive = None
-            matched_status = None
-            
-            # メールアドレス + 名前で突合チェック
-            for row in inactive_subscriptions:
-                row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                row_last_name = row.get('配送先 姓', '').strip()
-                row_first_name = row.get('配送先 名', '').strip()
-                row_status = row.get('定期ステータス', '').strip()
-                
-                if row_status == '継続':
-                    continue
-                
-                # メール+名前で一致
-                if (app_email == row_email and 
-                    app_last_name == row_last_name and 
-                    app_first_name == row_first_name):
-                    matched_with_inactive = row
-                    matched_status = row_status
-                    break
-            
-            # メールアドレスのみでチェック（名前一致なしの場合）
-            if not matched_with_inactive:
-                for row in inactive_subscriptions:
-                    row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                    row_status = row.get('定期ステータス', '').strip()
-                    
-                    if row_status == '継続':
-                        continue
-                    
-                    if app_email == row_email:
-                        matched_with_inactive = row
-                        matched_status = row_status
-                        break
-            
-            # 「継続」とは突合できず、「継続」以外のみと突合された場合、アクセス剥奪必要フラグを立てる
-            if matched_with_inactive:
-                if not application.access_revocation_required:
-                    application.access_revocation_required = True
-                    application.access_revocation_required_at = timezone.now()
-                    application.match_notes = (
-                        f"{application.match_notes}\n" if application.match_notes else ""
-                    ) + (
-                        f"[CSV突合 {csv_upload_instance.file_name}] "
-                        f"「継続」とは突合できず、定期ステータス「{matched_status}」とのみ突合されました。"
-                        f"アクセス権の剥奪が必要です。"
-                    )
-                    application.save()
-                    revocation_count += 1
-        
-        csv_upload_instance.matched_count = matched_count
-        csv_upload_instance.salon_match_count = matched_count  # サロン申請突合成功数
-        csv_upload_instance.access_revocation_count = revocation_count  # アクセス権剥奪必要件数
-        csv_upload_instance.status = 'completed'
-        csv_upload_instance.save()
-        
-        revocation_msg = f"（アクセス剥奪必要: {revocation_count}件）" if revocation_count > 0 else ""
-        return matched_count, revocation_msg
-    
-    except Exception as e:
-        error_message = f"エラーが発生しました: {str(e)}"
-        csv_upload_instance.status = 'error'
-        csv_upload_instance.error_message = error_message
-        csv_upload_instance.save()
-        return matched_count, error_message
+    公開フォームからの申し込み・申請を保存
 
+    同時送信で重複チェックをすり抜けた場合はDBの一意制約で失敗するため、
+    フォームのエラーとして表示する。
 
-def match_discount_applications_with_csv(csv_file_path, csv_upload_instance):
-    """
-    CSVファイルと値引き申請情報を突合
-    
-    Args:
-        csv_file_path: CSVファイルのパス
-        csv_upload_instance: CSVUploadインスタンス
-    
     Returns:
-        int: 突合成功数
+        bool: 保存できた場合はTrue
     """
-    matched_count = 0
-    
     try:
-        # CSVファイルを読み込む（cp932エンコーディング）
-        encodings = ['cp932', 'shift_jis', 'utf-8-sig', 'utf-8']
-        csv_data = None
-        
-        for enc in encodings:
-            try:
-                with open(csv_file_path, 'r', encoding=enc, newline='') as f:
-                    reader = csv.DictReader(f)
-                    csv_data = list(reader)
-                    break
-            except (UnicodeDecodeError, FileNotFoundError):
-                continue
-        
-        if csv_data is None:
-            return 0
-        
-        # 「定期ステータス」が「継続」の行のみをフィルタ
-        active_subscriptions = [
-            row for row in csv_data 
-            if row.get('定期ステータス', '').strip() == '継続'
-        ]
-        
-        # 未処理の値引き申請を取得
-        pending_applications = DiscountApplication.objects.filter(
-            subscription_verified=False
-        ).order_by('created_at')
-        
-        # 各申請を突合
-        for application in pending_applications:
-            app_email = application.email.lower().strip()
-            app_last_name = application.last_name.strip()
-            app_first_name = application.first_name.strip()
-            
-            matched_row = None
-            match_method = ''
-            
-            # 優先1: メールアドレス + 名前（姓・名）の完全一致
-            for row in active_subscriptions:
-                row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                row_last_name = row.get('配送先 姓', '').strip()
-                row_first_name = row.get('配送先 名', '').strip()
-                
-                if (app_email == row_email and 
-                    app_last_name == row_last_name and 
-                    app_first_name == row_first_name):
-                    matched_row = row
-                    match_method = 'email_and_name'
-                    break
-            
-            # 優先2: メールアドレスのみの一致
-            if not matched_row:
-                for row in active_subscriptions:
-                    row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                    if app_email == row_email:
-                        matched_row = row
-                        match_method = 'email_only'
-                        break
-            
-            # 優先3: 名前（姓・名）の完全一致
-            if not matched_row:
-                name_matches = []
-                for row in active_subscriptions:
-                    row_last_name = row.get('配送先 姓', '').strip()
-                    row_first_name = row.get('配送先 名', '').strip()
-                    row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                    
-                    if (app_last_name == row_last_name and 
-                        app_first_name == row_first_name):
-                        name_matches.append({
-                            'row': row,
-                            'email': row_email
-                        })
-                
-                # 同姓同名が1人だけの場合はマッチ
-                if len(name_matches) == 1:
-                    matched_row = name_matches[0]['row']
-                    match_method = 'name_only'
-                    application.match_notes = f"同姓同名の候補が1件のみ。メール: {name_matches[0]['email']}"
-                elif len(name_matches) > 1:
-                    # 複数の同姓同名がある場合はメモに記録
-                    emails = [m['email'] for m in name_matches]
-                    application.match_notes = (
-                        f"同姓同名の候補が複数あります。手動確認が必要です。\n"
-                        f"候補メールアドレス: {', '.join(emails)}"
-                    )
-            
-            # 突合成功時
-            if matched_row:
-                application.subscription_verified = True
-                application.match_method = match_method
-                application.matched_at = timezone.now()
-                application.csv_upload = csv_upload_instance
-                application.status = 'verified'
-                
-                # SubscriptionUserを作成または取得
-                row_email = matched_row.get('注文者 メールアドレス', '').lower().strip()
-                subscription_id = matched_row.get('注文番号', '').strip() or f"CSV_{csv_upload_instance.id}_{matched_count}"
-                
-                subscription_user, created = SubscriptionUser.objects.get_or_create(
-                    email=row_email,
-                    defaults={
-                        'subscription_id': subscription_id,
-                        'is_active': True
-                    }
-                )
-                
-                application.subscription_user = subscription_user
-                application.match_notes = f"CSV突合成功: {match_method}"
-                application.save()
-                matched_count += 1
-            else:
-                # 突合失敗時
-                if not application.match_notes:
-                    application.match_notes = "CSV突合で一致する情報が見つかりませんでした。"
-                application.save()
-        
-        csv_upload_instance.discount_match_count = matched_count  # 値引き申請突合成功数
-        csv_upload_instance.save()
-        
-        return matched_count
-    
-    except Exception as e:
-        return 0
-
-
-def match_discount_revocations_with_csv(csv_file_path, csv_upload_instance):
-    """
-    CSVファイルと値引き適用済み申請を突合（値引き剥奪チェック）
-    
-    Args:
-        csv_file_path: CSVファイルのパス
-        csv_upload_instance: CSVUploadインスタンス
-    
-    Returns:
-        int: 値引き剥奪必要件数
-    """
-    revocation_count = 0
-    
-    try:
-        # CSVファイルを読み込む（cp932エンコーディング）
-        encodings = ['cp932', 'shift_jis', 'utf-8-sig', 'utf-8']
-        csv_data = None
-        
-        for enc in encodings:
-            try:
-                with open(csv_file_path, 'r', encoding=enc, newline='') as f:
-                    reader = csv.DictReader(f)
-                    csv_data = list(reader)
-                    break
-            except (UnicodeDecodeError, FileNotFoundError):
-                continue
-        
-        if csv_data is None:
-            return 0
-        
-        # 「定期ステータス」が「継続」の行と「継続」以外の行を分ける
-        active_subscriptions = [
-            row for row in csv_data 
-            if row.get('定期ステータス', '').strip() == '継続'
-        ]
-        inactive_subscriptions = [
-            row for row in csv_data 
-            if row.get('定期ステータス', '').strip() != '継続'
-        ]
-        
-        # 値引き適用済みの申請を取得（剥奪済みは除外）
-        granted_applications = DiscountApplication.objects.filter(
-            discount_applied=True,
-            discount_revoked_at__isnull=True  # 剥奪済みは除外
-        ).order_by('created_at')
-        
-        # 各申請を突合
-        for application in granted_applications:
-            app_email = application.email.lower().strip()
-            app_last_name = application.last_name.strip()
-            app_first_name = application.first_name.strip()
-            
-            # まず「継続」のエントリーと突合できるかチェック
-            matched_with_active = None
-            
-            # 優先1: メールアドレス + 名前（姓・名）の完全一致
-            for row in active_subscriptions:
-                row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                row_last_name = row.get('配送先 姓', '').strip()
-                row_first_name = row.get('配送先 名', '').strip()
-                
-                if (app_email == row_email and 
-                    app_last_name == row_last_name and 
-                    app_first_name == row_first_name):
-                    matched_with_active = row
-                    break
-            
-            # 優先2: メールアドレスのみの一致
-            if not matched_with_active:
-                for row in active_subscriptions:
-                    row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                    if app_email == row_email:
-                        matched_with_active = row
-                        break
-            
-            # 「継続」と突合できた場合は剥奪不要（スキップ）
-            if matched_with_active:
-                continue
-            
-            # 「継続」と突合できなかった場合、「継続」以外のエントリーと突合されているかチェック
-            matched_with_inactive = None
-            matched_status = None
-            
-            # メールアドレス + 名前で突合チェック
-            for row in inactive_subscriptions:
-                row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                row_last_name = row.get('配送先 姓', '').strip()
-                row_first_name = row.get('配送先 名', '').strip()
-                row_status = row.get('定期ステータス', '').strip()
-                
-                if row_status == '継続':
-                    continue
-                
-                # メール+名前で一致
-                if (app_email == row_email and 
-                    app_last_name == row_last_name and 
-                    app_first_name == row_first_name):
-                    matched_with_inactive = row
-                    matched_status = row_status
-                    break
-            
-            # メールアドレスのみでチェック（名前一致なしの場合）
-            if not matched_with_inactive:
-                for row in inactive_subscriptions:
-                    row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                    row_status = row.get('定期ステータス', '').strip()
-                    
-                    if row_status == '継続':
-                        continue
-                    
-                    if app_email == row_email:
-                        matched_with_inactive = row
-                        matched_status = row_status
-                        break
-            
-            # 「継続」とは突合できず、「継続」以外のみと突合された場合、値引き剥奪必要フラグを立てる
-            if matched_with_inactive:
-                if not application.discount_revocation_required:
-                    application.discount_revocation_required = True
-                    application.discount_revocation_required_at = timezone.now()
-                    application.match_notes = (
-                        f"{application.match_notes}\n" if application.match_notes else ""
-                    ) + (
-                        f"[CSV突合 {csv_upload_instance.file_name}] "
-                        f"「継続」とは突合できず、定期ステータス「{matched_status}」とのみ突合されました。"
-                        f"値引きの剥奪が必要です。"
-                    )
-                    application.save()
-                    revocation_count += 1
-        
-        csv_upload_instance.discount_revocation_count = revocation_count  # 値引き剥奪必要件数
-        csv_upload_instance.save()
-        
-        return revocation_count
-    
-    except Exception as e:
-        return 0
+        application.save()
+    except IntegrityError:
+        form.add_error(
+            'email',
+            form.duplicate_email_error(application.email) or 'このメールアドレスは既に使用されています。'
+        )
+        return False
+    return True
 
 
 @require_http_methods(["GET", "POST"])
+@rate_limit_public_form('application')
+@cache_public_form_page
 def application_form(request):
     """夜遊びサロン申し込みフォーム"""
     if request.method == 'POST':
@@ -606,13 +110,12 @@ def application_form(request):
             application = form.save(commit=False)
             application.status = 'pending'
             application.subscription_verified = False
-            application.save()
-            
-            messages.success(
-                request,
-                '申し込みを受け付けました。Joy Journeyの定期購入の確認後、アクセスを付与いたします。'
-            )
-            return redirect('application:application_pending', application_id=application.id)
+            if _save_public_application(form, application):
+                messages.success(
+                    request,
+                    '申し込みを受け付けました。Joy Journeyの定期購入の確認後、アクセスを付与いたします。'
+                )
+                return redirect('application:application_pending', application_id=application.id)
     else:
         form = SalonApplicationForm()
     
@@ -642,11 +145,20 @@ def application_pending(request, application_id):
     
     return render(request, 'application/pending.html', {
         'application': application,
+        'status_payload': payload_for('salon', application),
         'page_title': '審査中'
     })
 
 
+@require_http_methods(["GET"])
+def application_status(request, application_id):
+    """申し込みの状態（審査中ページのポーリング用JSON）"""
+    return status_response(get_status('salon', application_id))
+
+
 @require_http_methods(["GET", "POST"])
+@rate_limit_public_form('discount')
+@cache_public_form_page
 def discount_application_form(request):
     """値引き申請フォーム"""
     if request.method == 'POST':
@@ -656,13 +168,12 @@ def discount_application_form(request):
             application.status = 'pending'
             application.subscription_verified = False
             application.discord_account_submitted_at = timezone.now()
-            application.save()
-            
-            messages.success(
-                request,
-                '値引き申請を受け付けました。Joy Journeyの定期購入の確認後、値引きを適用いたします。'
-            )
-            return redirect('application:discount_application_pending', application_id=application.id)
+            if _save_public_application(form, application):
+                messages.success(
+                    request,
+                    '値引き申請を受け付けました。Joy Journeyの定期購入の確認後、値引きを適用いたします。'
+                )
+                return redirect('application:discount_application_pending', application_id=application.id)
     else:
         form = DiscountApplicationForm()
     
@@ -678,10 +189,17 @@ def discount_application_pending(request, application_id):
     
     return render(request, 'application/discount_application_pending.html', {
         'application': application,
+        'status_payload': payload_for('discount', application),
         'page_title': '値引き申請審査中'
     })
 
 
+@require_http_methods(["GET"])
+def discount_application_status(request, application_id):
+    """値引き申請の状態（審査中ページのポーリング用JSON）"""
+    return status_response(get_status('discount', application_id))
+
+
 def discount_application_success(request, application_id):
     """値引き申請完了ページ"""
     application = get_object_or_404(DiscountApplication, id=application_id)
@@ -734,50 +252,55 @@ def csv_upload(request):
         form = CSVUploadForm(request.POST, request.FILES)
         if form.is_valid():
             csv_upload_instance = form.save(commit=False)
-            csv_file = form.cleaned_data['csv_file']
-            
-            # ファイルを保存
-            file_path = os.path.join(settings.MEDIA_ROOT, 'csv_uploads', csv_file.name)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            
-            with default_storage.open(file_path, 'wb') as f:
-                for chunk in csv_file.chunks():
-                    f.write(chunk)
-            
-            csv_upload_instance.file_path = file_path
-            csv_upload_instance.status = 'processing'
-            csv_upload_instance.save()
-            
-            # 突合処理を実行
-            salon_match_count, access_revocation_msg = match_applications_with_csv(
-                file_path,
-                csv_upload_instance
-            )
-            
-            # 値引き申請の突合処理も実行
-            discount_match_count = match_discount_applications_with_csv(
-                file_path,
-                csv_upload_instance
-            )
-            
-            # 値引き剥奪チェック処理も実行
-            discount_revocation_count = match_discount_revocations_with_csv(
-                file_path,
-                csv_upload_instance
-            )
+            csv_files = form.cleaned_data['csv_file']
+            upload_dir = os.path.join(settings.MEDIA_ROOT, 'csv_uploads')
+            
+            if form.is_batch:
+                # 複数のファイル・ZIP：すべての行をまとめたCSVを保存し、1回だけ突合
+                csv_upload_instance.status = 'processing'
+                csv_upload_instance.save()
+                counts, error_message = match_csv_sources(
+                    upload_sources(csv_files),
+                    csv_upload_instance,
+                    merged_path=os.path.join(upload_dir, f'batch_{csv_upload_instance.id}.csv'),
+                )
+            else:
+                csv_file = csv_files[0]
+                
+                # ファイルを保存
+                file_path = os.path.join(upload_dir, csv_file.name)
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                
+                with default_storage.open(file_path, 'wb') as f:
+                    for chunk in csv_file.chunks():
+                        f.write(chunk)
+                
+                csv_upload_instance.file_path = file_path
+                csv_upload_instance.status = 'processing'
+                csv_upload_instance.save()
+                
+                # 突合処理を実行（サロン申請・値引き申請の突合と剥奪チェックを1回で行う）
+                counts, error_message = match_csv_upload(file_path, csv_upload_instance)
             
-            if access_revocation_msg.startswith('エラー'):
-                messages.error(request, access_revocation_msg)
+            if error_message:
+                messages.error(request, error_message)
             else:
+                salon_match_count = counts['salon_match_count']
+                discount_match_count = counts['discount_match_count']
+                access_revocation_count = counts['access_revocation_count']
+                discount_revocation_count = counts['discount_revocation_count']
                 msg = f'CSVアップロードが完了しました。'
                 msg += f' サロン申請突合: {salon_match_count}件'
                 if discount_match_count > 0:
                     msg += f'、値引き申請突合: {discount_match_count}件'
-                if access_revocation_msg:
-                    msg += f' {access_revocation_msg}'
+                if access_revocation_count > 0:
+                    msg += f' （アクセス剥奪必要: {access_revocation_count}件）'
                 if discount_revocation_count > 0:
                     msg += f'（値引き剥奪必要: {discount_revocation_count}件）'
-                if access_revocation_msg or discount_revocation_count > 0:
+                invalid_rows = csv_upload_instance.validation_report.get('invalid_rows', 0)
+                if invalid_rows:
+                    msg += f' 問題のある行が{invalid_rows}件あります（詳細はアップロード詳細を確認してください）。'
+                if access_revocation_count > 0 or discount_revocation_count > 0 or invalid_rows:
                     messages.warning(request, msg)
                 else:
                     messages.success(request, msg)
@@ -792,7 +315,14 @@ def csv_upload(request):
     })
 
 
+def _csv_upload_list_targets(request):
+    """CSVアップロード一覧の条件付きGETの対象"""
+    return [CSVUpload.objects.all()]
+
+
 @admin_login_required
+@conditional_admin_page(_csv_upload_list_targets)
+@cache_admin_page
 def csv_upload_list(request):
     """CSVアップロード一覧"""
     uploads = CSVUpload.objects.all()
@@ -803,7 +333,32 @@ def csv_upload_list(request):
     })
 
 
+def _validation_locations(rows, show_file_names):
+    """
+    検証で記録した行を表示用にファイルごとにまとめる
+
+    Returns:
+        list: (ファイル名, 行番号のリスト) のリスト（ファイル名を表示しない場合は空文字）
+    """
+    locations = {}
+    for row in rows:
+        # 以前の記録は行番号のみ
+        source_name, row_number = row if isinstance(row, list) else ('', row)
+        locations.setdefault(source_name if show_file_names else '', []).append(row_number)
+    return list(locations.items())
+
+
+def _csv_upload_detail_targets(request, upload_id):
+    """CSVアップロード詳細の条件付きGETの対象（アップロードと突合された申し込み）"""
+    return [
+        CSVUpload.objects.filter(id=upload_id),
+        SalonApplication.objects.filter(csv_upload_id=upload_id),
+    ]
+
+
 @admin_login_required
+@conditional_admin_page(_csv_upload_detail_targets)
+@cache_admin_page
 def csv_upload_detail(request, upload_id):
     """CSVアップロード詳細"""
     upload = get_object_or_404(CSVUpload, id=upload_id)
@@ -811,38 +366,59 @@ def csv_upload_detail(request, upload_id):
     # このCSVで突合された申し込み一覧
     applications = SalonApplication.objects.filter(csv_upload=upload)
     
+    # 行の検証結果（問題の種類の順）
+    problems = upload.validation_report.get('problems', {})
+    show_file_names = len(upload.source_files) > 1
+    validation_problems = [
+        {
+            'label': label,
+            'count': problems[key]['count'],
+            'sample_count': len(problems[key]['rows']),
+            'locations': _validation_locations(problems[key]['rows'], show_file_names),
+            'status_values': problems[key].get('values', []),
+        }
+        for key, label in VALIDATION_PROBLEMS.items()
+        if key in problems
+    ]
+    
     return render(request, 'application/csv_upload_detail.html', {
         'upload': upload,
         'applications': applications,
+        'validation_problems': validation_problems,
+        'validation_sample_size': VALIDATION_SAMPLE_SIZE,
         'page_title': f'CSVアップロード詳細: {upload.file_name}'
     })
 
 
+def _application_list_targets(request):
+    """
+    申し込み一覧の条件付きGETの対象
+
+    各フィルタの件数表示は「そのフィルタ以外の条件」で集計するため、
+    いずれか1つの条件を除いて一致する申し込みまでを対象にする。
+    """
+    active_filters = filters.application_list_active_filters(request)
+    if len(active_filters) <= 1:
+        return [SalonApplication.objects.all()]
+    condition = Q()
+    for name in active_filters:
+        condition |= filters.application_list_condition(active_filters, exclude=name)
+    return [SalonApplication.objects.filter(condition)]
+
+
 @admin_login_required
+@conditional_admin_page(_application_list_targets)
+@cache_admin_page
 def application_list(request):
     """申し込み一覧（管理者用）"""
-    applications = SalonApplication.objects.all()
-    
-    # フィルタリング
     status_filter = request.GET.get('status')
     verified_filter = request.GET.get('verified')
     access_filter = request.GET.get('access')
     revocation_filter = request.GET.get('revocation')
     
-    if status_filter:
-        applications = applications.filter(status=status_filter)
-    if verified_filter == 'yes':
-        applications = applications.filter(subscription_verified=True)
-    elif verified_filter == 'no':
-        applications = applications.filter(subscription_verified=False)
-    if access_filter == 'yes':
-        applications = applications.filter(access_granted=True)
-    elif access_filter == 'no':
-        applications = applications.filter(access_granted=False)
-    if revocation_filter == 'required':
-        applications = applications.filter(access_revocation_required=True, access_granted=True)
-    elif revocation_filter == 'revoked':
-        applications = applications.filter(access_revoked_at__isnull=False)
+    # フィルタリング
+    active_filters = filters.application_list_active_filters(request)
+    applications = SalonApplication.objects.filter(filters.application_list_condition(active_filters))
     
     return render(request, 'application/list.html', {
         'applications': applications,
@@ -851,60 +427,95 @@ def application_list(request):
         'verified_filter': verified_filter,
         'access_filter': access_filter,
         'revocation_filter': revocation_filter,
+        'facets': filters.application_list_facets(active_filters),
+        'filter_urls': filters.application_list_filter_urls(active_filters),
     })
 
 
+# 詳細画面に表示する突合履歴の件数（新しい順）
+MATCH_EVENT_DISPLAY_LIMIT = 50
+
+
+def _application_detail_targets(request, application_id):
+    """申し込み詳細の条件付きGETの対象"""
+    return [
+        SalonApplication.objects.filter(id=application_id),
+        MatchEvent.objects.filter(salon_application_id=application_id),
+    ]
+
+
 @admin_login_required
+@conditional_admin_page(_application_detail_targets)
+@cache_admin_page
 def application_detail(request, application_id):
     """申し込み詳細（管理者用）"""
     application = get_object_or_404(SalonApplication, id=application_id)
     
+    match_events = application.match_events.select_related('csv_upload')[:MATCH_EVENT_DISPLAY_LIMIT]
+
     return render(request, 'application/detail.html', {
         'application': application,
+        'match_events': match_events,
         'page_title': f'申し込み詳細: {application.full_name}'
     })
 
 
+def _manual_match_candidates(request, application):
+    """
+    手動突合の候補（最新のCSVアップロードの「継続」の行から）
+
+    検索語（q）がなければ申し込みに近い上位の候補を、あれば検索結果をページ分けして返す。
+    """
+    latest_csv = CSVUpload.objects.filter(status='completed').order_by('-created_at').first()
+    query = request.GET.get('q', '').strip()
+    context = {
+        'csv_upload': latest_csv,
+        'query': query,
+        'candidates': [],
+        'page_obj': None,
+        'active_count': 0,
+        'candidate_top_k': CANDIDATE_TOP_K,
+    }
+    index = get_candidate_index(latest_csv)
+    if index is None:
+        return context
+    
+    context['active_count'] = len(index.entries)
+    if query:
+        page_obj = Paginator(index.search(query), CANDIDATE_PAGE_SIZE).get_page(request.GET.get('page'))
+        context['page_obj'] = page_obj
+        context['candidates'] = page_obj.object_list
+    else:
+        context['candidates'] = index.rank(application.email, application.last_name, application.first_name)
+    return context
+
+
+def _selected_candidate(request):
+    """
+    手動突合で選択されたCSVの行
+
+    Returns:
+        tuple: (CSVUpload, CSVEntry)。見つからない場合は (CSVUpload または None, None)
+    """
+    csv_upload_id = request.POST.get('csv_upload_id', '')
+    row_number = request.POST.get('selected_row_index', '')
+    csv_upload = None
+    if csv_upload_id.isdigit():
+        csv_upload = CSVUpload.objects.filter(id=csv_upload_id, status='completed').first()
+    if csv_upload is None or not row_number.isdigit():
+        return csv_upload, None
+    index = get_candidate_index(csv_upload)
+    return csv_upload, index.entry(int(row_number)) if index else None
+
+
 @admin_login_required
 def manual_match_select(request, application_id):
     """手動突合：CSVエントリー選択画面"""
     application = get_object_or_404(SalonApplication, id=application_id)
     
-    # 最新のCSVアップロードを取得
-    latest_csv = CSVUpload.objects.filter(status='completed').order_by('-created_at').first()
-    
-    csv_entries = []
-    if latest_csv and latest_csv.file_path and os.path.exists(latest_csv.file_path):
-        encodings = ['cp932', 'shift_jis', 'utf-8-sig', 'utf-8']
-        for enc in encodings:
-            try:
-                with open(latest_csv.file_path, 'r', encoding=enc, newline='') as f:
-                    reader = csv.DictReader(f)
-                    row_index = 0
-                    for row in reader:
-                        row_index += 1
-                        if row.get('定期ステータス', '').strip() == '継続':
-                            row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                            row_last_name = row.get('配送先 姓', '').strip()
-                            row_first_name = row.get('配送先 名', '').strip()
-                            row_full_name = f"{row_last_name} {row_first_name}".strip()
-                            
-                            csv_entries.append({
-                                'row_index': row_index,
-                                'email': row_email,
-                                'last_name': row_last_name,
-                                'first_name': row_first_name,
-                                'full_name': row_full_name,
-                                'csv_row': row,  # 全データを保存（後でsubscription_id等に使用）
-                            })
-                break
-            except (UnicodeDecodeError, FileNotFoundError):
-                continue
-    
     return render(request, 'application/manual_match_select.html', {
         'application': application,
-        'csv_upload': latest_csv,
-        'csv_entries': csv_entries,
+        **_manual_match_candidates(request, application),
         'page_title': f'手動突合: {application.full_name}'
     })
 
@@ -915,44 +526,19 @@ def manual_match(request, application_id):
     """手動突合：選択したCSVエントリーで突合"""
     application = get_object_or_404(SalonApplication, id=application_id)
     
-    # CSVからの選択されたエントリー情報を取得
-    selected_row_index = request.POST.get('selected_row_index')
-    candidate_email = request.POST.get('candidate_email', '').strip()
-    candidate_last_name = request.POST.get('candidate_last_name', '').strip()
-    candidate_first_name = request.POST.get('candidate_first_name', '').strip()
+    # 選択されたCSVの行（選択画面に表示したCSVアップロードから取得）
+    selected_csv, entry = _selected_candidate(request)
     
-    if not candidate_email:
+    if entry is None:
         messages.error(request, 'CSVエントリーが選択されていません。')
         return redirect('application:application_detail', application_id=application.id)
     
-    # 最新のCSVアップロードを取得（subscription_idなどの情報取得のため）
-    latest_csv = CSVUpload.objects.filter(status='completed').order_by('-created_at').first()
-    subscription_id = f"MANUAL_{application.id}"
-    
-    if latest_csv and latest_csv.file_path and os.path.exists(latest_csv.file_path):
-        # 選択された行のデータを取得
-        encodings = ['cp932', 'shift_jis', 'utf-8-sig', 'utf-8']
-        for enc in encodings:
-            try:
-                with open(latest_csv.file_path, 'r', encoding=enc, newline='') as f:
-                    reader = csv.DictReader(f)
-                    row_index = 0
-                    for row in reader:
-                        row_index += 1
-                        if row.get('定期ステータス', '').strip() == '継続':
-                            if str(row_index) == str(selected_row_index):
-                                # 注文番号などがあればそれを使用
-                                order_number = row.get('注文番号', '').strip()
-                                if order_number:
-                                    subscription_id = order_number
-                                break
-                break
-            except (UnicodeDecodeError, FileNotFoundError):
-                continue
+    # 注文番号があればそれを使用
+    subscription_id = entry.order_number or f"MANUAL_{application.id}"
     
     # 候補のメールアドレスでSubscriptionUserを作成または取得
     subscription_user, created = SubscriptionUser.objects.get_or_create(
-        email=candidate_email.lower().strip(),
+        email=entry.email,
         defaults={
             'subscription_id': subscription_id,
             'is_active': True
@@ -964,14 +550,17 @@ def manual_match(request, application_id):
     application.match_method = 'manual'
     application.matched_at = timezone.now()
     application.status = 'verified'
-    application.csv_upload = latest_csv
-    application.match_notes = (
-        f"手動突合: 管理者が選択したCSVエントリー\n"
-        f"メール: {candidate_email}\n"
-        f"名前: {candidate_last_name} {candidate_first_name}\n"
-        f"CSV行番号: {selected_row_index}"
-    )
+    application.csv_upload = selected_csv
     application.save()
+    MatchEvent.for_application(
+        application,
+        csv_upload=selected_csv,
+        method='manual',
+        outcome='manual',
+        matched_status=entry.status,
+        candidate_emails=[entry.email],
+        row_number=entry.row_number,
+    ).save()
     
     messages.success(request, '手動突合が完了しました。')
     return redirect('application:application_detail', application_id=application.id)
@@ -1015,70 +604,96 @@ def revoke_access(request, application_id):
     return redirect('application:application_detail', application_id=application.id)
 
 
-@admin_login_required
-@require_http_methods(["POST"])
-def batch_access_grant(request):
-    """一括アクセス付与"""
-    application_ids = request.POST.getlist('application_ids')
+def _selected_ids(request):
+    """一括操作で選択された申し込みIDを取得"""
+    return [app_id for app_id in request.POST.getlist('application_ids') if app_id.isdigit()]
+
+
+def _batch_action(request, queryset_all, queryset_method, message, redirect_name, empty_message):
+    """
+    一括操作の共通処理（選択された申し込み、またはscope=allの場合は queryset_all を1回のUPDATEで更新）
+
+    Args:
+        queryset_all: 「すべて」を選んだ場合の対象（QuerySet）
+        queryset_method: 更新するQuerySetのメソッド名（更新した件数を返す）
+        message: 完了メッセージ（{count} に更新した件数が入る）
+        redirect_name: 処理後のリダイレクト先のURL名
+        empty_message: 何も選択されていない場合のメッセージ
+    """
+    application_ids = _selected_ids(request)
+    select_all = request.POST.get('scope') == 'all'
     
-    if not application_ids:
-        messages.warning(request, '申し込みが選択されていません。')
-        return redirect('application:access_grant_list')
+    if not application_ids and not select_all:
+        messages.warning(request, empty_message)
+        return redirect(redirect_name)
     
-    granted_count = 0
-    for app_id in application_ids:
-        try:
-            application = SalonApplication.objects.get(id=app_id)
-            if (application.subscription_verified and 
-                (application.discord_display_name or application.discord_account_name) and 
-                not application.access_granted):
-                application.grant_access()
-                granted_count += 1
-        except SalonApplication.DoesNotExist:
-            continue
+    applications = queryset_all if select_all else queryset_all.model.objects.filter(id__in=application_ids)
+    count = getattr(applications, queryset_method)()
     
-    messages.success(request, f'{granted_count}件の申し込みにアクセスを付与しました。')
-    return redirect('application:access_grant_list')
+    msg = message.format(count=count)
+    skipped_count = len(application_ids) - count
+    if not select_all and skipped_count > 0:
+        msg += f'（対象外: {skipped_count}件）'
+    messages.success(request, msg)
+    return redirect(redirect_name)
+
+
+@admin_login_required
+@require_http_methods(["POST"])
+def batch_access_grant(request):
+    """一括アクセス付与（1回のUPDATEで処理）"""
+    return _batch_action(
+        request, SalonApplication.objects.all(), 'grant_access',
+        '{count}件の申し込みにアクセスを付与しました。',
+        'application:access_grant_list', '申し込みが選択されていません。',
+    )
 
 
 @admin_login_required
 @require_http_methods(["POST"])
 def batch_access_revoke(request):
-    """一括アクセス剥奪"""
-    application_ids = request.POST.getlist('application_ids')
-    
-    if not application_ids:
-        messages.warning(request, '申し込みが選択されていません。')
-        return redirect('application:revocation_list')
-    
-    revoked_count = 0
-    for app_id in application_ids:
-        try:
-            application = SalonApplication.objects.get(id=app_id)
-            if application.access_granted:
-                application.revoke_access()
-                revoked_count += 1
-        except SalonApplication.DoesNotExist:
-            continue
-    
-    messages.success(request, f'{revoked_count}件の申し込みのアクセス権を剥奪しました。')
-    return redirect('application:revocation_list')
+    """一括アクセス剥奪（1回のUPDATEで処理、「すべて」は剥奪必要フラグ付きのもの）"""
+    return _batch_action(
+        request, SalonApplication.objects.filter(access_revocation_required=True), 'revoke_access',
+        '{count}件の申し込みのアクセス権を剥奪しました。',
+        'application:revocation_list', '申し込みが選択されていません。',
+    )
 
 
 @admin_login_required
+@require_http_methods(["POST"])
+def batch_discount_apply(request):
+    """値引き一括適用（1回のUPDATEで処理）"""
+    return _batch_action(
+        request, DiscountApplication.objects.all(), 'apply_discount',
+        '{count}件の値引き申請に値引きを適用しました。',
+        'application:discount_application_list', '値引き申請が選択されていません。',
+    )
+
+
+@admin_login_required
+@require_http_methods(["POST"])
+def batch_discount_revoke(request):
+    """値引き一括解除（1回のUPDATEで処理、「すべて」は値引き剥奪必要フラグ付きのもの）"""
+    return _batch_action(
+        request, DiscountApplication.objects.filter(discount_revocation_required=True), 'revoke_discount',
+        '{count}件の値引き申請の値引きを解除しました。',
+        'application:discount_application_list', '値引き申請が選択されていません。',
+    )
+
+
+def _access_grant_list_targets(request):
+    """アクセス権付与状況チェック表の条件付きGETの対象"""
+    return [filters.access_grant_list_queryset(request.GET.get('access'))]
+
+
+@admin_login_required
+@conditional_admin_page(_access_grant_list_targets)
+@cache_admin_page
 def access_grant_list(request):
     """アクセス権付与状況チェック表"""
-    # 突合済みの申し込みのみを取得
-    applications = SalonApplication.objects.filter(subscription_verified=True)
-    
-    # フィルタリング
     access_filter = request.GET.get('access')
-    if access_filter == 'yes':
-        applications = applications.filter(access_granted=True)
-    elif access_filter == 'no':
-        applications = applications.filter(access_granted=False)
-    
-    applications = applications.order_by('-created_at')
+    applications = filters.access_grant_list_queryset(access_filter)
     
     return render(request, 'application/access_grant_list.html', {
         'applications': applications,
@@ -1087,25 +702,18 @@ def access_grant_list(request):
     })
 
 
+def _revocation_list_targets(request):
+    """アクセス剥奪管理画面の条件付きGETの対象"""
+    return [filters.revocation_list_queryset(request.GET.get('status'))]
+
+
 @admin_login_required
+@conditional_admin_page(_revocation_list_targets)
+@cache_admin_page
 def revocation_list(request):
     """アクセス剥奪管理画面"""
-    # アクセス剥奪必要の申し込みを取得
-    applications = SalonApplication.objects.filter(
-        access_revocation_required=True,
-        access_granted=True
-    ).order_by('-access_revocation_required_at')
-    
-    # フィルタリング
     status_filter = request.GET.get('status')
-    if status_filter == 'revoked':
-        # 剥奪済みも表示
-        applications = SalonApplication.objects.filter(
-            access_revocation_required=True
-        ).order_by('-access_revocation_required_at')
-    elif status_filter == 'pending':
-        # 剥奪待ちのみ
-        applications = applications.filter(access_revoked_at__isnull=True)
+    applications = filters.revocation_list_queryset(status_filter)
     
     return render(request, 'application/revocation_list.html', {
         'applications': applications,
@@ -1114,6 +722,26 @@ def revocation_list(request):
     })
 
 
+@admin_login_required
+def application_export(request, source, fmt):
+    """申し込み一覧のエクスポート（各一覧画面と同じフィルタ条件で出力）"""
+    if fmt not in EXPORT_FORMATS:
+        raise Http404
+    
+    if source == 'list':
+        applications = SalonApplication.objects.filter(
+            filters.application_list_condition(filters.application_list_active_filters(request))
+        )
+    elif source == 'access-grant':
+        applications = filters.access_grant_list_queryset(request.GET.get('access'))
+    elif source == 'revocation':
+        applications = filters.revocation_list_queryset(request.GET.get('status'))
+    else:
+        raise Http404
+    
+    return stream_applications(applications, fmt, f'applications_{source.replace("-", "_")}')
+
+
 @admin_login_required
 @require_http_methods(["POST"])
 def application_delete(request, application_id):
@@ -1139,6 +767,7 @@ def csv_upload_delete(request, upload_id):
             os.remove(upload.file_path)
         except OSError:
             pass  # ファイル削除に失敗しても続行
+    remove_candidate_index(upload)
     
     file_name = upload.file_name
     upload.delete()
@@ -1147,26 +776,25 @@ def csv_upload_delete(request, upload_id):
     return redirect('application:csv_upload_list')
 
 
+def _discount_application_list_targets(request):
+    """値引き申請一覧の条件付きGETの対象"""
+    return [filters.discount_application_list_queryset(
+        request.GET.get('status'),
+        request.GET.get('verified'),
+        request.GET.get('discount'),
+    )]
+
+
 @admin_login_required
+@conditional_admin_page(_discount_application_list_targets)
+@cache_admin_page
 def discount_application_list(request):
     """値引き申請一覧（管理者用）"""
-    applications = DiscountApplication.objects.all()
-    
-    # フィルタリング
     status_filter = request.GET.get('status')
     verified_filter = request.GET.get('verified')
     discount_filter = request.GET.get('discount')
     
-    if status_filter:
-        applications = applications.filter(status=status_filter)
-    if verified_filter == 'yes':
-        applications = applications.filter(subscription_verified=True)
-    elif verified_filter == 'no':
-        applications = applications.filter(subscription_verified=False)
-    if discount_filter == 'yes':
-        applications = applications.filter(discount_applied=True)
-    elif discount_filter == 'no':
-        applications = applications.filter(discount_applied=False)
+    applications = filters.discount_application_list_queryset(status_filter, verified_filter, discount_filter)
     
     return render(request, 'application/discount_application_list.html', {
         'applications': applications,
@@ -1177,13 +805,26 @@ def discount_application_list(request):
     })
 
 
+def _discount_application_detail_targets(request, application_id):
+    """値引き申請詳細の条件付きGETの対象"""
+    return [
+        DiscountApplication.objects.filter(id=application_id),
+        MatchEvent.objects.filter(discount_application_id=application_id),
+    ]
+
+
 @admin_login_required
+@conditional_admin_page(_discount_application_detail_targets)
+@cache_admin_page
 def discount_application_detail(request, application_id):
     """値引き申請詳細（管理者用）"""
     application = get_object_or_404(DiscountApplication, id=application_id)
     
+    match_events = application.match_events.select_related('csv_upload')[:MATCH_EVENT_DISPLAY_LIMIT]
+
     return render(request, 'application/discount_application_detail.html', {
         'application': application,
+        'match_events': match_events,
         'page_title': f'値引き申請詳細: {application.full_name}'
     })
 
@@ -1193,41 +834,9 @@ def manual_discount_match_select(request, application_id):
     """値引き申請：手動突合：CSVエントリー選択画面"""
     application = get_object_or_404(DiscountApplication, id=application_id)
     
-    # 最新のCSVアップロードを取得
-    latest_csv = CSVUpload.objects.filter(status='completed').order_by('-created_at').first()
-    
-    csv_entries = []
-    if latest_csv and latest_csv.file_path and os.path.exists(latest_csv.file_path):
-        encodings = ['cp932', 'shift_jis', 'utf-8-sig', 'utf-8']
-        for enc in encodings:
-            try:
-                with open(latest_csv.file_path, 'r', encoding=enc, newline='') as f:
-                    reader = csv.DictReader(f)
-                    row_index = 0
-                    for row in reader:
-                        row_index += 1
-                        if row.get('定期ステータス', '').strip() == '継続':
-                            row_email = row.get('注文者 メールアドレス', '').lower().strip()
-                            row_last_name = row.get('配送先 姓', '').strip()
-                            row_first_name = row.get('配送先 名', '').strip()
-                            row_full_name = f"{row_last_name} {row_first_name}".strip()
-                            
-                            csv_entries.append({
-                                'row_index': row_index,
-                                'email': row_email,
-                                'last_name': row_last_name,
-                                'first_name': row_first_name,
-                                'full_name': row_full_name,
-                                'csv_row': row,
-                            })
-                break
-            except (UnicodeDecodeError, FileNotFoundError):
-                continue
-    
     return render(request, 'application/manual_discount_match_select.html', {
         'application': application,
-        'csv_upload': latest_csv,
-        'csv_entries': csv_entries,
+        **_manual_match_candidates(request, application),
         'page_title': f'値引き申請：手動突合: {application.full_name}'
     })
 
@@ -1238,44 +847,19 @@ def manual_discount_match(request, application_id):
     """値引き申請：手動突合：選択したCSVエントリーで突合"""
     application = get_object_or_404(DiscountApplication, id=application_id)
     
-    # CSVからの選択されたエントリー情報を取得
-    selected_row_index = request.POST.get('selected_row_index')
-    candidate_email = request.POST.get('candidate_email', '').strip()
-    candidate_last_name = request.POST.get('candidate_last_name', '').strip()
-    candidate_first_name = request.POST.get('candidate_first_name', '').strip()
+    # 選択されたCSVの行（選択画面に表示したCSVアップロードから取得）
+    selected_csv, entry = _selected_candidate(request)
     
-    if not candidate_email:
+    if entry is None:
         messages.error(request, 'CSVエントリーが選択されていません。')
         return redirect('application:discount_application_detail', application_id=application.id)
     
-    # 最新のCSVアップロードを取得（subscription_idなどの情報取得のため）
-    latest_csv = CSVUpload.objects.filter(status='completed').order_by('-created_at').first()
-    subscription_id = f"MANUAL_DISC_{application.id}"
-    
-    if latest_csv and latest_csv.file_path and os.path.exists(latest_csv.file_path):
-        # 選択された行のデータを取得
-        encodings = ['cp932', 'shift_jis', 'utf-8-sig', 'utf-8']
-        for enc in encodings:
-            try:
-                with open(latest_csv.file_path, 'r', encoding=enc, newline='') as f:
-                    reader = csv.DictReader(f)
-                    row_index = 0
-                    for row in reader:
-                        row_index += 1
-                        if row.get('定期ステータス', '').strip() == '継続':
-                            if str(row_index) == str(selected_row_index):
-                                # 注文番号などがあればそれを使用
-                                order_number = row.get('注文番号', '').strip()
-                                if order_number:
-                                    subscription_id = order_number
-                                break
-                break
-            except (UnicodeDecodeError, FileNotFoundError):
-                continue
+    # 注文番号があればそれを使用
+    subscription_id = entry.order_number or f"MANUAL_DISC_{application.id}"
     
     # 候補のメールアドレスでSubscriptionUserを作成または取得
     subscription_user, created = SubscriptionUser.objects.get_or_create(
-        email=candidate_email.lower().strip(),
+        email=entry.email,
         defaults={
             'subscription_id': subscription_id,
             'is_active': True
@@ -1287,14 +871,17 @@ def manual_discount_match(request, application_id):
     application.match_method = 'manual'
     application.matched_at = timezone.now()
     application.status = 'verified'
-    application.csv_upload = latest_csv
-    application.match_notes = (
-        f"手動突合: 管理者が選択したCSVエントリー\n"
-        f"メール: {candidate_email}\n"
-        f"名前: {candidate_last_name} {candidate_first_name}\n"
-        f"CSV行番号: {selected_row_index}"
-    )
+    application.csv_upload = selected_csv
     application.save()
+    MatchEvent.for_application(
+        application,
+        csv_upload=selected_csv,
+        method='manual',
+        outcome='manual',
+        matched_status=entry.status,
+        candidate_emails=[entry.email],
+        row_number=entry.row_number,
+    ).save()
     
     messages.success(request, '手動突合が完了しました。')
     return redirect('application:discount_application_detail', application_id=application.id)
@@ -1360,63 +947,38 @@ def data_management(request):
         
         if password != admin_password:
             messages.error(request, 'パスワードが正しくありません。')
-            # データ件数を取得
-            salon_count = SalonApplication.objects.count()
-            discount_count = DiscountApplication.objects.count()
-            csv_count = CSVUpload.objects.count()
-            subscription_count = SubscriptionUser.objects.count()
             return render(request, 'application/data_management.html', {
                 'page_title': 'データ管理',
                 'password_error': True,
-                'salon_count': salon_count,
-                'discount_count': discount_count,
-                'csv_count': csv_count,
-                'subscription_count': subscription_count,
+                **_data_counts(),
             })
         
         if action == 'delete_all':
-            # 全データ削除を実行
+            # 全データ削除を実行（CSVファイルはバックグラウンドで削除）
             try:
-                # CSVファイルも削除
-                csv_uploads = CSVUpload.objects.all()
-                for csv_upload in csv_uploads:
-                    if csv_upload.file_path and os.path.exists(csv_upload.file_path):
-                        try:
-                            os.remove(csv_upload.file_path)
-                        except Exception as e:
-                            pass  # ファイル削除エラーは無視
-                
-                # データベースから削除
-                salon_count = SalonApplication.objects.count()
-                discount_count = DiscountApplication.objects.count()
-                csv_count = CSVUpload.objects.count()
-                subscription_count = SubscriptionUser.objects.count()
-                
-                SalonApplication.objects.all().delete()
-                DiscountApplication.objects.all().delete()
-                CSVUpload.objects.all().delete()
-                SubscriptionUser.objects.all().delete()
-                
+                counts = purge_all_data()
                 messages.success(
                     request,
                     f'すべてのデータを削除しました。'
-                    f'（申し込み: {salon_count}件、値引き申請: {discount_count}件、'
-                    f'CSVアップロード: {csv_count}件、定期購入ユーザー: {subscription_count}件）'
+                    f'（申し込み: {counts["salon_count"]}件、値引き申請: {counts["discount_count"]}件、'
+                    f'CSVアップロード: {counts["csv_count"]}件、定期購入ユーザー: {counts["subscription_count"]}件）'
                 )
             except Exception as e:
                 messages.error(request, f'データ削除中にエラーが発生しました: {str(e)}')
     
-    # データ件数を取得
-    salon_count = SalonApplication.objects.count()
-    discount_count = DiscountApplication.objects.count()
-    csv_count = CSVUpload.objects.count()
-    subscription_count = SubscriptionUser.objects.count()
-    
     return render(request, 'application/data_management.html', {
         'page_title': 'データ管理',
-        'salon_count': salon_count,
-        'discount_count': discount_count,
-        'csv_count': csv_count,
-        'subscription_count': subscription_count,
+        **_data_counts(),
     })
 
+
+def _data_counts():
+    """データ管理画面用の件数（集計カウンターから取得）"""
+    counts = counters.get_counters()
+    return {
+        'salon_count': counts['salon_total'],
+        'discount_count': counts['discount_total'],
+        'csv_count': counts['csv_total'],
+        'subscription_count': counts['subscription_total'],
+    }
+
@@ -0,0 +1,107 @@
+"""
+起動直後のウォームアップ（Passengerの再起動後の初回リクエスト対策）
+
+Passengerは一定時間アクセスがないとアプリを終了し、次のリクエストで再起動する。
+初回リクエストでまとめて行われるビューのインポート、URL設定の解決、翻訳の読み込み、
+テンプレートのコンパイル、DB接続を起動時に済ませておく。
+
+各段階は失敗してもログを残して続行する（ウォームアップの失敗で起動を止めない）。
+"""
+import logging
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connection
+from django.template.loader import get_template
+from django.urls import get_resolver, reverse
+from django.utils import translation
+
+
+logger = logging.getLogger(__name__)
+
+# 起動時にコンパイルするテンプレート（公開ページと管理画面の主要ページ）
+WARMUP_TEMPLATES = [
+    'application/form.html',
+    'application/pending.html',
+    'application/success.html',
+    'application/discount_application_form.html',
+    'application/discount_application_pending.html',
+    'application/discount_application_success.html',
+    'application/rate_limited.html',
+    'application/admin_login.html',
+    'application/list.html',
+    'application/detail.html',
+    'application/discount_application_list.html',
+    'application/csv_upload_list.html',
+]
+
+
+def _import_views():
+    """URL設定とビューのモジュールをインポート"""
+    import_module(settings.ROOT_URLCONF)
+
+
+def _resolve_urls():
+    """URLの逆引き表を作成（初回の reverse・{% url %} で行われる処理）"""
+    get_resolver().reverse_dict
+    reverse('application:application_form')
+
+
+def _load_translations():
+    """既定の言語の翻訳カタログを読み込む"""
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('Django')
+
+
+def _compile_templates():
+    """主要なテンプレートとフォームのウィジェットをコンパイル"""
+    from .forms import DiscountApplicationForm, SalonApplicationForm
+
+    for name in WARMUP_TEMPLATES:
+        get_template(name)
+    str(SalonApplicationForm())
+    str(DiscountApplicationForm())
+
+
+def _prime_caches():
+    """DBに接続し、ナビゲーションのカウンターとキャッシュのバージョン番号を読み込む"""
+    from . import counters
+    from .caching import BULK_VERSION, DATA_VERSION, get_version
+
+    connection.ensure_connection()
+    counters.get_counters()
+    get_version(DATA_VERSION)
+    get_version(BULK_VERSION)
+
+
+WARMUP_STEPS = [
+    ('import_views', _import_views),
+    ('resolve_urls', _resolve_urls),
+    ('load_translations', _load_translations),
+    ('compile_templates', _compile_templates),
+    ('prime_caches', _prime_caches),
+]
+
+
+def warmup():
+    """
+    ウォームアップを実行
+
+    Returns:
+        dict: 段階ごとの所要時間（ミリ秒）。失敗した段階は None
+    """
+    timings = {}
+    for name, step in WARMUP_STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.warning('ウォームアップに失敗しました: %s', name, exc_info=True)
+            timings[name] = None
+            continue
+        timings[name] = (time.perf_counter() - start) * 1000
+    logger.info('ウォームアップ完了: %s', ', '.join(
+        f'{name}={ms:.1f}ms' if ms is not None else f'{name}=失敗' for name, ms in timings.items()
+    ))
+    return timings
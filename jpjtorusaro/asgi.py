@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jpjtorusaro.settings')
+# ASGIでは公開ページに非同期ビュー（application/async_views.py）を使用
+os.environ.setdefault('DJANGO_ASYNC_PUBLIC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # レスポンスの圧縮（本文を読み書きする他のミドルウェアより外側に置く）
+    'application.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,12 +59,19 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # コンパイル済みテンプレートをプロセス内に保持（リクエストごとの再パースを防ぐ）
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'application.context_processors.nav_counters',
             ],
         },
     },
@@ -69,6 +79,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'jpjtorusaro.wsgi.application'
 
+# 公開ページ（申し込み・値引き申請）に非同期ビューを使うか（ASGIで運用する場合に有効化）
+# asgi.py で DJANGO_ASYNC_PUBLIC_VIEWS=1 が既定で設定される
+ASYNC_PUBLIC_VIEWS = os.environ.get('DJANGO_ASYNC_PUBLIC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -81,6 +95,69 @@ DATABASES = {
 }
 
 
+# Cache
+# Passengerの複数ワーカープロセスで共有できるよう、ファイルベースのキャッシュを使用
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'django_cache',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+    # テンプレートの断片キャッシュ用（キーに更新日時を含み古くならないため、プロセス内メモリで十分）
+    'templates': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template-fragments',
+        'TIMEOUT': 86400,
+        'OPTIONS': {
+            'MAX_ENTRIES': 30000,
+        },
+    },
+}
+
+# セッションの保存先（環境変数 SESSION_BACKEND）
+# - cached_db（既定）: 共有キャッシュから読み込み、DBにも保存（既存のDBセッションはそのまま使える）
+# - signed_cookies: 署名付きCookieに保存（セッションテーブルを使わない。既存のDBセッションは初回アクセス時に移行）
+# - db: DBのみ（Django標準）
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'application.signed_cookie_sessions',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('SESSION_BACKEND', 'cached_db')]
+
+# 管理画面ページのキャッシュ有効期間（秒）
+# データ更新時はバージョン番号で無効化されるため、期間は容量管理のためのもの
+ADMIN_PAGE_CACHE_TIMEOUT = 600
+
+# 公開フォームのGET表示のキャッシュ有効期間（秒）
+PUBLIC_PAGE_CACHE_TIMEOUT = 300
+
+# 申込者向け状態確認（審査中ページのポーリング）のキャッシュ有効期間（秒）
+# その申し込みの保存時・一括更新時に無効化される
+PUBLIC_STATUS_CACHE_TIMEOUT = 30
+
+# レスポンスの圧縮（application/middleware.py、Noneで無効）
+# min_size: これより小さいレスポンスは圧縮しない（バイト）
+# max_random_bytes: BREACH対策として圧縮結果に加えるランダムなデータの最大長
+# skip_csrf_pages: CSRFトークンを含むページを圧縮しない
+RESPONSE_COMPRESSION = {
+    'min_size': 1024,
+    'max_random_bytes': 100,
+    'skip_csrf_pages': False,
+}
+
+# 公開フォーム（申し込み・値引き申請）のレート制限（トークンバケット、共有キャッシュに保存）
+# capacity: 連続して受け付ける送信数、per_minute: 1分あたりに回復する送信数
+# 項目をNoneにするとその制限を無効化
+PUBLIC_FORM_RATE_LIMIT = {
+    'ip': {'capacity': 10, 'per_minute': 5},
+    'email': {'capacity': 3, 'per_minute': 1},
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
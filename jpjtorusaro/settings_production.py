@@ -3,8 +3,11 @@ Django settings for jpjtorusaro project - Production settings for ColorfulBox
 """
 
 from pathlib import Path
+import importlib.util
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,6 +41,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # レスポンスの圧縮（本文を読み書きする他のミドルウェアより外側に置く）
+    'application.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,13 +57,20 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # コンパイル済みテンプレートをプロセス内に保持（リクエストごとの再パースを防ぐ）
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'application.context_processors.nav_counters',
             ],
         },
     },
@@ -66,23 +78,163 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'jpjtorusaro.wsgi.application'
 
+# 公開ページ（申し込み・値引き申請）に非同期ビューを使うか（ASGIで運用する場合に有効化）
+# asgi.py で DJANGO_ASYNC_PUBLIC_VIEWS=1 が既定で設定される
+ASYNC_PUBLIC_VIEWS = os.environ.get('DJANGO_ASYNC_PUBLIC_VIEWS') == '1'
+
 # Database
-# ColorfulBoxではMySQLまたはPostgreSQLを使用
+# ColorfulBoxではMySQLまたはPostgreSQLを使用（環境変数 DB_ENGINE: mysql / postgresql / sqlite、省略時は mysql）
 # cPanelの「リモートMySQL」または「PostgreSQL」からデータベース情報を取得
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',  # または 'django.db.backends.postgresql'
-        'NAME': os.environ.get('DB_NAME', ''),
-        'USER': os.environ.get('DB_USER', ''),
-        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
-        'HOST': os.environ.get('DB_HOST', 'localhost'),
-        'PORT': os.environ.get('DB_PORT', '3306'),  # MySQL: 3306, PostgreSQL: 5432
-        'OPTIONS': {
-            'charset': 'utf8mb4',
-            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
-        },
+DB_ENGINE = os.environ.get('DB_ENGINE', 'mysql')
+if DB_ENGINE == 'sqlite':
+    # SQLiteを使う場合（DB_NAMEにDBファイルのパス、省略時はプロジェクト直下の db.sqlite3）
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME') or BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # 書き込むトランザクションは開始時に書き込みロックを取得する
+                # （読み込みから書き込みへの昇格で待機せずに失敗するのを防ぐ）
+                'transaction_mode': 'IMMEDIATE',
+                # ロック待ちの時間は SQLITE_PRAGMAS の busy_timeout（SQLITE_BUSY_TIMEOUT）のみで指定する
+                # （ここで timeout を指定しても、接続ごとのPRAGMAで上書きされるため）
+            },
+        }
+    }
+    # 接続ごとに実行するPRAGMA（application/sqlite.py）
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', '5000')),
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_KIB', '20000')),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', '134217728')),
+        'temp_store': 'memory',
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': f'django.db.backends.{DB_ENGINE}',
+            'NAME': os.environ.get('DB_NAME', ''),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '3306'),  # MySQL: 3306, PostgreSQL: 5432
+            # 文字コード・SQLモードの指定はMySQLのみ
+            'OPTIONS': {
+                'charset': 'utf8mb4',
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            } if DB_ENGINE == 'mysql' else {},
+        }
+    }
+
+# 持続的接続（環境変数 DB_CONN_MAX_AGE: 接続を再利用する秒数、0でリクエストごとに接続・切断）
+# DB_CONN_HEALTH_CHECKS=1（既定）の場合、リクエストの最初に再利用する接続が切れていないか確認する
+# （MySQLのwait_timeoutなどでサーバー側から切断された接続でエラーにならない）
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1'
+
+# コネクションプール（PostgreSQLかつpsycopg 3（psycopg[pool]）の場合のみ、DB_POOL=1 で有効化）
+# プールが接続を保持するため、持続的接続は無効にする（Djangoの制約）
+if DB_ENGINE == 'postgresql' and os.environ.get('DB_POOL') == '1':
+    # requirements.txt の psycopg2-binary ではプールを使えないため、起動時に分かるようにする
+    if importlib.util.find_spec('psycopg') is None or importlib.util.find_spec('psycopg_pool') is None:
+        raise ImproperlyConfigured(
+            'DB_POOL=1 には psycopg 3 とプールが必要です。'
+            '`pip install "psycopg[binary,pool]"` を実行するか、DB_POOL を無効にしてください。'
+        )
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+        'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+    }
+
+# Cache
+# Passengerの複数ワーカープロセスで共有できるキャッシュ（Redisが使えないためファイルまたはDB）
+# CACHE_BACKEND=db の場合は事前に `python manage.py createcachetable` を実行してください
+if os.environ.get('CACHE_BACKEND', 'file') == 'db':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            'TIMEOUT': 600,
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, 'django_cache')),
+            'TIMEOUT': 600,
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+            },
+        }
+    }
+
+# テンプレートの断片キャッシュ用（キーに更新日時を含み古くならないため、プロセス内メモリで十分）
+CACHES['templates'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'template-fragments',
+    'TIMEOUT': 86400,
+    'OPTIONS': {
+        'MAX_ENTRIES': 30000,
+    },
+}
+
+# セッションの保存先（環境変数 SESSION_BACKEND）
+# - cached_db（既定）: 共有キャッシュから読み込み、DBにも保存（既存のDBセッションはそのまま使える）
+# - signed_cookies: 署名付きCookieに保存（セッションテーブルを使わない。既存のDBセッションは初回アクセス時に移行）
+# - db: DBのみ（Django標準）
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'application.signed_cookie_sessions',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('SESSION_BACKEND', 'cached_db')]
+
+# 管理画面ページのキャッシュ有効期間（秒）
+ADMIN_PAGE_CACHE_TIMEOUT = int(os.environ.get('ADMIN_PAGE_CACHE_TIMEOUT', '600'))
+
+# 公開フォームのGET表示のキャッシュ有効期間（秒）
+PUBLIC_PAGE_CACHE_TIMEOUT = int(os.environ.get('PUBLIC_PAGE_CACHE_TIMEOUT', '300'))
+
+# 申込者向け状態確認（審査中ページのポーリング）のキャッシュ有効期間（秒）
+# その申し込みの保存時・一括更新時に無効化される
+PUBLIC_STATUS_CACHE_TIMEOUT = int(os.environ.get('PUBLIC_STATUS_CACHE_TIMEOUT', '30'))
+
+# レスポンスの圧縮（application/middleware.py、COMPRESS_RESPONSES=0 で無効）
+# min_size: これより小さいレスポンスは圧縮しない（バイト）
+# max_random_bytes: BREACH対策として圧縮結果に加えるランダムなデータの最大長
+# skip_csrf_pages: CSRFトークンを含むページを圧縮しない
+if os.environ.get('COMPRESS_RESPONSES', '1') == '1':
+    RESPONSE_COMPRESSION = {
+        'min_size': int(os.environ.get('COMPRESS_MIN_SIZE', '1024')),
+        'max_random_bytes': int(os.environ.get('COMPRESS_RANDOM_BYTES', '100')),
+        'skip_csrf_pages': os.environ.get('COMPRESS_SKIP_CSRF_PAGES') == '1',
     }
+else:
+    RESPONSE_COMPRESSION = None
+
+# 公開フォーム（申し込み・値引き申請）のレート制限（トークンバケット、共有キャッシュに保存）
+# capacity: 連続して受け付ける送信数、per_minute: 1分あたりに回復する送信数
+PUBLIC_FORM_RATE_LIMIT = {
+    'ip': {
+        'capacity': int(os.environ.get('RATE_LIMIT_IP_CAPACITY', '10')),
+        'per_minute': float(os.environ.get('RATE_LIMIT_IP_PER_MINUTE', '5')),
+    },
+    'email': {
+        'capacity': int(os.environ.get('RATE_LIMIT_EMAIL_CAPACITY', '3')),
+        'per_minute': float(os.environ.get('RATE_LIMIT_EMAIL_PER_MINUTE', '1')),
+    },
 }
+# リバースプロキシ経由で送信元IPを別ヘッダーから取得する場合に指定（例: HTTP_X_FORWARDED_FOR）
+RATE_LIMIT_IP_HEADER = os.environ.get('RATE_LIMIT_IP_HEADER', 'REMOTE_ADDR')
+# X-Forwarded-For を使う場合、手前にある信頼するプロキシの数（右から数えてこの位置のアドレスを使う）
+RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', '1'))
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -111,6 +263,17 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic でファイル名に内容のハッシュを付け、.gz・.br を作成（application/storage.py）
+# テンプレートの {% static %} はハッシュ付きのファイル名を返すため、デプロイのたびに collectstatic を実行してください
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'application.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files
 # ColorfulBoxでは、public_html配下にmediaフォルダを作成
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
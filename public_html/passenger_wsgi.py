@@ -24,3 +24,9 @@ if os.path.exists(venv_python):
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
 
+# 起動直後にビュー・URL・テンプレート・DB接続を準備し、再起動後の初回リクエストを速くする
+# （無効にする場合は環境変数 DJANGO_WARMUP=0）
+if os.environ.get('DJANGO_WARMUP', '1') == '1':
+    from application.warmup import warmup
+    warmup()
+